@@ -9,6 +9,7 @@ from pydantic import BaseModel
 # Import registry and search modules
 from AutonomousSphere.registry import registry
 from AutonomousSphere.search import router as search_router, startup_event
+from AutonomousSphere.config import config_store
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -49,8 +50,14 @@ app.include_router(search_router, prefix="/search", tags=["search"])
 # Register startup event
 @app.on_event("startup")
 async def on_startup():
+    # Reload config.yaml on SIGHUP or when it changes, without restarting
+    await config_store.start()
     await startup_event()
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    await config_store.stop()
+
 # Error handling
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -58,9 +65,18 @@ async def global_exception_handler(request: Request, exc: Exception):
     return {"error": "Internal server error", "detail": str(exc)}, 500
 
 # Main function to run the app
-def start_api(host="0.0.0.0", port=8000):
+def start_api(host="0.0.0.0", port=8000, workers=1):
     import uvicorn
-    uvicorn.run(app, host=host, port=port)
+    if workers <= 1:
+        uvicorn.run(app, host=host, port=port)
+        return
+    
+    # Workers share agents through the storage and its change notifications;
+    # with in-process storage each worker would only see its own registrations
+    backend = registry.get_config().settings.registry.storage.backend
+    if backend != "postgres":
+        raise ValueError(f"Running {workers} workers requires the postgres registry storage, not {backend}")
+    uvicorn.run("AutonomousSphere.api.api:app", host=host, port=port, workers=workers)
 
 if __name__ == "__main__":
-    start_api()
\ No newline at end of file
+    start_api(workers=int(os.environ.get("API_WORKERS", "1")))
\ No newline at end of file
@@ -1,12 +1,48 @@
+import asyncio
+import logging
+
 from mautrix.appservice import AppService
 from .agent_manager import AgentManager
+from .message_index import DEFAULT_PATH, MessageIndex
 from .router import MessageRouter
 
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Events besides messages that keep the message index up to date
+INDEXED_EVENT_TYPES = ("m.room.redaction", "m.room.member", "m.room.name", "m.room.topic")
+
 class AutonomousSphereBridge(AppService):
     async def start(self):
         self.agent_manager = AgentManager(self)
-        self.router = MessageRouter(self, self.agent_manager)
+
+        # Feed the local message index searched by the API, when enabled
+        self.message_index = None
+        self.message_index_backfill = None
+        if self.config.get("search.message_index.enabled", False):
+            self.message_index = MessageIndex(self.config.get("search.message_index.path", DEFAULT_PATH))
+            await self.message_index.open()
+            for event_type in INDEXED_EVENT_TYPES:
+                self.register_event_handler(event_type, self.message_index.ingest)
+            self.message_index_backfill = asyncio.create_task(self.backfill_message_index())
+
+        self.router = MessageRouter(self, self.agent_manager, self.message_index)
 
         self.register_event_handler("m.room.message", self.router.handle_message)
 
         await super().start()
+
+    async def backfill_message_index(self):
+        """
+        Ingest the current state of the rooms the bot has joined, so the index
+        knows memberships, names and topics that changed while the appservice
+        was down. Rooms the bot is not in are only learned from new events.
+        """
+        for room_id in await self.intent.get_joined_rooms():
+            try:
+                for evt in await self.intent.get_state(room_id):
+                    event = evt.serialize()
+                    event.setdefault("room_id", room_id)
+                    await self.message_index.ingest(event)
+            except Exception:
+                logger.exception(f"Failed to backfill the message index for room {room_id}")
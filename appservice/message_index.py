@@ -0,0 +1,228 @@
+from typing import Any, Dict, Optional
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Database used when search.message_index.path is not set in config.yaml
+DEFAULT_PATH = "data/message_index.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    event_id TEXT NOT NULL UNIQUE,
+    room_id TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    body TEXT NOT NULL,
+    content TEXT NOT NULL,
+    origin_server_ts INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_room ON messages (room_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(body, content='messages', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, body) VALUES (new.id, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, body) VALUES ('delete', old.id, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE OF body ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, body) VALUES ('delete', old.id, old.body);
+    INSERT INTO messages_fts (rowid, body) VALUES (new.id, new.body);
+END;
+CREATE TABLE IF NOT EXISTS room_members (
+    room_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    PRIMARY KEY (room_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS room_members_user ON room_members (user_id);
+CREATE TABLE IF NOT EXISTS rooms (
+    room_id TEXT PRIMARY KEY,
+    name TEXT,
+    topic TEXT
+);
+"""
+
+def event_dict(evt: Any) -> Dict[str, Any]:
+    """Matrix JSON of an event, from a mautrix Event or an already decoded dict"""
+    if isinstance(evt, dict):
+        return evt
+    return evt.serialize()
+
+def fts_query(query: str) -> str:
+    """FTS5 query matching messages containing every term, with the FTS5 syntax escaped"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+def _json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+class MessageIndex:
+    """
+    Local full-text index of Matrix messages, in SQLite FTS5.
+
+    The appservice ingests the events it receives: messages are indexed,
+    edits (m.replace relations) replace the body of the message they edit,
+    redactions remove it, and membership, name and topic events record who
+    is in which room; the state of the rooms the appservice bot has joined
+    is ingested again at startup. Searches only return messages from rooms the user has
+    joined, in the shape of a homeserver /search response, so they can be
+    served instead of one without a round trip to the homeserver.
+
+    The database runs in WAL mode so the API workers can search it while the
+    appservice process writes to it. Calls run on a worker thread through
+    the async methods; the `_`-prefixed ones are their synchronous bodies.
+    The module only depends on the standard library, so the appservice can
+    import it without the API's search stack.
+    """
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self.conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.conn is not None
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        self.conn = conn
+        logger.info(f"Opened Matrix message index at {self.path}")
+
+    async def open(self):
+        await asyncio.to_thread(self._open)
+
+    async def close(self):
+        if self.conn is not None:
+            with self._lock:
+                self.conn.close()
+                self.conn = None
+
+    def _ingest(self, event: Dict[str, Any]) -> bool:
+        """Apply one event to the index; returns whether it changed anything"""
+        event_type = event.get("type")
+        content = event.get("content") or {}
+        room_id = event.get("room_id")
+        with self._lock:
+            if event_type == "m.room.message":
+                return self._ingest_message(event, content, room_id)
+            if event_type == "m.room.redaction":
+                # Room versions 11+ move `redacts` into the content
+                redacts = content.get("redacts") or event.get("redacts")
+                return self.conn.execute("DELETE FROM messages WHERE event_id = ?", (redacts,)).rowcount > 0
+            if event_type == "m.room.member":
+                if content.get("membership") == "join":
+                    sql = "INSERT OR IGNORE INTO room_members (room_id, user_id) VALUES (?, ?)"
+                else:
+                    sql = "DELETE FROM room_members WHERE room_id = ? AND user_id = ?"
+                return self.conn.execute(sql, (room_id, event.get("state_key"))).rowcount > 0
+            if event_type in ("m.room.name", "m.room.topic"):
+                field = event_type.rsplit(".", 1)[1]
+                self.conn.execute(
+                    f"INSERT INTO rooms (room_id, {field}) VALUES (?, ?) "
+                    f"ON CONFLICT (room_id) DO UPDATE SET {field} = excluded.{field}",
+                    (room_id, content.get(field))
+                )
+                return True
+        return False
+
+    def _ingest_message(self, event: Dict[str, Any], content: Dict[str, Any], room_id: str) -> bool:
+        relation = content.get("m.relates_to") or {}
+        if relation.get("rel_type") == "m.replace":
+            new_content = content.get("m.new_content")
+            body = new_content.get("body") if isinstance(new_content, dict) else None
+            # Edits without a new body leave the message as it was
+            if not isinstance(body, str) or not body:
+                return False
+            # Only the original sender may edit a message
+            return self.conn.execute(
+                "UPDATE messages SET body = ?, content = json(?) WHERE event_id = ? AND sender = ?",
+                (body, _json(new_content), relation.get("event_id"), event.get("sender"))
+            ).rowcount > 0
+        body = content.get("body")
+        if not isinstance(body, str) or not body:
+            return False
+        return self.conn.execute(
+            "INSERT OR IGNORE INTO messages (event_id, room_id, sender, body, content, origin_server_ts) "
+            "VALUES (?, ?, ?, ?, json(?), ?)",
+            (event.get("event_id"), room_id, event.get("sender"), body, _json(content), event.get("origin_server_ts", 0))
+        ).rowcount > 0
+
+    async def ingest(self, evt: Any) -> bool:
+        """Apply an event received by the appservice to the index"""
+        return await asyncio.to_thread(self._ingest, event_dict(evt))
+
+    def _search(self, query: str, user_id: str, limit: int, offset: int) -> Dict[str, Any]:
+        terms = fts_query(query)
+        if not terms:
+            return {"search_categories": {"room_events": {"results": []}}}
+        with self._lock:
+            # One extra row tells whether there is a next page
+            rows = self.conn.execute(
+                "SELECT m.event_id, m.room_id, m.sender, m.content, m.origin_server_ts, -bm25(messages_fts) "
+                "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                "JOIN room_members r ON r.room_id = m.room_id AND r.user_id = ? "
+                "WHERE messages_fts MATCH ? ORDER BY bm25(messages_fts) LIMIT ? OFFSET ?",
+                (user_id, terms, limit + 1, offset)
+            ).fetchall()
+            room_ids = sorted({row[1] for row in rows[:limit]})
+            rooms = self.conn.execute(
+                f"SELECT room_id, name, topic FROM rooms WHERE room_id IN ({','.join('?' * len(room_ids))})",
+                room_ids
+            ).fetchall() if room_ids else []
+        results = [
+            {
+                "rank": rank,
+                "result": {
+                    "event_id": event_id,
+                    "room_id": room_id,
+                    "sender": sender,
+                    "type": "m.room.message",
+                    "content": json.loads(content),
+                    "origin_server_ts": origin_server_ts
+                }
+            }
+            for event_id, room_id, sender, content, origin_server_ts, rank in rows[:limit]
+        ]
+        state = {}
+        for room_id, name, topic in rooms:
+            state[room_id] = []
+            if name is not None:
+                state[room_id].append({"type": "m.room.name", "content": {"name": name}})
+            if topic is not None:
+                state[room_id].append({"type": "m.room.topic", "content": {"topic": topic}})
+        room_events = {"results": results, "state": state}
+        if len(rows) > limit:
+            room_events["next_batch"] = str(offset + limit)
+        return {"search_categories": {"room_events": room_events}}
+
+    async def search(self, query: str, user_id: str, next_batch: Optional[str] = None, limit: int = 20) -> Dict[str, Any]:
+        """
+        Messages matching every term of `query` in rooms `user_id` has
+        joined, best match first, as a homeserver /search response. Pages
+        are requested with the `next_batch` of the previous one.
+        """
+        try:
+            offset = max(int(next_batch or 0), 0)
+        except ValueError:
+            return {"error": f"Invalid next_batch: {next_batch}"}
+        return await asyncio.to_thread(self._search, query, user_id, limit, offset)
+
+    def _stats(self) -> Dict[str, int]:
+        with self._lock:
+            messages = self.conn.execute("SELECT count(*) FROM messages").fetchone()[0]
+            rooms = self.conn.execute("SELECT count(DISTINCT room_id) FROM room_members").fetchone()[0]
+        return {"messages": messages, "rooms": rooms}
+
+    async def stats(self) -> Dict[str, Any]:
+        if self.conn is None:
+            return {"enabled": False}
+        return {"enabled": True, **await asyncio.to_thread(self._stats)}
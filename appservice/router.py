@@ -1,13 +1,25 @@
+import logging
+
 from appservice.a2a import handle_a2a
 from appservice.acp import handle_acp
 from appservice.mcp import handle_mcp
 
+# Configure logging
+logger = logging.getLogger(__name__)
+
 class MessageRouter:
-    def __init__(self, bridge, agent_manager):
+    def __init__(self, bridge, agent_manager, message_index=None):
         self.bridge = bridge
         self.agent_manager = agent_manager
+        self.message_index = message_index
 
     async def handle_message(self, evt):
+        if self.message_index is not None:
+            try:
+                await self.message_index.ingest(evt)
+            except Exception:
+                logger.exception(f"Failed to index message {evt.event_id}")
+
         content = evt.content.get("body", "")
         sender = evt.sender
 
@@ -18,4 +30,4 @@ class MessageRouter:
         elif content.startswith("acp:"):
             await handle_acp(self.bridge, evt, self.agent_manager)
         else:
-            print(f"Ignoring: {content}")
+            logger.debug(f"Ignoring: {content}")
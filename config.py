@@ -0,0 +1,241 @@
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import os
+import signal
+
+import yaml
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "config.yaml")
+
+class Section(BaseModel):
+    """
+    A section of config.yaml, with the defaults used for keys it leaves
+    out. Keys set to null (e.g. an empty section) take the default too,
+    and keys the section does not know are ignored.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    @model_validator(mode="before")
+    @classmethod
+    def _drop_nulls(cls, data: Any) -> Any:
+        if data is None:
+            return {}
+        if isinstance(data, dict):
+            return {key: value for key, value in data.items() if value is not None}
+        return data
+
+class ConfigReloadSettings(Section):
+    watch_interval: float = 0
+
+class HTTPClientSettings(Section):
+    """Connection pool shared by homeserver calls"""
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    timeout: float = 10.0
+    http2: bool = False
+
+class StorageSettings(Section):
+    backend: str = "memory"
+    dsn: Optional[str] = None
+    table: str = "agents"
+    min_pool_size: int = 1
+    max_pool_size: int = 10
+    directory: str = "data/registry"
+    snapshot_interval: float = 300.0
+
+class VectorSearchSettings(Section):
+    enabled: bool = False
+    dsn: Optional[str] = None
+    table: str = "agent_embeddings"
+    index_type: str = "hnsw"
+    dimensions: int = 256
+
+class SearchCacheSettings(Section):
+    max_entries: int = 1024
+
+class HeartbeatSettings(Section):
+    flush_interval: float = 5.0
+    stale_after: float = 0
+    expire_after: float = 0
+
+class RegistrySettings(Section):
+    storage: StorageSettings = Field(default_factory=StorageSettings)
+    vector_search: VectorSearchSettings = Field(default_factory=VectorSearchSettings)
+    search_cache: SearchCacheSettings = Field(default_factory=SearchCacheSettings)
+    heartbeat: HeartbeatSettings = Field(default_factory=HeartbeatSettings)
+
+class SearchTimeouts(Section):
+    """Seconds each unified search source may take"""
+    agents: float = 2.0
+    matrix: float = 5.0
+
+class MatrixCacheSettings(Section):
+    ttl: float = 30.0
+    stale_ttl: float = 300.0
+    max_entries: int = 1000
+
+class MatrixPrefetchSettings(Section):
+    depth: int = 2
+    max_active: int = 100
+
+class MessageIndexSettings(Section):
+    enabled: bool = False
+    path: str = "data/message_index.db"
+
+class FusionWeights(Section):
+    agents: float = 1.0
+    messages: float = 1.0
+    rooms: float = 0.5
+
+class FusionSettings(Section):
+    top_k: int = 20
+    rrf_k: int = 60
+    weights: FusionWeights = Field(default_factory=FusionWeights)
+
+class SearchSettings(Section):
+    timeouts: SearchTimeouts = Field(default_factory=SearchTimeouts)
+    matrix_cache: MatrixCacheSettings = Field(default_factory=MatrixCacheSettings)
+    matrix_prefetch: MatrixPrefetchSettings = Field(default_factory=MatrixPrefetchSettings)
+    message_index: MessageIndexSettings = Field(default_factory=MessageIndexSettings)
+    fusion: FusionSettings = Field(default_factory=FusionSettings)
+
+class Settings(Section):
+    """The sections of config.yaml read by the service, validated and with their defaults filled in"""
+    config_reload: ConfigReloadSettings = Field(default_factory=ConfigReloadSettings)
+    http_client: HTTPClientSettings = Field(default_factory=HTTPClientSettings)
+    registry: RegistrySettings = Field(default_factory=RegistrySettings)
+    search: SearchSettings = Field(default_factory=SearchSettings)
+
+@dataclass(frozen=True)
+class AppConfig:
+    """
+    Parsed contents of config.yaml.
+
+    Instances are never modified: a reload builds a new one and swaps it in,
+    so a request that fetched the config keeps a consistent view of it.
+    The service's own sections are read as typed attributes of `settings`
+    (`config.settings.search.fusion.top_k`). Other sections, such as
+    homeserver and appservice, are read like the parsed dict
+    (`config["homeserver"]`, `config.get(...)`).
+    """
+    data: Dict[str, Any]
+    path: str = ""
+    mtime: float = 0.0
+    version: int = 0
+    settings: Settings = field(default_factory=Settings)
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any], **fields: Any) -> "AppConfig":
+        """Config of parsed YAML; raises a ValidationError for invalid settings"""
+        return cls(data=data, settings=Settings.model_validate(data), **fields)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.data[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+ReloadListener = Callable[[AppConfig], Optional[Awaitable[None]]]
+
+class ConfigStore:
+    """
+    Holds the current AppConfig, loaded once instead of on every request.
+
+    `reload()` re-parses the file off the event loop and swaps the new
+    config in; a file that fails to parse leaves the current one in place.
+    Once started, reloads are triggered by SIGHUP and, if the
+    `config_reload.watch_interval` setting is non-zero, by changes to the
+    file's modification time. Components that read settings only at startup
+    can subscribe with `on_reload` to apply new values.
+    """
+    def __init__(self, path: str = CONFIG_PATH):
+        self.path = path
+        self.version = 0
+        self._config: Optional[AppConfig] = None
+        self._listeners: List[ReloadListener] = []
+        self._watch_task: Optional[asyncio.Task] = None
+        self._signal_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _read(self) -> AppConfig:
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, "r") as f:
+            data = yaml.safe_load(f) or {}
+        return AppConfig.from_data(data, path=self.path, mtime=mtime, version=self.version + 1)
+
+    def get(self) -> AppConfig:
+        """The current config, read from disk on first use"""
+        if self._config is None:
+            self._config = self._read()
+            self.version = self._config.version
+        return self._config
+
+    def on_reload(self, listener: ReloadListener):
+        self._listeners.append(listener)
+
+    async def reload(self) -> bool:
+        """Re-read the file and swap in the new config; returns whether it was replaced"""
+        try:
+            config = await asyncio.to_thread(self._read)
+        except Exception as e:
+            logger.error(f"Failed to reload {self.path}, keeping the current config: {str(e)}")
+            return False
+        self._config = config
+        self.version = config.version
+        logger.info(f"Reloaded {self.path} (version {config.version})")
+        for listener in self._listeners:
+            try:
+                result = listener(config)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Failed to apply reloaded config: {str(e)}")
+        return True
+
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError as e:
+                logger.error(f"Failed to check {self.path} for changes: {str(e)}")
+                continue
+            if mtime != self.get().mtime:
+                await self.reload()
+
+    async def start(self):
+        """Reload on SIGHUP and, when configured, on changes to the file"""
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(self.reload()))
+            self._signal_loop = loop
+        except (NotImplementedError, AttributeError, RuntimeError):
+            # No SIGHUP on Windows, and no handlers outside the main thread
+            logger.info("SIGHUP config reload is not available")
+        interval = self.get().settings.config_reload.watch_interval
+        if interval and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch(interval))
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+        if self._signal_loop is not None:
+            self._signal_loop.remove_signal_handler(signal.SIGHUP)
+            self._signal_loop = None
+
+# Shared by every module reading config.yaml
+config_store = ConfigStore()
+
+def get_config() -> AppConfig:
+    """The current configuration"""
+    return config_store.get()
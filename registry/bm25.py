@@ -0,0 +1,109 @@
+import heapq
+import math
+from collections import Counter
+from operator import itemgetter
+from typing import Dict, List, Optional, Set, Tuple
+
+from .index import tokenize
+
+class BM25Index:
+    """
+    BM25 ranking over several agent fields with per-field boosts.
+
+    Term frequencies are length-normalized per field, weighted by the field
+    boost and summed before BM25 saturation (the BM25F scheme), so a term
+    found in a boosted field counts more without being double-saturated.
+    Only the best `k` matches are kept, through a bounded heap.
+    """
+    def __init__(self, field_boosts: Dict[str, float], k1: float = 1.2, b: float = 0.75):
+        self.fields = list(field_boosts)
+        self.boosts = [field_boosts[field] for field in self.fields]
+        self.k1 = k1
+        self.b = b
+        # term -> {agent_id: term frequency per field}
+        self.postings: Dict[str, Dict[str, List[int]]] = {}
+        # agent_id -> token count per field
+        self.lengths: Dict[str, List[int]] = {}
+        # agent_id -> indexed terms, needed to remove stale postings on update/delete
+        self.terms: Dict[str, List[str]] = {}
+        self.total_lengths = [0] * len(self.fields)
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add(self, agent_id: str, field_texts: Dict[str, Optional[str]]):
+        """Index (or re-index) the fields of an agent"""
+        self.remove(agent_id)
+        lengths = []
+        frequencies: Dict[str, List[int]] = {}
+        for position, field in enumerate(self.fields):
+            tokens = tokenize(field_texts.get(field))
+            lengths.append(len(tokens))
+            for term, count in Counter(tokens).items():
+                frequencies.setdefault(term, [0] * len(self.fields))[position] = count
+
+        self.lengths[agent_id] = lengths
+        self.terms[agent_id] = list(frequencies)
+        for position, length in enumerate(lengths):
+            self.total_lengths[position] += length
+        for term, counts in frequencies.items():
+            self.postings.setdefault(term, {})[agent_id] = counts
+
+    def remove(self, agent_id: str):
+        lengths = self.lengths.pop(agent_id, None)
+        if lengths is None:
+            return
+        for position, length in enumerate(lengths):
+            self.total_lengths[position] -= length
+        for term in self.terms.pop(agent_id):
+            posting = self.postings[term]
+            del posting[agent_id]
+            if not posting:
+                del self.postings[term]
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        candidates: Optional[Set[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Return up to k (agent_id, score) pairs matching any query term, best
+        first. When `candidates` is given only those agents are scored.
+        """
+        terms = set(tokenize(query))
+        total = len(self.lengths)
+        if k <= 0 or not terms or not total:
+            return []
+
+        averages = [length / total for length in self.total_lengths]
+        scores: Dict[str, float] = {}
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (total - len(posting) + 0.5) / (len(posting) + 0.5))
+
+            if candidates is None:
+                agent_ids = posting.keys()
+            elif len(candidates) < len(posting):
+                agent_ids = [agent_id for agent_id in candidates if agent_id in posting]
+            else:
+                agent_ids = [agent_id for agent_id in posting if agent_id in candidates]
+
+            for agent_id in agent_ids:
+                lengths = self.lengths[agent_id]
+                weighted = 0.0
+                for position, frequency in enumerate(posting[agent_id]):
+                    if frequency:
+                        norm = 1 - self.b + self.b * lengths[position] / averages[position]
+                        weighted += self.boosts[position] * frequency / norm
+                scores[agent_id] = scores.get(agent_id, 0.0) + idf * weighted / (self.k1 + weighted)
+
+        return heapq.nlargest(k, scores.items(), key=itemgetter(1))
+
+    def clear(self):
+        self.postings.clear()
+        self.lengths.clear()
+        self.terms.clear()
+        self.total_lengths = [0] * len(self.fields)
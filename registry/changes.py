@@ -0,0 +1,77 @@
+import asyncio
+from typing import List, Optional
+
+from .models import Agent, ChangeType, ChangeEvent
+
+class ChangeFeed:
+    """
+    Monotonically versioned log of registry changes.
+
+    Every register, update and delete is appended with the next version, so
+    a client holding a copy of the registry at some version only needs the
+    events after it. The most recent `max_events` events are retained; a
+    client further behind must reload the full registry.
+    """
+    def __init__(self, max_events: int = 100000):
+        self.max_events = max_events
+        self.events: List[ChangeEvent] = []
+        self.version = 0
+        # Replaced on every append; waiters hold the one that gets set
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    @property
+    def oldest_version(self) -> int:
+        """Version of the oldest retained event"""
+        return self.events[0].version if self.events else self.version + 1
+
+    def append(self, change_type: ChangeType, agent_id: str, agent: Optional[Agent] = None) -> ChangeEvent:
+        self.version += 1
+        event = ChangeEvent(version=self.version, type=change_type, agent_id=agent_id, agent=agent)
+        self.events.append(event)
+        # Trim in chunks so appends stay amortized O(1)
+        if len(self.events) >= 2 * self.max_events:
+            del self.events[:len(self.events) - self.max_events]
+
+        self._notify()
+        return event
+
+    def advance(self, version: int):
+        """
+        Record that changes up to `version` were made in a change log kept
+        elsewhere (shared by several processes), waking the waiters
+        """
+        if version > self.version:
+            self.version = version
+            self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def since(self, version: int, limit: int) -> Optional[List[ChangeEvent]]:
+        """
+        Return up to `limit` events after `version`, oldest first, or None
+        when the events right after it are no longer retained (or `version`
+        was never issued, e.g. before a restart).
+        """
+        if version > self.version or version < self.oldest_version - 1:
+            return None
+        # Versions are contiguous, so the first event after `version` is found by offset
+        start = version - self.oldest_version + 1
+        return self.events[start:start + limit]
+
+    async def wait(self, version: int, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for an event after `version`"""
+        if self.version > version:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def clear(self):
+        self.events.clear()
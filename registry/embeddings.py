@@ -0,0 +1,64 @@
+import hashlib
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .index import tokenize
+
+@lru_cache(maxsize=65536)
+def _feature_slot(feature: str, dimensions: int) -> Tuple[int, float]:
+    """Hash a feature to a (bucket, sign) pair, stable across processes"""
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    sign = 1.0 if value & 1 else -1.0
+    return (value >> 1) % dimensions, sign
+
+class HashingEmbedder:
+    """
+    Deterministic local text embedder using the hashing trick.
+
+    Words and their character n-grams are hashed into a fixed number of
+    signed buckets and the resulting vector is L2-normalized, so cosine
+    similarity reflects shared vocabulary and spelling. No model download or
+    network access is needed, and the same text always yields the same
+    vector in every process.
+    """
+    def __init__(self, dimensions: int = 256, ngram_size: int = 3, word_weight: float = 2.0):
+        self.dimensions = dimensions
+        self.ngram_size = ngram_size
+        self.word_weight = word_weight
+
+    def _features(self, text: Optional[str]) -> List[Tuple[str, float]]:
+        features = []
+        for token in tokenize(text):
+            features.append((f"w:{token}", self.word_weight))
+            padded = f"<{token}>"
+            for i in range(max(len(padded) - self.ngram_size + 1, 1)):
+                features.append((f"c:{padded[i:i + self.ngram_size]}", 1.0))
+        return features
+
+    def embed(self, text: Optional[str]) -> np.ndarray:
+        """Embed a text into a unit-length float32 vector (all zeros for empty text)"""
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, weight in self._features(text):
+            slot, sign = _feature_slot(feature, self.dimensions)
+            vector[slot] += sign * weight
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def embed_batch(self, texts: List[Optional[str]]) -> np.ndarray:
+        """Embed several texts into a (len(texts), dimensions) float32 matrix"""
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            matrix[row] = self.embed(text)
+        return matrix
+
+def agent_document(agent) -> str:
+    """Text of an agent that its embedding is computed from"""
+    parts = [agent.display_name, agent.description or ""]
+    parts.extend(agent.skills)
+    parts.extend(agent.tools)
+    return " ".join(parts)
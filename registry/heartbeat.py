@@ -0,0 +1,110 @@
+import heapq
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+class HeartbeatTracker:
+    """
+    Coalesces agent heartbeats and finds agents that stopped sending them.
+
+    Heartbeats only record the latest timestamp per agent; `flush()` hands
+    the pending timestamps over in one batch, however many heartbeats were
+    received in between. Expiry deadlines are kept in a min-heap holding at
+    most one entry per agent, so `sweep()` only touches agents whose
+    deadline has passed instead of scanning the whole registry. An entry
+    popped for an agent that has beaten since is simply rescheduled.
+    """
+    def __init__(self, stale_after: float = 0, expire_after: float = 0):
+        # Seconds without heartbeat before an agent is stale / removed; 0 disables
+        self.stale_after = stale_after
+        self.expire_after = expire_after
+        # Latest heartbeat per agent, in time.monotonic() seconds
+        self.last_beat: Dict[str, float] = {}
+        self.pending: Dict[str, datetime] = {}
+        self.stale: Set[str] = set()
+        self.deadlines: List[Tuple[float, str]] = []
+        self.scheduled: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.last_beat)
+
+    def _first_deadline(self, beat: float) -> Optional[float]:
+        if self.stale_after:
+            return beat + self.stale_after
+        if self.expire_after:
+            return beat + self.expire_after
+        return None
+
+    def _schedule(self, agent_id: str, deadline: Optional[float]):
+        if deadline is None:
+            self.scheduled.discard(agent_id)
+            return
+        heapq.heappush(self.deadlines, (deadline, agent_id))
+        self.scheduled.add(agent_id)
+
+    def track(self, agent_id: str, beat: Optional[float] = None, stale: bool = False):
+        """Start tracking an agent whose last heartbeat was at `beat` (default now)"""
+        beat = time.monotonic() if beat is None else beat
+        self.last_beat[agent_id] = beat
+        if stale:
+            self.stale.add(agent_id)
+        else:
+            self.stale.discard(agent_id)
+        if agent_id not in self.scheduled:
+            self._schedule(agent_id, self._first_deadline(beat))
+
+    def beat(self, agent_id: str, seen_at: datetime) -> bool:
+        """
+        Record a heartbeat to be flushed later. Returns True if the agent
+        was stale until now.
+        """
+        was_stale = agent_id in self.stale
+        self.track(agent_id)
+        self.pending[agent_id] = seen_at
+        return was_stale
+
+    def forget(self, agent_id: str):
+        """Stop tracking an agent; its heap entry is dropped when popped"""
+        self.last_beat.pop(agent_id, None)
+        self.pending.pop(agent_id, None)
+        self.stale.discard(agent_id)
+
+    def flush(self) -> Dict[str, datetime]:
+        """Return and clear the heartbeats received since the last flush"""
+        pending, self.pending = self.pending, {}
+        return pending
+
+    def sweep(self, now: Optional[float] = None) -> Tuple[List[str], List[str]]:
+        """Return the (newly stale, expired) agents whose deadline has passed"""
+        now = time.monotonic() if now is None else now
+        newly_stale, expired = [], []
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, agent_id = heapq.heappop(self.deadlines)
+            self.scheduled.discard(agent_id)
+            beat = self.last_beat.get(agent_id)
+            if beat is None:
+                continue
+
+            if self.stale_after and agent_id not in self.stale:
+                if beat + self.stale_after > now:
+                    self._schedule(agent_id, beat + self.stale_after)
+                    continue
+                self.stale.add(agent_id)
+                newly_stale.append(agent_id)
+
+            if not self.expire_after:
+                continue
+            if beat + self.expire_after > now:
+                self._schedule(agent_id, beat + self.expire_after)
+                continue
+            expired.append(agent_id)
+            self.forget(agent_id)
+
+        return newly_stale, expired
+
+    def clear(self):
+        self.last_beat.clear()
+        self.pending.clear()
+        self.stale.clear()
+        self.deadlines.clear()
+        self.scheduled.clear()
@@ -0,0 +1,97 @@
+import re
+from typing import Dict, Hashable, Iterable, List, Optional, Set
+
+# Word characters without the underscore, so "agent_search" yields two tokens
+_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into lowercase word tokens"""
+    if not text:
+        return []
+    return _TOKEN_PATTERN.findall(text.lower())
+
+class FieldIndex:
+    """
+    Value -> agent ID sets for a single agent attribute, so filters resolve
+    to set lookups instead of per-agent checks
+    """
+    def __init__(self):
+        self.postings: Dict[Hashable, Set[str]] = {}
+        # Values indexed per agent, needed to remove stale postings on update/delete
+        self.documents: Dict[str, Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, agent_id: str, values: Iterable[Hashable]):
+        """Index (or re-index) the attribute values of an agent"""
+        self.remove(agent_id)
+        values = set(values)
+        self.documents[agent_id] = values
+        for value in values:
+            self.postings.setdefault(value, set()).add(agent_id)
+
+    def remove(self, agent_id: str):
+        """Drop an agent from the postings of every value it had"""
+        values = self.documents.pop(agent_id, None)
+        if not values:
+            return
+        for value in values:
+            posting = self.postings.get(value)
+            if posting is None:
+                continue
+            posting.discard(agent_id)
+            if not posting:
+                del self.postings[value]
+
+    def any_of(self, values: Iterable[Hashable]) -> Set[str]:
+        """Return the IDs of agents having at least one of the values"""
+        matches = set()
+        for value in values:
+            matches |= self.postings.get(value, set())
+        return matches
+
+    def clear(self):
+        self.postings.clear()
+        self.documents.clear()
+
+class InvertedIndex(FieldIndex):
+    """
+    Token -> agent ID posting lists used to answer text queries without
+    scanning every registered agent; a field index over the tokens of the
+    agents' text
+    """
+    def add(self, agent_id: str, text: str):
+        """Index (or re-index) the text of an agent"""
+        super().add(agent_id, tokenize(text))
+
+    def search(self, query: str) -> Set[str]:
+        """
+        Return the IDs of agents containing every token of the query.
+
+        Posting lists are intersected smallest-first so the cost is bounded
+        by the rarest token rather than by the size of the registry.
+        """
+        tokens = set(tokenize(query))
+        if not tokens:
+            return set(self.documents)
+
+        postings = []
+        for token in tokens:
+            posting = self.postings.get(token)
+            if not posting:
+                return set()
+            postings.append(posting)
+        return intersect(postings)
+
+def intersect(sets: List[Set[str]]) -> Set[str]:
+    """Intersect ID sets smallest-first"""
+    if not sets:
+        return set()
+    sets = sorted(sets, key=len)
+    result = set(sets[0])
+    for other in sets[1:]:
+        result &= other
+        if not result:
+            break
+    return result
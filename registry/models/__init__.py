@@ -0,0 +1,11 @@
+from .agent import Agent, Protocol
+from .search import SearchQuery, SearchEngine, ScoredAgent
+from .bulk import BulkMode, BulkRegistration, BulkRegistrationError, BulkRegistrationResult, BatchGetRequest, BatchGetResult, HeartbeatRequest, HeartbeatResult
+from .changes import ChangeType, ChangeEvent, ChangeFeedPage
+
+__all__ = [
+    "Agent", "Protocol", "SearchQuery", "SearchEngine", "ScoredAgent",
+    "BulkMode", "BulkRegistration", "BulkRegistrationError", "BulkRegistrationResult",
+    "BatchGetRequest", "BatchGetResult", "HeartbeatRequest", "HeartbeatResult",
+    "ChangeType", "ChangeEvent", "ChangeFeedPage"
+]
\ No newline at end of file
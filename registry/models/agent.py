@@ -23,4 +23,6 @@ class Agent(BaseModel):
     registered_at: datetime = Field(default_factory=datetime.now, description="Timestamp of agent registration")
     last_seen: datetime = Field(default_factory=datetime.now, description="Timestamp of the last heartbeat or activity")
     public: bool = Field(default=True, description="Indicates if the agent is publicly discoverable")
-    custom_metadata: Dict[str, Any] = Field(default_factory=dict, description="Protocol-specific metadata")
\ No newline at end of file
+    stale: bool = Field(default=False, description="Set once the agent has missed heartbeats for longer than the registry TTL")
+    custom_metadata: Dict[str, Any] = Field(default_factory=dict, description="Protocol-specific metadata")
+    version: int = Field(default=1, description="Revision of the agent, incremented by every update; set by the registry")
\ No newline at end of file
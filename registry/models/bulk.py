@@ -0,0 +1,35 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List
+from enum import Enum
+from .agent import Agent
+
+class BulkMode(str, Enum):
+    ATOMIC = "atomic"
+    BEST_EFFORT = "best_effort"
+
+class BulkRegistration(BaseModel):
+    # Validated one by one, so an invalid agent is only rejected on its own in best-effort mode
+    agents: List[Dict[str, Any]] = Field(..., description="Agents to register")
+    mode: BulkMode = Field(default=BulkMode.ATOMIC, description="Register all agents or none (atomic), or every valid one (best_effort)")
+
+class BulkRegistrationError(BaseModel):
+    id: str = Field(..., description="ID of the rejected agent")
+    detail: str = Field(..., description="Reason the agent was rejected")
+
+class BulkRegistrationResult(BaseModel):
+    registered: List[str] = Field(default=[], description="IDs of the registered agents")
+    errors: List[BulkRegistrationError] = Field(default=[], description="Agents that were not registered")
+
+class BatchGetRequest(BaseModel):
+    ids: List[str] = Field(..., description="Agent IDs to retrieve")
+
+class BatchGetResult(BaseModel):
+    agents: List[Agent] = Field(default=[], description="Found agents, in request order")
+    missing: List[str] = Field(default=[], description="Requested IDs that are not registered")
+
+class HeartbeatRequest(BaseModel):
+    ids: List[str] = Field(..., description="IDs of the agents reporting as alive")
+
+class HeartbeatResult(BaseModel):
+    accepted: List[str] = Field(default=[], description="IDs whose heartbeat was recorded")
+    unknown: List[str] = Field(default=[], description="IDs that are not registered")
@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+from enum import Enum
+from .agent import Agent
+
+class ChangeType(str, Enum):
+    REGISTERED = "registered"
+    UPDATED = "updated"
+    DELETED = "deleted"
+
+class ChangeEvent(BaseModel):
+    version: int = Field(..., description="Position of the change in the registry change log")
+    type: ChangeType = Field(..., description="Kind of change")
+    agent_id: str = Field(..., description="ID of the changed agent")
+    agent: Optional[Agent] = Field(None, description="Agent after the change, omitted for deletions")
+    timestamp: datetime = Field(default_factory=datetime.now, description="Time of the change")
+
+class ChangeFeedPage(BaseModel):
+    version: int = Field(..., description="Version to pass as `since` to get the following changes")
+    events: List[ChangeEvent] = Field(default=[], description="Changes after the requested version, oldest first")
+    more: bool = Field(default=False, description="Whether more changes are available right away")
@@ -1,7 +1,21 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
-from .agent import Protocol
+from enum import Enum
+from .agent import Agent, Protocol
+
+class SearchEngine(str, Enum):
+    INDEX = "index"
+    SUBSTRING = "substring"
+    VECTOR = "vector"
+    BM25 = "bm25"
+    FUZZY = "fuzzy"
+    PGVECTOR = "pgvector"
 
 class SearchQuery(BaseModel):
     query: str
-    filters: Optional[Dict[str, Any]] = None
\ No newline at end of file
+    filters: Optional[Dict[str, Any]] = None
+    engine: SearchEngine = Field(default=SearchEngine.INDEX, description="Search strategy used to match agents")
+    limit: Optional[int] = Field(None, ge=1, description="Maximum number of agents to return")
+
+class ScoredAgent(Agent):
+    score: Optional[float] = Field(None, description="Relevance of the agent to the search query, higher is better")
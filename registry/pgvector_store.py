@@ -0,0 +1,233 @@
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+import logging
+
+import asyncpg
+import numpy as np
+from pgvector.asyncpg import register_vector
+
+from .models import Agent
+from .embeddings import HashingEmbedder, agent_document
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Array columns filtered with the any-of overlap operator
+ARRAY_FILTER_COLUMNS = ("languages", "tools", "skills")
+
+# Largest hnsw.ef_search pgvector accepts
+MAX_EF_SEARCH = 1000
+
+class PgVectorIndex:
+    """
+    Agent embeddings stored in a pgvector column with an approximate
+    nearest-neighbour index (HNSW or IVFFlat).
+
+    Filterable agent attributes are stored next to the embedding so the
+    protocol, language, tool and skill filters run inside the same SQL query
+    as the nearest-neighbour search.
+    """
+    def __init__(
+        self,
+        dsn: str,
+        embedder: Optional[HashingEmbedder] = None,
+        table: str = "agent_embeddings",
+        index_type: str = "hnsw",
+        ef_search: int = 64,
+        ivfflat_lists: int = 100,
+        ivfflat_probes: int = 10,
+        min_pool_size: int = 1,
+        max_pool_size: int = 10,
+    ):
+        if index_type not in ("hnsw", "ivfflat"):
+            raise ValueError(f"Unsupported pgvector index type: {index_type}")
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        self.dsn = dsn
+        self.embedder = embedder or HashingEmbedder()
+        self.table = table
+        self.index_type = index_type
+        self.ef_search = ef_search
+        self.ivfflat_lists = ivfflat_lists
+        self.ivfflat_probes = ivfflat_probes
+        self.min_pool_size = min_pool_size
+        self.max_pool_size = max_pool_size
+        self.pool: Optional[asyncpg.Pool] = None
+
+    async def _init_connection(self, conn: asyncpg.Connection):
+        await register_vector(conn)
+
+    async def connect(self):
+        """Create the connection pool and make sure the schema exists"""
+        # The extension must exist before register_vector can look up the type
+        conn = await asyncpg.connect(self.dsn)
+        try:
+            await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        finally:
+            await conn.close()
+
+        self.pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=self.min_pool_size,
+            max_size=self.max_pool_size,
+            init=self._init_connection,
+        )
+        await self.create_schema()
+        logger.info(f"Connected pgvector agent index ({self.index_type}) on table {self.table}")
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def create_schema(self):
+        """Create the embeddings table and its vector and filter indexes"""
+        if self.index_type == "hnsw":
+            vector_index = (
+                f"CREATE INDEX IF NOT EXISTS {self.table}_embedding_idx ON {self.table} "
+                f"USING hnsw (embedding vector_cosine_ops)"
+            )
+        else:
+            vector_index = (
+                f"CREATE INDEX IF NOT EXISTS {self.table}_embedding_idx ON {self.table} "
+                f"USING ivfflat (embedding vector_cosine_ops) WITH (lists = {int(self.ivfflat_lists)})"
+            )
+
+        async with self.pool.acquire() as conn:
+            await conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    agent_id TEXT PRIMARY KEY,
+                    protocol TEXT NOT NULL,
+                    public BOOLEAN NOT NULL DEFAULT TRUE,
+                    languages TEXT[] NOT NULL DEFAULT '{{}}',
+                    tools TEXT[] NOT NULL DEFAULT '{{}}',
+                    skills TEXT[] NOT NULL DEFAULT '{{}}',
+                    embedding vector({self.embedder.dimensions}) NOT NULL
+                )
+            """)
+            await conn.execute(vector_index)
+            await conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_protocol_idx ON {self.table} (protocol)")
+            for column in ARRAY_FILTER_COLUMNS:
+                await conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {self.table}_{column}_idx ON {self.table} USING gin ({column})"
+                )
+
+    def _row(self, agent: Agent) -> Tuple:
+        return (
+            agent.id,
+            agent.protocol.value,
+            agent.public,
+            list(agent.languages),
+            list(agent.tools),
+            list(agent.skills),
+            self.embedder.embed(agent_document(agent)),
+        )
+
+    def _upsert_sql(self) -> str:
+        return f"""
+            INSERT INTO {self.table} (agent_id, protocol, public, languages, tools, skills, embedding)
+            VALUES ($1, $2, $3, $4, $5, $6, $7)
+            ON CONFLICT (agent_id) DO UPDATE SET
+                protocol = EXCLUDED.protocol,
+                public = EXCLUDED.public,
+                languages = EXCLUDED.languages,
+                tools = EXCLUDED.tools,
+                skills = EXCLUDED.skills,
+                embedding = EXCLUDED.embedding
+        """
+
+    async def upsert(self, agent: Agent):
+        """Insert or refresh the embedding and filter columns of an agent"""
+        async with self.pool.acquire() as conn:
+            await conn.execute(self._upsert_sql(), *self._row(agent))
+
+    async def upsert_many(self, agents: Iterable[Agent]):
+        """Insert or refresh several agents in one batched round trip"""
+        rows = [self._row(agent) for agent in agents]
+        if not rows:
+            return
+        async with self.pool.acquire() as conn:
+            await conn.executemany(self._upsert_sql(), rows)
+
+    async def delete(self, agent_id: str):
+        async with self.pool.acquire() as conn:
+            await conn.execute(f"DELETE FROM {self.table} WHERE agent_id = $1", agent_id)
+
+    async def reconcile(self, agents: Iterable[Agent]):
+        """
+        Bring the table in line with the given agents without emptying it:
+        rows that are missing or differ are upserted and rows of other agents
+        are deleted, so workers starting while others serve searches never
+        expose an empty table. Concurrent reconciles are serialized with a
+        transaction-scoped advisory lock.
+        """
+        rows = [self._row(agent) for agent in agents]
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", self.table)
+                if rows:
+                    await conn.executemany(
+                        self._upsert_sql() + f"""
+            WHERE ({self.table}.protocol, {self.table}.public, {self.table}.languages,
+                   {self.table}.tools, {self.table}.skills, {self.table}.embedding)
+            IS DISTINCT FROM (EXCLUDED.protocol, EXCLUDED.public, EXCLUDED.languages,
+                              EXCLUDED.tools, EXCLUDED.skills, EXCLUDED.embedding)
+                        """,
+                        rows
+                    )
+                await conn.execute(
+                    f"DELETE FROM {self.table} WHERE agent_id <> ALL($1::text[])",
+                    [row[0] for row in rows]
+                )
+
+    async def search(
+        self,
+        query: str,
+        filters: Optional[Dict[str, List[Any]]] = None,
+        limit: int = 10,
+    ) -> List[Tuple[str, float]]:
+        """
+        Return up to `limit` (agent_id, similarity) pairs nearest to the query,
+        best first. Similarity is the cosine similarity in [-1, 1].
+
+        `filters` maps protocol/public/languages/tools/skills to the accepted
+        values; each filter matches any of its values and filters are ANDed.
+        """
+        embedding = self.embedder.embed(query)
+        if not np.any(embedding):
+            return []
+
+        params: List[Any] = [embedding]
+        conditions = []
+        for field, values in (filters or {}).items():
+            params.append(list(values))
+            if field in ARRAY_FILTER_COLUMNS:
+                conditions.append(f"{field} && ${len(params)}::text[]")
+            elif field == "protocol":
+                conditions.append(f"protocol = ANY(${len(params)}::text[])")
+            elif field == "public":
+                conditions.append(f"public = ANY(${len(params)}::boolean[])")
+            else:
+                raise ValueError(f"Unsupported pgvector filter: {field}")
+        params.append(limit)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = f"""
+            SELECT agent_id, 1 - (embedding <=> $1) AS similarity
+            FROM {self.table}
+            {where}
+            ORDER BY embedding <=> $1
+            LIMIT ${len(params)}
+        """
+
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                # Widen the candidate list so filtered queries still fill `limit`,
+                # up to the largest candidate list pgvector accepts
+                if self.index_type == "hnsw":
+                    ef_search = min(max(int(self.ef_search), int(limit)), MAX_EF_SEARCH)
+                    await conn.execute(f"SET LOCAL hnsw.ef_search = {ef_search}")
+                else:
+                    await conn.execute(f"SET LOCAL ivfflat.probes = {int(self.ivfflat_probes)}")
+                rows = await conn.fetch(sql, *params)
+
+        return [(row["agent_id"], float(row["similarity"])) for row in rows]
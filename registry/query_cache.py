@@ -0,0 +1,57 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+class QueryCache:
+    """
+    LRU cache of search results tagged with the generation they were computed at.
+
+    Callers pass the current generation on every lookup; an entry from an
+    older generation is a miss and is dropped, so bumping the generation
+    invalidates every cached result at once without touching the entries.
+    Once `max_entries` are cached the least recently used one is evicted.
+    A cache with `max_entries` of 0 is disabled.
+    """
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Hashable, Tuple[int, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable, generation: int) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != generation:
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, generation: int, value: Any):
+        if self.max_entries <= 0:
+            return
+        self.entries[key] = (generation, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def resize(self, max_entries: int):
+        """Change the capacity, evicting the least recently used entries beyond it"""
+        self.max_entries = max_entries
+        while len(self.entries) > max(max_entries, 0):
+            self.entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def clear(self):
+        self.entries.clear()
@@ -0,0 +1,157 @@
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+import sys
+
+from .models import Agent
+
+# Distinct tag tuples, shared by every agent with the same tools, skills or
+# languages. Entries outlive their agents and tags are chosen by clients, so
+# the table is bounded; once full, new combinations are stored unshared.
+MAX_TAG_SETS = 10000
+_tag_sets: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return None if value is None else sys.intern(value)
+
+def _tags(values: Iterable[str]) -> Tuple[str, ...]:
+    """Dictionary-encode a list of tags as one shared tuple of interned strings"""
+    tags = tuple(values)
+    if not tags:
+        return ()
+    # Known combinations need no interning
+    shared = _tag_sets.get(tags)
+    if shared is not None:
+        return shared
+    tags = tuple(sys.intern(value) for value in tags)
+    if len(_tag_sets) < MAX_TAG_SETS:
+        _tag_sets[tags] = tags
+    return tags
+
+class AgentRecord:
+    """
+    Compact in-memory form of an Agent, kept in the registry cache.
+
+    Fields are read and assigned like the model's, but are stored in slots
+    rather than a per-instance dict with pydantic's bookkeeping. Tags are
+    interned and shared between agents with the same values, room IDs and
+    owners are interned, and empty metadata is not stored. Pydantic models
+    are only built at the API boundary, by `to_agent`.
+
+    The JSON encoding of the agent is cached once requested, so responses
+    can be assembled from it without serializing the agent again. Records
+    are replaced when an agent is updated; the fields changed in place by
+    heartbeats, `last_seen` and `stale`, drop the cached encoding.
+    """
+    __slots__ = (
+        "id", "matrix_id", "display_name", "description", "protocol", "tools", "skills",
+        "languages", "endpoint_url", "room_ids", "owner", "registered_at", "_last_seen",
+        "public", "_stale", "_custom_metadata", "version", "_json",
+    )
+
+    def __init__(self, agent: Agent):
+        self._json = None
+        self.id = agent.id
+        self.matrix_id = agent.matrix_id
+        self.display_name = agent.display_name
+        self.description = agent.description
+        # Enum members are singletons already
+        self.protocol = agent.protocol
+        self.tools = _tags(agent.tools)
+        self.skills = _tags(agent.skills)
+        self.languages = _tags(agent.languages)
+        # The validated URL, so serializing the record needs no conversion back
+        self.endpoint_url = agent.endpoint_url
+        self.room_ids = tuple(sys.intern(room_id) for room_id in agent.room_ids)
+        self.owner = _intern(agent.owner)
+        self.registered_at = agent.registered_at
+        self.last_seen = agent.last_seen
+        self.public = agent.public
+        self.stale = agent.stale
+        self._custom_metadata = agent.custom_metadata or None
+        self.version = agent.version
+
+    @classmethod
+    def from_fields(cls, fields: Dict[str, Any]) -> "AgentRecord":
+        """
+        Record of already validated field values in the form the model holds
+        them, e.g. read back from storage, without building the model.
+        Missing fields take the model's defaults.
+        """
+        missing = Agent.model_fields.keys() - fields.keys()
+        if missing:
+            fields = {
+                **{name: Agent.model_fields[name].get_default(call_default_factory=True) for name in missing},
+                **fields,
+            }
+        # The constructor only reads the fields as attributes
+        return cls(SimpleNamespace(**fields))
+
+    @classmethod
+    def of(cls, agent: Union[Agent, "AgentRecord"]) -> "AgentRecord":
+        """Compact an agent, passing records through unchanged"""
+        return agent if isinstance(agent, AgentRecord) else cls(agent)
+
+    def copy(self) -> "AgentRecord":
+        """An independent record with the same fields; tags and strings stay shared"""
+        record = AgentRecord.__new__(AgentRecord)
+        for slot in self.__slots__:
+            setattr(record, slot, getattr(self, slot))
+        return record
+
+    @property
+    def last_seen(self) -> datetime:
+        return self._last_seen
+
+    @last_seen.setter
+    def last_seen(self, value: datetime):
+        self._last_seen = value
+        self._json = None
+
+    @property
+    def stale(self) -> bool:
+        return self._stale
+
+    @stale.setter
+    def stale(self, value: bool):
+        self._stale = value
+        self._json = None
+
+    @property
+    def custom_metadata(self) -> Dict[str, Any]:
+        return self._custom_metadata if self._custom_metadata is not None else {}
+
+    def fields(self) -> Dict[str, Any]:
+        """Field values in the form the Agent model holds them"""
+        return {
+            "id": self.id,
+            "matrix_id": self.matrix_id,
+            "display_name": self.display_name,
+            "description": self.description,
+            "protocol": self.protocol,
+            "tools": list(self.tools),
+            "skills": list(self.skills),
+            "languages": list(self.languages),
+            "endpoint_url": self.endpoint_url,
+            "room_ids": list(self.room_ids),
+            "owner": self.owner,
+            "registered_at": self.registered_at,
+            "last_seen": self.last_seen,
+            "public": self.public,
+            "stale": self.stale,
+            "custom_metadata": dict(self.custom_metadata),
+            "version": self.version,
+        }
+
+    def to_agent(self) -> Agent:
+        """Build the pydantic model; records are made from validated agents, so validation is skipped"""
+        return Agent.model_construct(**self.fields())
+
+    def json_bytes(self) -> bytes:
+        """JSON encoding of the agent as returned by the API, cached until the record changes"""
+        if self._json is None:
+            self._json = self.to_agent().model_dump_json().encode("utf-8")
+        return self._json
+
+    def __repr__(self) -> str:
+        return f"AgentRecord(id={self.id!r})"
@@ -1,13 +1,39 @@
-from fastapi import APIRouter, HTTPException, Depends, Body, Query, Path, status
-from typing import List, Dict, Any, Optional, Union
+from fastapi import APIRouter, HTTPException, Depends, Body, Query, Path, Header, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple, Union
 import os
 import json
 import logging
-from datetime import datetime
+import asyncio
+import time
+from datetime import datetime, timedelta
+import heapq
+import itertools
 import uuid
+import zlib
 
 # Import models from the models directory
-from .models import Agent, Protocol, SearchQuery
+from .models import (
+    Agent, Protocol, SearchQuery, SearchEngine, ScoredAgent,
+    BulkMode, BulkRegistration, BulkRegistrationError, BulkRegistrationResult,
+    BatchGetRequest, BatchGetResult, HeartbeatRequest, HeartbeatResult,
+    ChangeType, ChangeEvent, ChangeFeedPage
+)
+
+# Import search indexes
+from .index import InvertedIndex, FieldIndex, intersect, tokenize
+from .embeddings import HashingEmbedder, agent_document
+from .vector_index import VectorIndex
+from .bm25 import BM25Index
+from .trigram import TrigramIndex
+from .heartbeat import HeartbeatTracker
+from .changes import ChangeFeed
+from .records import AgentRecord
+from .query_cache import QueryCache
+
+# Shared configuration, loaded once and hot-reloadable
+from AutonomousSphere.config import AppConfig, StorageSettings, VectorSearchSettings, config_store, get_config
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,8 +42,439 @@ logger = logging.getLogger(__name__)
 # Initialize router
 router = APIRouter()
 
-# In-memory storage (replace with database in production)
-agents_registry = {}
+# In-memory storage of compact agent records, used as a read-through cache when a
+# persistent storage is configured; responses convert them back to Agent models
+agents_registry: Dict[str, AgentRecord] = {}
+
+# Persistent storage behind agents_registry, connected at startup when configured in config.yaml
+storage = None
+
+# Token index over agent names and descriptions, kept in sync with agents_registry
+text_index = InvertedIndex()
+
+# Attribute value -> agent ID indexes backing the list and search filters
+field_indexes: Dict[str, FieldIndex] = {
+    "protocol": FieldIndex(),
+    "public": FieldIndex(),
+    "tools": FieldIndex(),
+    "languages": FieldIndex(),
+    "skills": FieldIndex(),
+    "stale": FieldIndex(),
+}
+
+# Search filter keys and the indexed attribute each one applies to
+SEARCH_FILTER_FIELDS = {
+    "protocol": "protocol",
+    "language": "languages",
+    "languages": "languages",
+    "tools": "tools",
+    "skills": "skills",
+    "public": "public",
+}
+
+# Filter fields holding booleans; the others hold strings
+BOOLEAN_FILTER_FIELDS = {"public"}
+
+# Number of agents returned by the ranked engines when no limit is given
+DEFAULT_TOP_K = 10
+
+# Relative weight of each agent field in BM25 scoring
+BM25_FIELD_BOOSTS = {
+    "name": 3.0,
+    "skills": 2.0,
+    "tools": 2.0,
+    "description": 1.0,
+}
+
+# BM25 index over agent names, descriptions, skills and tools
+ranking_index = BM25Index(BM25_FIELD_BOOSTS)
+
+# pgvector-backed semantic index, connected at startup when enabled in config.yaml
+pgvector_index = None
+
+# Typo-tolerant index over agent names, skills and tools
+fuzzy_index = TrigramIndex()
+
+# Local embedder for the in-process vector engine
+embedder = HashingEmbedder()
+
+# In-process vector index, built on the first vector search and kept in sync afterwards
+embedded_index: Optional[VectorIndex] = None
+
+# Maximum number of agents accepted by a single bulk request
+MAX_BULK_AGENTS = 10000
+
+# Heartbeat coalescing and TTL deadlines, configured at startup from config.yaml
+heartbeats = HeartbeatTracker()
+
+# Background task flushing heartbeats and expiring agents
+_heartbeat_task: Optional[asyncio.Task] = None
+
+# Changes published by other worker processes sharing the storage, applied in order
+_peer_changes: asyncio.Queue = asyncio.Queue()
+
+# Background task applying _peer_changes to the in-memory registry
+_sync_task: Optional[asyncio.Task] = None
+
+# Versioned log of register, update and delete events for incremental sync. With a
+# storage keeping a shared change log, events are read from it instead and the
+# feed only tracks the latest version applied to the cache, waking long-polls.
+changes = ChangeFeed()
+
+# Longest long-poll accepted by the change feed, in seconds
+MAX_CHANGES_WAIT = 60
+
+# Seconds between keepalive comments on an idle change stream
+CHANGE_STREAM_KEEPALIVE = 15
+
+# Per-process tag of the versions of a local change feed, which restart with the
+# process, keeping list ETags from earlier runs from matching
+_etag_epoch = uuid.uuid4().hex[:8]
+
+# Generation of the heartbeat fields (last_seen, stale) of the cached agents,
+# bumped whenever they change; they change without a logged change
+_heartbeat_generation = 0
+
+# Generation of the search indexes, bumped whenever an agent is indexed or removed.
+# Heartbeats do not change search results, so they keep it.
+search_generation = 0
+
+# Search results by normalized query, valid while search_generation is unchanged;
+# sized at startup from config.yaml
+search_cache = QueryCache()
+
+# Registration sequence numbers, used to return indexed matches in registry order
+_registration_order: Dict[str, int] = {}
+_registration_counter = itertools.count()
+
+# Background build of the search indexes after loading the storage, and the
+# loaded agents it has not indexed yet
+_index_build: Optional[asyncio.Task] = None
+_unindexed: Set[str] = set()
+
+def _searchable_text(agent: AgentRecord) -> str:
+    """Text of an agent that is matched by search queries"""
+    return f"{agent.display_name} {agent.description or ''}"
+
+def _field_values(agent: AgentRecord) -> Dict[str, List[Any]]:
+    """Indexed attribute values of an agent, keyed like field_indexes"""
+    return {
+        "protocol": [agent.protocol.value],
+        "public": [agent.public],
+        "tools": agent.tools,
+        "languages": agent.languages,
+        "skills": agent.skills,
+        "stale": [agent.stale],
+    }
+
+def _ranked_fields(agent: AgentRecord) -> Dict[str, Optional[str]]:
+    """Agent fields scored by BM25, keyed like BM25_FIELD_BOOSTS"""
+    return {
+        "name": agent.display_name,
+        "description": agent.description,
+        "skills": " ".join(agent.skills),
+        "tools": " ".join(agent.tools),
+    }
+
+def _shared_change_log() -> bool:
+    return storage is not None and storage.shared_change_log
+
+def _list_etag() -> str:
+    """
+    Weak ETag of the agent list: the change version applied to the cache and
+    the generation of its heartbeat fields. Workers track heartbeats in their
+    own cache, so the ETag is tagged with the process even when the change
+    log is shared.
+    """
+    return f'W/"{_etag_epoch}-{changes.version}-{_heartbeat_generation}"'
+
+def _agent_etag(agent: AgentRecord) -> str:
+    """
+    ETag of an agent: its stored version, which If-Match is checked against,
+    and a checksum of its JSON, which also changes with heartbeats. Both are
+    derived from the agent itself, so every worker computes the same ETag.
+    """
+    return f'"{agent.version}-{zlib.crc32(agent.json_bytes()):08x}"'
+
+def _if_match_versions(header: Optional[str]) -> Optional[List[int]]:
+    """
+    Agent versions listed by an If-Match header, or None when it matches any
+    version (absent or *). Only the version part of the ETags is compared,
+    so heartbeats since the client's read do not fail its update; weak ETags
+    never match.
+    """
+    if not header or header.strip() == "*":
+        return None
+    versions = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith('"'):
+            version = tag.strip('"').split("-", 1)[0]
+            if version.isdigit():
+                versions.append(int(version))
+    return versions
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header lists the ETag, using weak comparison"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == opaque:
+            return True
+    return False
+
+class RawJSONResponse(Response):
+    """
+    JSON response whose body is already encoded, so FastAPI neither
+    validates it against the response_model nor serializes it again
+    """
+    media_type = "application/json"
+
+def _json_array(fragments: Iterable[bytes]) -> bytes:
+    return b"[" + b",".join(fragments) + b"]"
+
+def _scored_json(agent: AgentRecord, score: Optional[float]) -> bytes:
+    """Cached JSON of an agent with the score field of ScoredAgent appended"""
+    score_json = b"null" if score is None else json.dumps(float(score)).encode("utf-8")
+    return agent.json_bytes()[:-1] + b',"score":' + score_json + b"}"
+
+def _bump_search_generation():
+    global search_generation
+    search_generation += 1
+
+def _index_agent(agent: AgentRecord):
+    """Add an agent to the search indexes"""
+    _bump_search_generation()
+    _unindexed.discard(agent.id)
+    if agent.id not in _registration_order:
+        _registration_order[agent.id] = next(_registration_counter)
+    text_index.add(agent.id, _searchable_text(agent))
+    ranking_index.add(agent.id, _ranked_fields(agent))
+    fuzzy_index.add(agent.id, [agent.display_name, *agent.skills, *agent.tools])
+    for field, values in _field_values(agent).items():
+        field_indexes[field].add(agent.id, values)
+    if embedded_index is not None:
+        embedded_index.add(agent.id, embedder.embed(agent_document(agent)))
+    heartbeats.track(agent.id, _monotonic_beat(agent), stale=agent.stale)
+
+def _unindex_agent(agent_id: str):
+    """Remove an agent from the search indexes"""
+    _unindexed.discard(agent_id)
+    text_index.remove(agent_id)
+    ranking_index.remove(agent_id)
+    fuzzy_index.remove(agent_id)
+    for index in field_indexes.values():
+        index.remove(agent_id)
+    if embedded_index is not None:
+        embedded_index.remove(agent_id)
+    _registration_order.pop(agent_id, None)
+    heartbeats.forget(agent_id)
+    _bump_search_generation()
+
+def _monotonic_beat(agent: AgentRecord) -> float:
+    """Express the last_seen timestamp of an agent on the heartbeat tracker's monotonic clock"""
+    age = (datetime.now() - agent.last_seen).total_seconds()
+    return time.monotonic() - max(age, 0.0)
+
+def _set_stale(agent: AgentRecord, stale: bool) -> bool:
+    """Flip the stale flag of a cached agent without re-indexing its text; returns whether it changed"""
+    global _heartbeat_generation
+    if agent.stale == stale:
+        return False
+    agent.stale = stale
+    _heartbeat_generation += 1
+    field_indexes["stale"].add(agent.id, [stale])
+    return True
+
+def _filter_value(key: str, field: str, value: Any) -> Any:
+    """Normalize a filter value to the form stored in the field indexes"""
+    if isinstance(value, Protocol):
+        return value.value
+    # Values of another type could never match, and the pgvector query cannot bind them
+    if not isinstance(value, bool if field in BOOLEAN_FILTER_FIELDS else str):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, 
+                           detail=f"Unsupported value for filter {key}: {json.dumps(value, default=str)}")
+    return value
+
+def _normalized_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """
+    Map search filters to indexed fields and their accepted values, skipping
+    empty ones. Values other than strings, or booleans for public, are
+    rejected with a 422.
+    """
+    normalized = {}
+    for key, values in (filters or {}).items():
+        field = SEARCH_FILTER_FIELDS.get(key)
+        if field is None or values is None:
+            continue
+        if not isinstance(values, (list, tuple, set)):
+            values = [values]
+        elif not values:
+            continue
+        normalized.setdefault(field, []).extend(_filter_value(key, field, value) for value in values)
+    return normalized
+
+def _filter_candidates(filters: Optional[Dict[str, Any]]) -> Optional[Set[str]]:
+    """
+    Resolve filters to the set of matching agent IDs.
+
+    Each filter matches agents having any of its values, and the filters are
+    intersected with each other. Returns None when no filter applies.
+    """
+    normalized = _normalized_filters(filters)
+    if not normalized:
+        return None
+    return intersect([field_indexes[field].any_of(values) for field, values in normalized.items()])
+
+async def _pgvector_upsert(agent: Agent):
+    """Refresh the embedding of an agent in the pgvector index, if enabled"""
+    if pgvector_index is None:
+        return
+    try:
+        await pgvector_index.upsert(agent)
+    except Exception as e:
+        logger.error(f"Failed to index agent {agent.id} in pgvector: {str(e)}")
+
+async def _pgvector_upsert_many(agents: List[Agent]):
+    """Refresh the embeddings of several agents in the pgvector index, if enabled"""
+    if pgvector_index is None:
+        return
+    try:
+        await pgvector_index.upsert_many(agents)
+    except Exception as e:
+        logger.error(f"Failed to index {len(agents)} agents in pgvector: {str(e)}")
+
+async def _pgvector_delete(agent_id: str):
+    """Remove an agent from the pgvector index, if enabled"""
+    if pgvector_index is None:
+        return
+    try:
+        await pgvector_index.delete(agent_id)
+    except Exception as e:
+        logger.error(f"Failed to remove agent {agent_id} from pgvector: {str(e)}")
+
+def _in_registry_order(agent_ids, limit: Optional[int] = None) -> List[AgentRecord]:
+    """Resolve agent IDs to agents, ordered by registration; only the first `limit` when given"""
+    if limit:
+        ordered_ids = heapq.nsmallest(limit, agent_ids, key=_registration_order.__getitem__)
+    else:
+        ordered_ids = sorted(agent_ids, key=_registration_order.__getitem__)
+    return [agents_registry[agent_id] for agent_id in ordered_ids]
+
+def _get_embedded_index() -> VectorIndex:
+    """Return the in-process vector index, embedding every agent on first use"""
+    global embedded_index
+    if embedded_index is None:
+        agents = list(agents_registry.values())
+        index = VectorIndex(embedder.dimensions, initial_capacity=max(len(agents), 1024))
+        if agents:
+            index.add_batch(
+                [agent.id for agent in agents],
+                embedder.embed_batch([agent_document(agent) for agent in agents])
+            )
+        embedded_index = index
+    return embedded_index
+
+def _cache_agent(agent: Union[Agent, AgentRecord]):
+    """Store an agent in the in-memory registry and its indexes"""
+    record = AgentRecord.of(agent)
+    agents_registry[record.id] = record
+    _index_agent(record)
+
+def _evict_agent(agent_id: str):
+    """Drop an agent from the in-memory registry and its indexes"""
+    if agents_registry.pop(agent_id, None) is not None:
+        _unindex_agent(agent_id)
+
+async def _get_cached_agent(agent_id: str) -> Optional[AgentRecord]:
+    """Look up an agent in memory, reading through to the storage on a miss"""
+    record = agents_registry.get(agent_id)
+    if record is None and storage is not None:
+        agent = await storage.get(agent_id)
+        if agent is not None:
+            _cache_agent(agent)
+            record = agents_registry[agent_id]
+    return record
+
+def _clear_indexes():
+    global embedded_index
+    # Agent models stored directly are compacted first
+    for agent_id, agent in agents_registry.items():
+        agents_registry[agent_id] = AgentRecord.of(agent)
+    text_index.clear()
+    ranking_index.clear()
+    fuzzy_index.clear()
+    for index in field_indexes.values():
+        index.clear()
+    # Rebuilt lazily by the next vector search
+    embedded_index = None
+    _bump_search_generation()
+    _unindexed.clear()
+    _registration_order.clear()
+    heartbeats.clear()
+    # Numbered upfront, so agents registered while indexing still come after
+    for agent_id in agents_registry:
+        _registration_order[agent_id] = next(_registration_counter)
+
+def rebuild_indexes():
+    """Rebuild every search index from the contents of agents_registry"""
+    _clear_indexes()
+    for agent in agents_registry.values():
+        _index_agent(agent)
+
+async def _index_unindexed(chunk_size: int = 1000):
+    """
+    Index the agents in _unindexed without blocking the event loop: a
+    chunk at a time, yielding to other requests in between. Agents
+    registered, changed or removed meanwhile are indexed by their own
+    mutation and skipped here. Searches and filtered listings wait for
+    the build to finish.
+    """
+    pending = list(_unindexed)
+    for start in range(0, len(pending), chunk_size):
+        for agent_id in pending[start:start + chunk_size]:
+            agent = agents_registry.get(agent_id)
+            if agent is not None and agent_id in _unindexed:
+                _index_agent(agent)
+        await asyncio.sleep(0)
+    _unindexed.clear()
+
+async def _indexes_built():
+    """Wait for a background index build still in progress"""
+    if _index_build is not None and not _index_build.done():
+        await asyncio.shield(_index_build)
+
+async def _record_changes(change_type: ChangeType, agent_ids: List[str]):
+    """
+    Log changes of agents, as currently cached, in the change feed and tell
+    the other worker processes sharing the storage to refresh them. With a
+    shared change log the storage numbers the changes for every worker.
+    """
+    if not agent_ids:
+        return
+    entries = [
+        (agent_id, None if change_type == ChangeType.DELETED else agents_registry[agent_id].to_agent())
+        for agent_id in agent_ids
+    ]
+    if not _shared_change_log():
+        for agent_id, agent in entries:
+            changes.append(change_type, agent_id, agent)
+    if storage is None:
+        return
+    try:
+        version = await storage.publish(change_type, entries)
+    except Exception as e:
+        # Other workers still see the change on their next read-through or reload
+        logger.error(f"Failed to publish {len(agent_ids)} agent changes: {str(e)}")
+        return
+    if version is not None:
+        changes.advance(version)
 
 # Agent registry routes
 @router.post("/agents", response_model=Agent, status_code=status.HTTP_201_CREATED)
@@ -30,44 +487,183 @@ async def register_agent(agent: Agent):
     # Set timestamps
     agent.registered_at = datetime.now()
     agent.last_seen = datetime.now()
+    agent.stale = False
+    agent.version = 1
+    
+    # The storage also catches IDs registered through another worker
+    if storage is not None and not await storage.insert(agent):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, 
+                           detail=f"Agent with ID {agent.id} already exists")
     
-    agents_registry[agent.id] = agent
+    _cache_agent(agent)
+    await _record_changes(ChangeType.REGISTERED, [agent.id])
+    await _pgvector_upsert(agent)
     logger.info(f"Agent registered: {agent.id}")
     return agent
 
+def _check_batch_size(count: int):
+    if count > MAX_BULK_AGENTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, 
+                           detail=f"At most {MAX_BULK_AGENTS} agents are accepted per request")
+
+@router.post("/agents/bulk", response_model=BulkRegistrationResult)
+async def register_agents_bulk(registration: BulkRegistration):
+    """
+    Register many agents in one request.
+    
+    In atomic mode nothing is registered if any agent is rejected, and the
+    rejected agents are reported in a 400 response. In best-effort mode every
+    valid agent is registered and the rejected ones are listed in the result.
+    Agents are rejected for an ID that is already taken or for failing
+    validation; the latter are reported by position when they have no ID.
+    """
+    _check_batch_size(len(registration.agents))
+    atomic = registration.mode == BulkMode.ATOMIC
+    
+    # One timestamp for the whole batch
+    now = datetime.now()
+    accepted = []
+    errors = []
+    seen = set()
+    for position, item in enumerate(registration.agents):
+        try:
+            agent = Agent.model_validate(item)
+        except ValidationError as e:
+            agent_id = item.get("id")
+            errors.append(BulkRegistrationError(
+                id=agent_id if isinstance(agent_id, str) else f"agents[{position}]",
+                detail="; ".join(
+                    f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}" for error in e.errors()
+                )
+            ))
+            continue
+        if agent.id in seen or agent.id in agents_registry:
+            errors.append(BulkRegistrationError(id=agent.id, detail=f"Agent with ID {agent.id} already exists"))
+            continue
+        seen.add(agent.id)
+        agent.registered_at = now
+        agent.last_seen = now
+        agent.stale = False
+        agent.version = 1
+        accepted.append(agent)
+    
+    if atomic and errors:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, 
+                           detail=[error.model_dump() for error in errors])
+    
+    if storage is not None and accepted:
+        # One COPY-backed batch; the storage also catches IDs registered through other workers
+        inserted, conflicts = await storage.insert_many(accepted, atomic)
+        conflict_errors = [
+            BulkRegistrationError(id=agent_id, detail=f"Agent with ID {agent_id} already exists")
+            for agent_id in conflicts
+        ]
+        if atomic and conflict_errors:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, 
+                               detail=[error.model_dump() for error in conflict_errors])
+        errors.extend(conflict_errors)
+        inserted = set(inserted)
+        accepted = [agent for agent in accepted if agent.id in inserted]
+    
+    for agent in accepted:
+        _cache_agent(agent)
+    await _record_changes(ChangeType.REGISTERED, [agent.id for agent in accepted])
+    await _pgvector_upsert_many(accepted)
+    
+    logger.info(f"Bulk registered {len(accepted)} agents ({len(errors)} rejected)")
+    return BulkRegistrationResult(registered=[agent.id for agent in accepted], errors=errors)
+
+@router.post("/agents/batch-get", response_model=BatchGetResult)
+async def batch_get_agents(request: BatchGetRequest):
+    """Retrieve many agents by ID in one request"""
+    _check_batch_size(len(request.ids))
+    
+    # Read cache misses through to the storage in a single query
+    misses = [agent_id for agent_id in dict.fromkeys(request.ids) if agent_id not in agents_registry]
+    if storage is not None and misses:
+        for agent in await storage.get_many(misses):
+            _cache_agent(agent)
+    
+    agents = []
+    missing = []
+    for agent_id in request.ids:
+        agent = agents_registry.get(agent_id)
+        if agent is None:
+            missing.append(agent_id)
+        else:
+            agents.append(agent.to_agent())
+    return BatchGetResult(agents=agents, missing=missing)
+
 @router.get("/agents", response_model=List[Agent])
 async def list_agents(
     protocol: Optional[Protocol] = Query(None, description="Filter agents by protocol"),
-    public: Optional[bool] = Query(None, description="Filter agents by public visibility")
+    public: Optional[bool] = Query(None, description="Filter agents by public visibility"),
+    stale: Optional[bool] = Query(None, description="Filter agents by missed heartbeats"),
+    if_none_match: Optional[str] = Header(None, description="ETag of a previous response")
 ):
-    """Retrieve a list of agents with optional filtering"""
-    filtered_agents = list(agents_registry.values())
+    """
+    Retrieve a list of agents with optional filtering.
+    
+    The response is assembled from the cached JSON of each agent.
+    """
+    # Any logged change or heartbeat changes the ETag, so unchanged lists are not sent again
+    etag = _list_etag()
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    await _indexes_built()
+    filters = {}
     
     # Apply protocol filter if provided
     if protocol:
-        filtered_agents = [agent for agent in filtered_agents if agent.protocol == protocol]
+        filters["protocol"] = protocol
     
     # Apply public visibility filter if provided
     if public is not None:
-        filtered_agents = [agent for agent in filtered_agents if agent.public == public]
+        filters["public"] = public
     
-    return filtered_agents
+    candidates = _filter_candidates(filters)
+    if stale is not None:
+        # Not a search filter: the pgvector table does not track staleness
+        stale_ids = field_indexes["stale"].any_of([stale])
+        candidates = stale_ids if candidates is None else intersect([candidates, stale_ids])
+    records = agents_registry.values() if candidates is None else _in_registry_order(candidates)
+    return RawJSONResponse(_json_array(record.json_bytes() for record in records), headers={"ETag": etag})
 
 @router.get("/agents/{agent_id}", response_model=Agent)
-async def get_agent(agent_id: str = Path(..., description="Unique agent identifier")):
+async def get_agent(
+    agent_id: str = Path(..., description="Unique agent identifier"),
+    if_none_match: Optional[str] = Header(None, description="ETag of a previous response")
+):
     """Retrieve a specific agent by ID"""
-    if agent_id not in agents_registry:
+    agent = await _get_cached_agent(agent_id)
+    if agent is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
                            detail=f"Agent with ID {agent_id} not found")
-    return agents_registry[agent_id]
+    
+    etag = _agent_etag(agent)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return RawJSONResponse(agent.json_bytes(), headers={"ETag": etag})
 
 @router.put("/agents/{agent_id}", response_model=Agent)
 async def update_agent(
     agent_id: str = Path(..., description="Unique agent identifier"),
-    agent: Agent = Body(...)
+    agent: Agent = Body(...),
+    if_match: Optional[str] = Header(None, description="Only update if the agent still has the version of this ETag"),
+    *,
+    response: Response
 ):
-    """Update an existing agent"""
-    if agent_id not in agents_registry:
+    """
+    Update an existing agent.
+    
+    With If-Match, the update is only applied if the stored agent still has
+    the version the client read; the check and the write are one atomic
+    storage operation, so of concurrent updates from the same version only
+    one succeeds and the others get a 412.
+    """
+    existing = await _get_cached_agent(agent_id)
+    if existing is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
                            detail=f"Agent with ID {agent_id} not found")
     
@@ -76,64 +672,620 @@ async def update_agent(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, 
                            detail="Agent ID in path must match ID in body")
     
-    # Preserve registration timestamp
-    agent.registered_at = agents_registry[agent_id].registered_at
+    # Preserve registration timestamp; an update also counts as a heartbeat
+    agent.registered_at = existing.registered_at
     agent.last_seen = datetime.now()
+    agent.stale = False
+    
+    expected_versions = _if_match_versions(if_match)
+    if storage is None:
+        if expected_versions is not None and existing.version not in expected_versions:
+            raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, 
+                               detail=f"Agent with ID {agent_id} was modified")
+        agent.version = existing.version + 1
+    else:
+        version = await storage.update(agent, expected_versions)
+        if version is None:
+            # Deleted or updated through another worker since it was cached
+            stored = await storage.get(agent_id)
+            if stored is None:
+                _evict_agent(agent_id)
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
+                                   detail=f"Agent with ID {agent_id} not found")
+            _cache_agent(stored)
+            raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, 
+                               detail=f"Agent with ID {agent_id} was modified")
+        agent.version = version
     
-    agents_registry[agent_id] = agent
+    _cache_agent(agent)
+    response.headers["ETag"] = _agent_etag(agents_registry[agent_id])
+    await _record_changes(ChangeType.UPDATED, [agent_id])
+    await _pgvector_upsert(agent)
     logger.info(f"Agent updated: {agent_id}")
     return agent
 
+async def _remove_agent(agent_id: str) -> bool:
+    """Delete an agent from the storage, the cache and the search backends"""
+    found = agent_id in agents_registry
+    if storage is not None:
+        # The storage is authoritative; the cache may be stale either way
+        found = await storage.delete(agent_id)
+    
+    _evict_agent(agent_id)
+    if found:
+        await _record_changes(ChangeType.DELETED, [agent_id])
+        await _pgvector_delete(agent_id)
+    return found
+
 @router.delete("/agents/{agent_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_agent(agent_id: str = Path(..., description="Unique agent identifier")):
     """Delete an agent"""
-    if agent_id not in agents_registry:
+    if not await _remove_agent(agent_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
                            detail=f"Agent with ID {agent_id} not found")
     
-    del agents_registry[agent_id]
     logger.info(f"Agent deleted: {agent_id}")
     return None
 
-@router.post("/agents/search", response_model=List[Agent])
-async def search_agents(search_query: SearchQuery):
-    """Semantic search for agents"""
-    # In a real implementation, this would use vector embeddings or a search engine
-    # For now, we'll do a simple text-based search
+def _record_heartbeat(agent: AgentRecord, now: datetime) -> bool:
+    """
+    Refresh an agent in memory; the storage is updated by the next flush.
+    Returns whether the agent was stale.
+    """
+    global _heartbeat_generation
+    agent.last_seen = now
+    _heartbeat_generation += 1
+    revived = _set_stale(agent, False)
+    if heartbeats.beat(agent.id, now):
+        logger.info(f"Agent {agent.id} is alive again")
+    return revived
+
+async def _record_revivals(agent_ids: List[str], now: datetime):
+    """
+    Log stale agents that sent a heartbeat again. Their heartbeats are
+    written to the storage right away rather than on the next flush, so
+    other workers refreshing them read them back as alive.
+    """
+    if not agent_ids:
+        return
+    if storage is not None:
+        await storage.touch_many({agent_id: now for agent_id in agent_ids})
+    await _record_changes(ChangeType.UPDATED, agent_ids)
+
+@router.post("/agents/heartbeat", response_model=HeartbeatResult)
+async def agents_heartbeat(request: HeartbeatRequest):
+    """Report several agents as alive in one request"""
+    _check_batch_size(len(request.ids))
+    
+    misses = [agent_id for agent_id in dict.fromkeys(request.ids) if agent_id not in agents_registry]
+    if storage is not None and misses:
+        for agent in await storage.get_many(misses):
+            _cache_agent(agent)
+    
+    now = datetime.now()
+    accepted = []
+    unknown = []
+    revived = []
+    for agent_id in dict.fromkeys(request.ids):
+        agent = agents_registry.get(agent_id)
+        if agent is None:
+            unknown.append(agent_id)
+            continue
+        if _record_heartbeat(agent, now):
+            revived.append(agent_id)
+        accepted.append(agent_id)
+    await _record_revivals(revived, now)
+    return HeartbeatResult(accepted=accepted, unknown=unknown)
+
+@router.post("/agents/{agent_id}/heartbeat", status_code=status.HTTP_204_NO_CONTENT)
+async def agent_heartbeat(agent_id: str = Path(..., description="Unique agent identifier")):
+    """Report an agent as alive without sending the whole agent document"""
+    agent = await _get_cached_agent(agent_id)
+    if agent is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
+                           detail=f"Agent with ID {agent_id} not found")
+    now = datetime.now()
+    if _record_heartbeat(agent, now):
+        await _record_revivals([agent_id], now)
+    return None
+
+async def _read_changes(since: int, limit: int) -> Optional[List[ChangeEvent]]:
+    """Changes after a version, from the shared change log if the storage keeps one"""
+    if _shared_change_log():
+        return await storage.changes_since(since, limit)
+    return changes.since(since, limit)
+
+async def _changes_since(since: int, limit: int) -> List[ChangeEvent]:
+    events = await _read_changes(since, limit)
+    if events is None:
+        raise HTTPException(status_code=status.HTTP_410_GONE, 
+                           detail=f"Changes after version {since} are no longer available; reload the registry")
+    return events
+
+@router.get("/changes", response_model=ChangeFeedPage)
+async def list_changes(
+    since: Optional[int] = Query(None, ge=0, description="Version already synced; omit to get the current version only"),
+    limit: int = Query(1000, ge=1, le=MAX_BULK_AGENTS, description="Maximum number of changes returned"),
+    wait: float = Query(0, ge=0, le=MAX_CHANGES_WAIT, description="Seconds to wait for a change when there is none yet")
+):
+    """
+    Retrieve the registry changes after a version.
+    
+    A client syncs by reading the current version, loading the agents, then
+    repeatedly asking for the changes since the last version it received.
+    A 410 response means it fell too far behind and must reload.
+    """
+    if since is None:
+        return ChangeFeedPage(version=changes.version)
+    
+    events = await _changes_since(since, limit)
+    if not events and wait and await changes.wait(since, wait):
+        events = await _changes_since(since, limit)
+    
+    version = events[-1].version if events else since
+    return ChangeFeedPage(version=version, events=events, more=version < changes.version)
+
+@router.get("/changes/stream")
+async def stream_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Version already synced; defaults to the current version"),
+    last_event_id: Optional[str] = Header(None, description="Resume position sent by reconnecting SSE clients")
+):
+    """Server-Sent Events stream of registry changes, each with its version as event ID"""
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    cursor = changes.version if since is None else since
+    # Fail before the stream starts when the client is already too far behind
+    await _changes_since(cursor, 1)
+    
+    async def event_generator():
+        nonlocal cursor
+        while not await request.is_disconnected():
+            events = await _read_changes(cursor, 1000)
+            if events is None:
+                yield "event: reset\ndata: {}\n\n"
+                return
+            for event in events:
+                yield f"id: {event.version}\nevent: {event.type.value}\ndata: {event.model_dump_json()}\n\n"
+                cursor = event.version
+            if not events and not await changes.wait(cursor, CHANGE_STREAM_KEEPALIVE):
+                yield ": keepalive\n\n"
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"  # Disable buffering in Nginx
+        }
+    )
+
+def _substring_search(search_query: SearchQuery) -> List[AgentRecord]:
+    """Scan every agent for the query as a substring of its name or description"""
     results = []
     query_lower = search_query.query.lower()
     
-    for agent in agents_registry.values():
+    # Only scan the agents passing the filters
+    candidates = _filter_candidates(search_query.filters)
+    agents = agents_registry.values() if candidates is None else _in_registry_order(candidates)
+    
+    for agent in agents:
         # Simple text matching in name and description
         if (query_lower in agent.display_name.lower() or 
             (agent.description and query_lower in agent.description.lower())):
-            
-            # Apply filters if provided
-            if search_query.filters:
-                # Protocol filter
-                if "protocol" in search_query.filters and search_query.filters["protocol"]:
-                    if agent.protocol not in search_query.filters["protocol"]:
-                        continue
-                
-                # Language filter
-                if "language" in search_query.filters and search_query.filters["language"]:
-                    if not any(lang in agent.languages for lang in search_query.filters["language"]):
-                        continue
-                
-                # Tools filter
-                if "tools" in search_query.filters and search_query.filters["tools"]:
-                    if not any(tool in agent.tools for tool in search_query.filters["tools"]):
-                        continue
-            
             results.append(agent)
     
     return results
 
+def _index_matches(search_query: SearchQuery) -> Set[str]:
+    """IDs of the agents containing every query token and passing the filters"""
+    candidates = text_index.search(search_query.query)
+    filtered = _filter_candidates(search_query.filters)
+    if filtered is not None:
+        candidates = intersect([candidates, filtered])
+    return candidates
+
+def _index_search(search_query: SearchQuery) -> List[AgentRecord]:
+    """Match agents containing every query token using the inverted index, up to the limit"""
+    return _in_registry_order(_index_matches(search_query), search_query.limit)
+
+def _ranked_index_search(search_query: SearchQuery) -> List[Tuple[AgentRecord, float]]:
+    """Agents the index engine matches, ranked by BM25 and cut to the top k"""
+    hits = ranking_index.search(
+        search_query.query,
+        search_query.limit or DEFAULT_TOP_K,
+        _index_matches(search_query)
+    )
+    return _resolve_hits(hits)
+
+def _resolve_hits(hits) -> List[Tuple[AgentRecord, float]]:
+    """Resolve (agent_id, score) hits to agents, skipping agents no longer registered"""
+    return [
+        (agents_registry[agent_id], score)
+        for agent_id, score in hits
+        if agent_id in agents_registry
+    ]
+
+def _bm25_search(search_query: SearchQuery) -> List[Tuple[AgentRecord, float]]:
+    """Agents matching any query term, ranked by BM25 and cut to the top k"""
+    hits = ranking_index.search(
+        search_query.query,
+        search_query.limit or DEFAULT_TOP_K,
+        _filter_candidates(search_query.filters)
+    )
+    return _resolve_hits(hits)
+
+def _fuzzy_search(search_query: SearchQuery) -> List[Tuple[AgentRecord, float]]:
+    """Agents whose name, skills or tools approximately match every query term"""
+    hits = fuzzy_index.search(
+        search_query.query,
+        search_query.limit or DEFAULT_TOP_K,
+        _filter_candidates(search_query.filters)
+    )
+    return _resolve_hits(hits)
+
+def _embedded_vector_search(search_query: SearchQuery) -> List[Tuple[AgentRecord, float]]:
+    """Top-k nearest-neighbour search over the in-process embedding matrix"""
+    hits = _get_embedded_index().search(
+        embedder.embed(search_query.query),
+        search_query.limit or DEFAULT_TOP_K,
+        _filter_candidates(search_query.filters)
+    )
+    return _resolve_hits(hits)
+
+def _require_pgvector():
+    if pgvector_index is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, 
+                           detail="pgvector search is not enabled")
+
+def validate_search_query(search_query: SearchQuery):
+    """
+    Raise the client errors a search for `search_query` would, without
+    running it: 422 for unsupported filter values, 400 for an engine that
+    is not enabled. Lets streaming callers answer them with a proper status.
+    """
+    _normalized_filters(search_query.filters)
+    if search_query.engine == SearchEngine.PGVECTOR:
+        _require_pgvector()
+
+async def _pgvector_search(search_query: SearchQuery) -> List[Tuple[AgentRecord, float]]:
+    """Top-k nearest-neighbour search over agent embeddings stored in pgvector"""
+    _require_pgvector()
+    hits = await pgvector_index.search(
+        search_query.query,
+        _normalized_filters(search_query.filters),
+        search_query.limit or DEFAULT_TOP_K
+    )
+    return _resolve_hits(hits)
+
+def _search_cache_key(search_query: SearchQuery, ranked: bool = False) -> Optional[tuple]:
+    """
+    Key of a query in the search cache, or None when it is not cached.
+
+    Engines other than substring only see the query's tokens, so queries
+    differing in case, punctuation or spacing share an entry. Filters are
+    keyed by the indexed values they match, in any order.
+    """
+    if search_query.engine == SearchEngine.PGVECTOR:
+        # Other workers write to the shared pgvector table without bumping our generation
+        return None
+    tokens = tokenize(search_query.query)
+    if search_query.engine == SearchEngine.SUBSTRING or not tokens:
+        text = search_query.query.lower()
+    else:
+        text = " ".join(tokens)
+    filters = frozenset(
+        (field, frozenset(values))
+        for field, values in _normalized_filters(search_query.filters).items()
+    )
+    return (search_query.engine, text, filters, search_query.limit, ranked)
+
+async def _search(search_query: SearchQuery, ranked: bool = False) -> List[Tuple[AgentRecord, Optional[float]]]:
+    """Matching agents with their scores, answered from the search cache when possible"""
+    await _indexes_built()
+    key = _search_cache_key(search_query, ranked)
+    if key is None:
+        return await _run_search(search_query, ranked)
+    
+    generation = search_generation
+    hits = search_cache.get(key, generation)
+    if hits is not None:
+        return _resolve_hits(hits)
+    results = await _run_search(search_query, ranked)
+    # Agents are cached by ID so responses still carry their current heartbeat fields
+    search_cache.put(key, generation, [(agent.id, score) for agent, score in results])
+    return results
+
+async def _run_search(search_query: SearchQuery, ranked: bool = False) -> List[Tuple[AgentRecord, Optional[float]]]:
+    """
+    Matching agents with their scores; the index and substring engines do
+    not score, unless `ranked` has BM25 rank the index engine's matches
+    """
+    # The BM25 engine ranks agents by keyword relevance, the fuzzy engine
+    # tolerates typos and the vector engines rank by embedding similarity,
+    # in-process or in pgvector. The default engine matches whole tokens
+    # through the inverted index; the substring engine keeps the original
+    # full scan available as a fallback.
+    if search_query.engine == SearchEngine.BM25:
+        return _bm25_search(search_query)
+    
+    if search_query.engine == SearchEngine.FUZZY:
+        return _fuzzy_search(search_query)
+    
+    if search_query.engine == SearchEngine.VECTOR:
+        return _embedded_vector_search(search_query)
+    
+    if search_query.engine == SearchEngine.PGVECTOR:
+        return await _pgvector_search(search_query)
+    
+    if search_query.engine == SearchEngine.SUBSTRING:
+        results = _substring_search(search_query)
+    elif search_query.query.strip() and not tokenize(search_query.query):
+        # Queries without any word tokens (e.g. "++") cannot use the index
+        results = _substring_search(search_query)
+    elif ranked:
+        return _ranked_index_search(search_query)
+    else:
+        results = _index_search(search_query)
+    
+    if search_query.limit:
+        results = results[:search_query.limit]
+    return [(agent, None) for agent in results]
+
+async def search_agents(search_query: SearchQuery, ranked: bool = False) -> List[ScoredAgent]:
+    """
+    Search for agents, returning models for callers within the API such as
+    unified search. With `ranked`, the matches of the index engine are
+    ranked by BM25 and cut to the limit, instead of taken in registry order.
+    """
+    return [
+        ScoredAgent.model_construct(**agent.fields(), score=score)
+        for agent, score in await _search(search_query, ranked)
+    ]
+
+@router.post("/agents/search", response_model=List[ScoredAgent])
+async def search_agents_json(search_query: SearchQuery):
+    """
+    Semantic search for agents.
+    
+    The response is assembled from the cached JSON of each agent.
+    """
+    results = await _search(search_query)
+    return RawJSONResponse(_json_array(_scored_json(agent, score) for agent, score in results))
+
+async def _connect_storage(settings: StorageSettings):
+    """
+    Connect the persistent storage configured in config.yaml and warm the
+    cache from it. The search indexes are built in the background, so
+    startup does not wait for them.
+    """
+    global storage, _index_build
+    
+    backend = settings.backend
+    if backend == "memory":
+        return
+    if backend == "wal":
+        from .wal_storage import WalAgentStorage
+        
+        backend_storage = WalAgentStorage(
+            directory=os.environ.get("REGISTRY_DATA_DIR", settings.directory),
+            snapshot_interval=settings.snapshot_interval
+        )
+    elif backend == "postgres":
+        # Import here so in-memory deployments don't need the driver
+        from .storage import PostgresAgentStorage
+        
+        backend_storage = PostgresAgentStorage(
+            dsn=os.environ.get("REGISTRY_DATABASE_URL", settings.dsn),
+            table=settings.table,
+            min_pool_size=settings.min_pool_size,
+            max_pool_size=settings.max_pool_size
+        )
+    else:
+        raise ValueError(f"Unsupported registry storage backend: {backend}")
+    await backend_storage.connect()
+    # Subscribe before loading so nothing changed meanwhile is missed; replays are harmless
+    await backend_storage.subscribe(
+        lambda change_type, agent_ids, version: _peer_changes.put_nowait((change_type, agent_ids, version))
+    )
+    # Loaded agents reflect at least the changes logged so far
+    changes.advance(await backend_storage.change_version())
+    
+    agents_registry.clear()
+    for agent in await backend_storage.load_all():
+        agents_registry[agent.id] = AgentRecord.of(agent)
+    storage = backend_storage
+    logger.info(f"Loaded {len(agents_registry)} agents from {backend} storage")
+    _clear_indexes()
+    _unindexed.update(agents_registry)
+    _index_build = asyncio.create_task(_index_loaded_agents())
+
+async def _index_loaded_agents():
+    start_time = time.monotonic()
+    await _index_unindexed()
+    logger.info(f"Indexed {len(agents_registry)} loaded agents in {time.monotonic() - start_time:.1f}s")
+
+async def _apply_peer_change(change_type: ChangeType, agent_ids: List[str], version: Optional[int] = None):
+    """
+    Bring the in-memory registry in line with a change made by another
+    worker process. Changed agents are read back from the storage, so
+    replayed or reordered notifications still leave the stored state.
+    
+    A change numbered in the shared change log (`version`) is already
+    logged there by its worker; otherwise it is logged in the local feed.
+    """
+    if change_type == ChangeType.DELETED:
+        for agent_id in agent_ids:
+            if agent_id in agents_registry:
+                _evict_agent(agent_id)
+                if version is None:
+                    changes.append(ChangeType.DELETED, agent_id)
+    else:
+        # Agents deleted since are evicted by the deletion's own notification
+        for agent in await storage.get_many(agent_ids):
+            known = agent.id in agents_registry
+            _cache_agent(agent)
+            if version is None:
+                changes.append(
+                    ChangeType.UPDATED if known else ChangeType.REGISTERED, agent.id, agents_registry[agent.id].to_agent()
+                )
+    if version is not None:
+        changes.advance(version)
+
+async def _sync_loop():
+    while True:
+        change_type, agent_ids, version = await _peer_changes.get()
+        try:
+            await _apply_peer_change(change_type, agent_ids, version)
+        except Exception as e:
+            logger.error(f"Failed to apply {len(agent_ids)} agent changes from another worker: {str(e)}")
+
+async def _connect_pgvector_index(settings: VectorSearchSettings):
+    """Connect the pgvector index when vector search is enabled in config.yaml"""
+    global pgvector_index
+    
+    if not settings.enabled:
+        return
+    
+    # Import here so deployments without vector search don't need the driver
+    from .pgvector_store import PgVectorIndex
+    
+    index = PgVectorIndex(
+        dsn=os.environ.get("REGISTRY_DATABASE_URL", settings.dsn),
+        embedder=HashingEmbedder(dimensions=settings.dimensions),
+        table=settings.table,
+        index_type=settings.index_type
+    )
+    try:
+        await index.connect()
+        # The registry is the source of truth; other workers share the table, so
+        # it is reconciled in place rather than truncated
+        await index.reconcile(agents_registry.values())
+    except Exception as e:
+        logger.error(f"pgvector search unavailable: {str(e)}")
+        await index.close()
+        return
+    pgvector_index = index
+
+async def _overdue_in_storage(agent_ids: List[str], ttl: float) -> List[str]:
+    """
+    Keep the agents whose stored last_seen is also past the TTL. Heartbeats
+    flushed by other workers only show up there; those agents are re-cached
+    with their newer timestamp, which reschedules them.
+    """
+    if storage is None or not agent_ids:
+        return agent_ids
+    stored = {agent.id: agent for agent in await storage.get_many(agent_ids)}
+    cutoff = datetime.now() - timedelta(seconds=ttl)
+    overdue = []
+    for agent_id in agent_ids:
+        agent = stored.get(agent_id)
+        if agent is None:
+            _evict_agent(agent_id)
+        elif agent.last_seen > cutoff:
+            _cache_agent(agent)
+        else:
+            overdue.append(agent_id)
+    return overdue
+
+async def process_heartbeats():
+    """Flush coalesced heartbeats to the storage, then mark stale and expire overdue agents"""
+    pending = heartbeats.flush()
+    if storage is not None and pending:
+        try:
+            await storage.touch_many(pending)
+        except Exception:
+            # Keep them for the next flush unless newer heartbeats arrived meanwhile
+            for agent_id, seen_at in pending.items():
+                heartbeats.pending.setdefault(agent_id, seen_at)
+            raise
+    
+    newly_stale, expired = heartbeats.sweep()
+    newly_stale = await _overdue_in_storage(newly_stale, heartbeats.stale_after)
+    newly_stale = [
+        agent_id for agent_id in newly_stale
+        if agent_id in agents_registry and _set_stale(agents_registry[agent_id], True)
+    ]
+    if storage is not None and newly_stale:
+        # Every worker sweeps the agents it caches; each change is logged by the one that stored it
+        newly_stale = await storage.mark_stale(newly_stale)
+    await _record_changes(ChangeType.UPDATED, newly_stale)
+    if newly_stale:
+        logger.info(f"Marked {len(newly_stale)} agents stale")
+    
+    for agent_id in await _overdue_in_storage(expired, heartbeats.expire_after):
+        await _remove_agent(agent_id)
+        logger.info(f"Agent expired: {agent_id}")
+
+async def _heartbeat_loop(flush_interval: float):
+    while True:
+        await asyncio.sleep(flush_interval)
+        try:
+            await process_heartbeats()
+        except Exception as e:
+            logger.error(f"Failed to process heartbeats: {str(e)}")
+
+def _apply_config(config: AppConfig):
+    """Apply the settings that can change without a restart, at startup and on every config reload"""
+    search_cache.resize(config.settings.registry.search_cache.max_entries)
+
+config_store.on_reload(_apply_config)
+
+@router.on_event("startup")
+async def registry_startup():
+    """Connect the storage and search backends configured in config.yaml"""
+    global _heartbeat_task, _sync_task
+    settings = get_config().settings.registry
+    # The storage goes first so the search backends index the loaded agents
+    await _connect_storage(settings.storage)
+    if storage is not None:
+        _sync_task = asyncio.create_task(_sync_loop())
+    await _connect_pgvector_index(settings.vector_search)
+    
+    search_cache.clear()
+    _apply_config(get_config())
+    
+    heartbeats.stale_after = settings.heartbeat.stale_after
+    heartbeats.expire_after = settings.heartbeat.expire_after
+    # Reschedule the loaded agents with the configured TTLs
+    heartbeats.clear()
+    for agent in agents_registry.values():
+        heartbeats.track(agent.id, _monotonic_beat(agent), stale=agent.stale)
+    _heartbeat_task = asyncio.create_task(_heartbeat_loop(settings.heartbeat.flush_interval))
+
+@router.on_event("shutdown")
+async def registry_shutdown():
+    global storage, pgvector_index, _heartbeat_task, _sync_task, _index_build
+    if _index_build is not None:
+        _index_build.cancel()
+        _index_build = None
+    if _sync_task is not None:
+        _sync_task.cancel()
+        _sync_task = None
+    if _heartbeat_task is not None:
+        _heartbeat_task.cancel()
+        _heartbeat_task = None
+        # Persist the heartbeats received since the last flush
+        if storage is not None:
+            try:
+                await storage.touch_many(heartbeats.flush())
+            except Exception as e:
+                logger.error(f"Failed to flush heartbeats: {str(e)}")
+    if pgvector_index is not None:
+        await pgvector_index.close()
+        pgvector_index = None
+    if storage is not None:
+        await storage.close()
+        storage = None
+
 # Health check for registry
 @router.get("/health")
 async def registry_health():
     """Check the health of the registry service"""
     return {
         "status": "healthy",
-        "agents_count": len(agents_registry)
+        "agents_count": len(agents_registry),
+        "indexes_ready": _index_build is None or _index_build.done(),
+        "search_cache": search_cache.stats()
     }
\ No newline at end of file
@@ -0,0 +1,460 @@
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple
+from datetime import datetime
+import json
+import logging
+import uuid
+
+import asyncpg
+
+from .models import Agent, ChangeType, ChangeEvent
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class AgentStorage(ABC):
+    """
+    Persistent storage behind the in-memory registry.
+
+    The registry writes through to the storage before updating its
+    in-memory cache, and reads through to it for agents missing from the
+    cache (e.g. registered by another worker). Backends implement the
+    abstract single-agent operations; the batched ones fall back to them.
+    """
+    # Set by storage keeping a change log shared by every process using it;
+    # without one, each process keeps its own change feed
+    shared_change_log = False
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def load_all(self) -> List[Agent]:
+        """Return every stored agent"""
+
+    @abstractmethod
+    async def get(self, agent_id: str) -> Optional[Agent]:
+        """Return a stored agent, None if it does not exist"""
+
+    async def get_many(self, agent_ids: List[str]) -> List[Agent]:
+        """Return the stored agents among the given IDs, in any order"""
+        agents = [await self.get(agent_id) for agent_id in agent_ids]
+        return [agent for agent in agents if agent is not None]
+
+    @abstractmethod
+    async def insert(self, agent: Agent) -> bool:
+        """Store a new agent, returning False if the ID is already taken"""
+
+    async def insert_many(self, agents: List[Agent], atomic: bool) -> Tuple[List[str], List[str]]:
+        """
+        Store new agents, returning the (inserted, conflicting) IDs. With
+        `atomic`, nothing is stored when any ID is already taken.
+
+        This fallback checks and inserts agents one by one, so atomicity only
+        holds against concurrent writers for backends overriding it.
+        """
+        if atomic:
+            existing = {agent.id for agent in await self.get_many([agent.id for agent in agents])}
+            if existing:
+                return [], [agent.id for agent in agents if agent.id in existing]
+        inserted, conflicts = [], []
+        for agent in agents:
+            (inserted if await self.insert(agent) else conflicts).append(agent.id)
+        return inserted, conflicts
+
+    @abstractmethod
+    async def update(self, agent: Agent, expected_versions: Optional[List[int]] = None) -> Optional[int]:
+        """
+        Replace a stored agent and increment its version, returning the new
+        version. With `expected_versions`, the agent is only replaced if its
+        stored version is one of them (compare-and-swap). Returns None when
+        the agent does not exist or its version did not match.
+        """
+
+    @abstractmethod
+    async def delete(self, agent_id: str) -> bool:
+        """Delete a stored agent, returning False if it does not exist"""
+
+    @abstractmethod
+    async def touch_many(self, last_seen: Dict[str, datetime]):
+        """Record heartbeats: set last_seen and clear the stale flag of each agent, keeping its version"""
+
+    @abstractmethod
+    async def mark_stale(self, agent_ids: List[str]) -> List[str]:
+        """
+        Flag agents that missed their heartbeats as stale, keeping their
+        version. Returns the IDs flagged by this call: agents already flagged
+        by another process sharing the storage are left out, so only one
+        process reports each change.
+        """
+
+    async def publish(self, change_type: ChangeType, changes: List[Tuple[str, Optional[Agent]]]) -> Optional[int]:
+        """
+        Notify the other processes sharing this storage that agents changed,
+        given as (agent ID, agent after the change or None) pairs. Storage
+        with a shared change log also appends the changes to it and returns
+        the version of the last one; otherwise returns None.
+        """
+        return None
+
+    async def subscribe(self, callback: Callable[[ChangeType, List[str], Optional[int]], None]):
+        """
+        Call `callback` with the changes published by other processes, and
+        their version in the shared change log if there is one. Storage that
+        cannot be shared between processes has nothing to deliver.
+        """
+        pass
+
+    async def changes_since(self, version: int, limit: int) -> Optional[List[ChangeEvent]]:
+        """
+        Changes after `version` in the shared change log, like
+        ChangeFeed.since; None when they are not retained
+        """
+        return None
+
+    async def change_version(self) -> int:
+        """Version of the latest change in the shared change log"""
+        return 0
+
+# Agent columns in table order, shared by every statement
+AGENT_COLUMNS = (
+    "id", "matrix_id", "display_name", "description", "protocol", "tools", "skills",
+    "languages", "endpoint_url", "room_ids", "owner", "registered_at", "last_seen",
+    "public", "custom_metadata", "stale", "version",
+)
+
+def agent_row(agent: Agent) -> tuple:
+    """Values of an agent in AGENT_COLUMNS order"""
+    return (
+        agent.id,
+        agent.matrix_id,
+        agent.display_name,
+        agent.description,
+        agent.protocol.value,
+        list(agent.tools),
+        list(agent.skills),
+        list(agent.languages),
+        str(agent.endpoint_url) if agent.endpoint_url else None,
+        list(agent.room_ids),
+        agent.owner,
+        agent.registered_at,
+        agent.last_seen,
+        agent.public,
+        agent.custom_metadata,
+        agent.stale,
+        agent.version,
+    )
+
+class PostgresAgentStorage(AgentStorage):
+    """
+    Agent storage in a Postgres table, accessed through an asyncpg
+    connection pool.
+
+    Every statement is a constant SQL string, so asyncpg prepares it once per
+    pooled connection and reuses the prepared statement afterwards.
+    `custom_metadata` is stored as JSONB, and bulk inserts are streamed with
+    COPY into a temporary table.
+
+    Changes are appended to the `<table>_change_log` table, which numbers
+    them for every worker process sharing the agents, and published with
+    NOTIFY on `<table>_changes` with their version, so the other workers can
+    refresh their in-memory cache. Both happen in one transaction holding an
+    advisory lock, so versions are committed and notified in order.
+    Notifications from the process itself are skipped.
+    """
+    shared_change_log = True
+
+    def __init__(
+        self,
+        dsn: str,
+        table: str = "agents",
+        min_pool_size: int = 1,
+        max_pool_size: int = 10,
+        statement_cache_size: int = 100,
+        max_change_events: int = 100000,
+    ):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        self.dsn = dsn
+        self.table = table
+        self.change_table = f"{table}_change_log"
+        # Changes retained in the change log, like ChangeFeed.max_events
+        self.max_change_events = max_change_events
+        self.min_pool_size = min_pool_size
+        self.max_pool_size = max_pool_size
+        self.statement_cache_size = statement_cache_size
+        self.pool: Optional[asyncpg.Pool] = None
+        self.channel = f"{self.table}_changes"
+        # Tags this process's notifications so its own listener ignores them
+        self.process_id = uuid.uuid4().hex
+        self._listener: Optional[asyncpg.Connection] = None
+
+        columns = ", ".join(AGENT_COLUMNS)
+        placeholders = ", ".join(f"${i}" for i in range(1, len(AGENT_COLUMNS) + 1))
+        assignments = ", ".join(
+            f"{column} = ${i}" for i, column in enumerate(AGENT_COLUMNS, 1) if column not in ("id", "version")
+        )
+        # Updates bind the expected versions in the position of the version column
+        expected = f"${AGENT_COLUMNS.index('version') + 1}::bigint[]"
+        self._select_all_sql = f"SELECT {columns} FROM {self.table}"
+        self._select_sql = f"SELECT {columns} FROM {self.table} WHERE id = $1"
+        self._select_many_sql = f"SELECT {columns} FROM {self.table} WHERE id = ANY($1::text[])"
+        self._insert_sql = (
+            f"INSERT INTO {self.table} ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT (id) DO NOTHING"
+        )
+        self._update_sql = (
+            f"UPDATE {self.table} SET {assignments}, version = version + 1 "
+            f"WHERE id = $1 AND ({expected} IS NULL OR version = ANY({expected})) "
+            f"RETURNING version"
+        )
+        self._delete_sql = f"DELETE FROM {self.table} WHERE id = $1"
+        self._touch_sql = (
+            f"UPDATE {self.table} AS agent SET last_seen = beat.last_seen, stale = FALSE "
+            f"FROM unnest($1::text[], $2::timestamp[]) AS beat(id, last_seen) "
+            f"WHERE agent.id = beat.id"
+        )
+        self._mark_stale_sql = (
+            f"UPDATE {self.table} SET stale = TRUE WHERE id = ANY($1::text[]) AND NOT stale RETURNING id"
+        )
+        self._staging_table = f"{self.table}_bulk"
+        self._create_staging_sql = (
+            f"CREATE TEMP TABLE {self._staging_table} (LIKE {self.table} INCLUDING DEFAULTS) "
+            f"ON COMMIT DROP"
+        )
+        self._insert_staged_sql = (
+            f"INSERT INTO {self.table} ({columns}) SELECT {columns} FROM {self._staging_table} "
+            f"ON CONFLICT (id) DO NOTHING RETURNING id"
+        )
+        # Versions are contiguous: the log is only appended to under the advisory lock
+        self._log_changes_sql = (
+            f"WITH logged AS ("
+            f"INSERT INTO {self.change_table} (version, type, agent_id, agent) "
+            f"SELECT (SELECT coalesce(max(version), 0) FROM {self.change_table}) + change.position, "
+            f"$1, change.agent_id, change.agent "
+            f"FROM unnest($2::text[], $3::jsonb[]) WITH ORDINALITY AS change(agent_id, agent, position) "
+            f"RETURNING version) "
+            f"SELECT max(version) FROM logged"
+        )
+        self._trim_changes_sql = f"DELETE FROM {self.change_table} WHERE version <= $1"
+        self._change_bounds_sql = (
+            f"SELECT coalesce(min(version), 0) AS oldest, coalesce(max(version), 0) AS latest "
+            f"FROM {self.change_table}"
+        )
+        self._changes_since_sql = (
+            f"SELECT version, type, agent_id, agent, timestamp FROM {self.change_table} "
+            f"WHERE version > $1 ORDER BY version LIMIT $2"
+        )
+
+    async def _init_connection(self, conn: asyncpg.Connection):
+        # Binary format so the codec also serves COPY; jsonb is a version byte plus the text
+        await conn.set_type_codec(
+            "jsonb",
+            encoder=lambda value: b"\x01" + json.dumps(value).encode("utf-8"),
+            decoder=lambda data: json.loads(data[1:]),
+            schema="pg_catalog",
+            format="binary"
+        )
+
+    async def connect(self):
+        """Create the connection pool and make sure the table exists"""
+        self.pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=self.min_pool_size,
+            max_size=self.max_pool_size,
+            statement_cache_size=self.statement_cache_size,
+            init=self._init_connection,
+        )
+        async with self.pool.acquire() as conn:
+            await conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    id TEXT PRIMARY KEY,
+                    matrix_id TEXT,
+                    display_name TEXT NOT NULL,
+                    description TEXT,
+                    protocol TEXT NOT NULL,
+                    tools TEXT[] NOT NULL DEFAULT '{{}}',
+                    skills TEXT[] NOT NULL DEFAULT '{{}}',
+                    languages TEXT[] NOT NULL DEFAULT '{{}}',
+                    endpoint_url TEXT,
+                    room_ids TEXT[] NOT NULL DEFAULT '{{}}',
+                    owner TEXT,
+                    registered_at TIMESTAMP NOT NULL,
+                    last_seen TIMESTAMP NOT NULL,
+                    public BOOLEAN NOT NULL DEFAULT TRUE,
+                    custom_metadata JSONB NOT NULL DEFAULT '{{}}',
+                    stale BOOLEAN NOT NULL DEFAULT FALSE,
+                    version BIGINT NOT NULL DEFAULT 1
+                )
+            """)
+            # Tables created before heartbeat expiry existed
+            await conn.execute(
+                f"ALTER TABLE {self.table} ADD COLUMN IF NOT EXISTS stale BOOLEAN NOT NULL DEFAULT FALSE"
+            )
+            # Tables created before conditional updates existed
+            await conn.execute(
+                f"ALTER TABLE {self.table} ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1"
+            )
+            await conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.change_table} (
+                    version BIGINT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    agent_id TEXT NOT NULL,
+                    agent JSONB,
+                    timestamp TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+                )
+            """)
+        logger.info(f"Connected Postgres agent storage on table {self.table}")
+
+    async def close(self):
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    @staticmethod
+    def _agent(record: asyncpg.Record) -> Agent:
+        return Agent(**dict(record))
+
+    async def load_all(self) -> List[Agent]:
+        async with self.pool.acquire() as conn:
+            records = await conn.fetch(self._select_all_sql)
+        return [self._agent(record) for record in records]
+
+    async def get(self, agent_id: str) -> Optional[Agent]:
+        async with self.pool.acquire() as conn:
+            record = await conn.fetchrow(self._select_sql, agent_id)
+        return self._agent(record) if record else None
+
+    async def get_many(self, agent_ids: List[str]) -> List[Agent]:
+        async with self.pool.acquire() as conn:
+            records = await conn.fetch(self._select_many_sql, agent_ids)
+        return [self._agent(record) for record in records]
+
+    async def insert(self, agent: Agent) -> bool:
+        async with self.pool.acquire() as conn:
+            status = await conn.execute(self._insert_sql, *agent_row(agent))
+        return status == "INSERT 0 1"
+
+    async def insert_many(self, agents: List[Agent], atomic: bool) -> Tuple[List[str], List[str]]:
+        requested = [agent.id for agent in agents]
+        async with self.pool.acquire() as conn:
+            transaction = conn.transaction()
+            await transaction.start()
+            try:
+                await conn.execute(self._create_staging_sql)
+                await conn.copy_records_to_table(
+                    self._staging_table,
+                    records=[agent_row(agent) for agent in agents],
+                    columns=AGENT_COLUMNS
+                )
+                inserted = {record["id"] for record in await conn.fetch(self._insert_staged_sql)}
+                conflicts = [agent_id for agent_id in requested if agent_id not in inserted]
+                if atomic and conflicts:
+                    await transaction.rollback()
+                    return [], conflicts
+            except Exception:
+                await transaction.rollback()
+                raise
+            await transaction.commit()
+        return [agent_id for agent_id in requested if agent_id in inserted], conflicts
+
+    async def touch_many(self, last_seen: Dict[str, datetime]):
+        if not last_seen:
+            return
+        async with self.pool.acquire() as conn:
+            await conn.execute(self._touch_sql, list(last_seen), list(last_seen.values()))
+
+    async def mark_stale(self, agent_ids: List[str]) -> List[str]:
+        if not agent_ids:
+            return []
+        async with self.pool.acquire() as conn:
+            records = await conn.fetch(self._mark_stale_sql, agent_ids)
+        return [record["id"] for record in records]
+
+    async def update(self, agent: Agent, expected_versions: Optional[List[int]] = None) -> Optional[int]:
+        # A single statement, so concurrent updates cannot both match the same version
+        row = agent_row(agent)[:-1] + (expected_versions,)
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval(self._update_sql, *row)
+
+    async def delete(self, agent_id: str) -> bool:
+        async with self.pool.acquire() as conn:
+            status = await conn.execute(self._delete_sql, agent_id)
+        return status == "DELETE 1"
+
+    async def publish(self, change_type: ChangeType, changes: List[Tuple[str, Optional[Agent]]]) -> Optional[int]:
+        if not changes:
+            return None
+        agent_ids = [agent_id for agent_id, _ in changes]
+        agents = [agent.model_dump(mode="json") if agent is not None else None for _, agent in changes]
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", self.change_table)
+                version = await conn.fetchval(self._log_changes_sql, change_type.value, agent_ids, agents)
+                if version > self.max_change_events:
+                    await conn.execute(self._trim_changes_sql, version - self.max_change_events)
+                # Delivered on commit, after the logged changes are visible
+                for chunk in _notify_chunks(agent_ids):
+                    payload = json.dumps([self.process_id, change_type.value, chunk, version])
+                    await conn.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+        return version
+
+    async def changes_since(self, version: int, limit: int) -> Optional[List[ChangeEvent]]:
+        async with self.pool.acquire() as conn:
+            # One snapshot, so trimming in between cannot leave a silent gap
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                bounds = await conn.fetchrow(self._change_bounds_sql)
+                if version > bounds["latest"] or version < bounds["oldest"] - 1:
+                    return None
+                records = await conn.fetch(self._changes_since_sql, version, limit)
+        return [
+            ChangeEvent(
+                version=record["version"],
+                type=ChangeType(record["type"]),
+                agent_id=record["agent_id"],
+                agent=Agent(**record["agent"]) if record["agent"] is not None else None,
+                timestamp=record["timestamp"]
+            )
+            for record in records
+        ]
+
+    async def change_version(self) -> int:
+        async with self.pool.acquire() as conn:
+            return (await conn.fetchrow(self._change_bounds_sql))["latest"]
+
+    async def subscribe(self, callback: Callable[[ChangeType, List[str], Optional[int]], None]):
+        """LISTEN on a dedicated connection; pooled connections are released between statements"""
+        def on_notification(conn, pid, channel, payload):
+            process_id, change_type, agent_ids, version = json.loads(payload)
+            if process_id != self.process_id:
+                callback(ChangeType(change_type), agent_ids, version)
+
+        def on_termination(conn):
+            logger.error(f"Lost the {self.channel} listener; caches may miss changes from other workers")
+
+        self._listener = await asyncpg.connect(self.dsn)
+        self._listener.add_termination_listener(on_termination)
+        await self._listener.add_listener(self.channel, on_notification)
+
+# NOTIFY payloads must stay below 8000 bytes
+MAX_NOTIFY_PAYLOAD = 7000
+
+def _notify_chunks(agent_ids: List[str]) -> List[List[str]]:
+    """Split agent IDs into lists whose JSON encoding fits in one notification"""
+    chunks, chunk, size = [], [], 0
+    for agent_id in agent_ids:
+        encoded = len(json.dumps(agent_id)) + 1
+        if chunk and size + encoded > MAX_NOTIFY_PAYLOAD:
+            chunks.append(chunk)
+            chunk, size = [], 0
+        chunk.append(agent_id)
+        size += encoded
+    if chunk:
+        chunks.append(chunk)
+    return chunks
@@ -0,0 +1,207 @@
+import heapq
+from collections import Counter
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .index import tokenize
+
+def trigrams(term: str) -> Set[str]:
+    """Character trigrams of a term, padded like pg_trgm so short terms still have some"""
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def max_edits(length: int, one_edit_length: int = 3, two_edit_length: int = 8) -> int:
+    """
+    Edits tolerated for a query term of the given length. Two edits only
+    start at `two_edit_length`, where the trigram filter still prunes well.
+    """
+    if length < one_edit_length:
+        return 0
+    if length < two_edit_length:
+        return 1
+    return 2
+
+def bounded_levenshtein(a: str, b: str, max_distance: int) -> Optional[int]:
+    """Levenshtein distance between a and b, or None when it exceeds max_distance"""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        # Every path through this row already costs more than allowed
+        if min(current) > max_distance:
+            return None
+        previous = current
+    distance = previous[-1]
+    return distance if distance <= max_distance else None
+
+class TrigramIndex:
+    """
+    Typo-tolerant term index.
+
+    Each distinct term maps to the agents using it, and each trigram maps to
+    the terms containing it. A query term looks up terms sharing enough
+    trigrams to be within the edit budget (the q-gram lemma: one edit changes
+    at most three trigrams) and only those are verified with a bounded edit
+    distance, so cost depends on the vocabulary near the query rather than on
+    the number of agents.
+    """
+    def __init__(self, one_edit_length: int = 3, two_edit_length: int = 8):
+        self.one_edit_length = one_edit_length
+        self.two_edit_length = two_edit_length
+        self.term_agents: Dict[str, Set[str]] = {}
+        self.trigram_terms: Dict[str, Set[str]] = {}
+        # Terms indexed per agent, needed to remove stale postings on update/delete
+        self.documents: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, agent_id: str, texts: Iterable[Optional[str]]):
+        """Index (or re-index) the terms of an agent"""
+        self.remove(agent_id)
+        terms = set()
+        for text in texts:
+            terms.update(tokenize(text))
+        self.documents[agent_id] = terms
+        for term in terms:
+            agents = self.term_agents.get(term)
+            if agents is None:
+                agents = self.term_agents[term] = set()
+                for trigram in trigrams(term):
+                    self.trigram_terms.setdefault(trigram, set()).add(term)
+            agents.add(agent_id)
+
+    def remove(self, agent_id: str):
+        terms = self.documents.pop(agent_id, None)
+        if not terms:
+            return
+        for term in terms:
+            agents = self.term_agents[term]
+            agents.discard(agent_id)
+            if agents:
+                continue
+            del self.term_agents[term]
+            for trigram in trigrams(term):
+                posting = self.trigram_terms[trigram]
+                posting.discard(term)
+                if not posting:
+                    del self.trigram_terms[trigram]
+
+    def similar_terms(self, token: str) -> List[Tuple[str, int]]:
+        """Indexed terms within the edit budget of a query token, with their distance"""
+        max_distance = max_edits(len(token), self.one_edit_length, self.two_edit_length)
+        if max_distance == 0:
+            return [(token, 0)] if token in self.term_agents else []
+
+        token_trigrams = trigrams(token)
+        shared = Counter()
+        for trigram in token_trigrams:
+            shared.update(self.trigram_terms.get(trigram, ()))
+
+        # Terms sharing fewer trigrams cannot be within max_distance edits
+        min_shared = len(token_trigrams) - 3 * max_distance
+        matches = []
+        for term, count in shared.items():
+            if count < min_shared:
+                continue
+            distance = bounded_levenshtein(token, term, max_distance)
+            if distance is not None:
+                matches.append((term, distance))
+        return matches
+
+    def _ranked_agents(
+        self,
+        similarities: Dict[str, float],
+        candidates: Optional[Set[str]]
+    ) -> Iterator[Tuple[str, float]]:
+        """Agents using the matched terms, most similar term first; an agent's first occurrence carries its best similarity"""
+        for term in sorted(similarities, key=similarities.get, reverse=True):
+            agents = self.term_agents[term]
+            if candidates is not None:
+                agents = agents & candidates
+            for agent_id in agents:
+                yield agent_id, similarities[term]
+
+    def _best_similarity(self, agent_id: str, similarities: Dict[str, float]) -> Optional[float]:
+        return max((similarities[term] for term in self.documents[agent_id] if term in similarities), default=None)
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        candidates: Optional[Set[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Return up to k (agent_id, score) pairs for agents approximately
+        matching every query term, best first. The score is the mean
+        similarity 1 - distance / length of the best match for each term.
+
+        The agents of each query term are read as a stream, from the
+        postings of its most similar matched term down, and the streams are
+        read in turn (Fagin's threshold algorithm). An agent is scored on
+        first sight from its own terms; reading stops once k agents score
+        at least the sum of the streams' current similarities, so terms
+        shared by many agents are not read much past the first k.
+        """
+        tokens = set(tokenize(query))
+        if k <= 0 or not tokens:
+            return []
+
+        token_similarities = []
+        for token in tokens:
+            similarities = {
+                term: 1 - distance / max(len(term), len(token))
+                for term, distance in self.similar_terms(token)
+            }
+            if not similarities:
+                return []
+            token_similarities.append(similarities)
+
+        streams = [self._ranked_agents(similarities, candidates) for similarities in token_similarities]
+        levels = [1.0] * len(streams)
+        seen: Set[str] = set()
+        top: List[Tuple[float, str]] = []
+        while True:
+            for i, stream in enumerate(streams):
+                entry = next(stream, None)
+                if entry is None:
+                    # Agents matching every term occur in every stream, so all have been seen
+                    return self._ranked(top, len(tokens))
+                agent_id, similarity = entry
+                levels[i] = similarity
+                if agent_id in seen:
+                    continue
+                seen.add(agent_id)
+                score = similarity
+                for j, similarities in enumerate(token_similarities):
+                    if j == i:
+                        continue
+                    best = self._best_similarity(agent_id, similarities)
+                    if best is None:
+                        break
+                    score += best
+                else:
+                    if len(top) < k:
+                        heapq.heappush(top, (score, agent_id))
+                    elif score > top[0][0]:
+                        heapq.heapreplace(top, (score, agent_id))
+            # Agents not seen yet score at most the current level of each stream;
+            # the tolerance absorbs rounding from summing in a different order
+            if len(top) == k and top[0][0] >= sum(levels) - 1e-9:
+                return self._ranked(top, len(tokens))
+
+    @staticmethod
+    def _ranked(top: List[Tuple[float, str]], token_count: int) -> List[Tuple[str, float]]:
+        return [(agent_id, score / token_count) for score, agent_id in sorted(top, key=itemgetter(0), reverse=True)]
+
+    def clear(self):
+        self.term_agents.clear()
+        self.trigram_terms.clear()
+        self.documents.clear()
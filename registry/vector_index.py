@@ -0,0 +1,144 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+class VectorIndex:
+    """
+    In-process exact nearest-neighbour index over agent embeddings.
+
+    Embeddings live in one contiguous float32 matrix with an id <-> row
+    mapping. Deleted agents leave a tombstoned row behind, and the matrix is
+    compacted once tombstones exceed `compaction_ratio` of the used rows.
+    Queries are answered with a single matrix-vector product followed by an
+    argpartition top-k, so vectors are expected to be L2-normalized and the
+    score is their cosine similarity.
+    """
+    def __init__(self, dimensions: int, initial_capacity: int = 1024, compaction_ratio: float = 0.25):
+        self.dimensions = dimensions
+        self.initial_capacity = max(initial_capacity, 1)
+        self.compaction_ratio = compaction_ratio
+        self.matrix = np.zeros((self.initial_capacity, dimensions), dtype=np.float32)
+        self.live = np.zeros(self.matrix.shape[0], dtype=bool)
+        # Number of rows in use, including tombstones
+        self.size = 0
+        self.tombstones = 0
+        self.row_ids: List[Optional[str]] = []
+        self.id_rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.id_rows)
+
+    def __contains__(self, agent_id: str) -> bool:
+        return agent_id in self.id_rows
+
+    def _grow(self, needed: int):
+        capacity = self.matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        matrix = np.zeros((capacity, self.dimensions), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        live = np.zeros(capacity, dtype=bool)
+        live[:self.size] = self.live[:self.size]
+        self.matrix, self.live = matrix, live
+
+    def add(self, agent_id: str, vector: np.ndarray):
+        """Insert or overwrite the embedding of an agent"""
+        row = self.id_rows.get(agent_id)
+        if row is None:
+            self._grow(self.size + 1)
+            row = self.size
+            self.size += 1
+            self.row_ids.append(agent_id)
+            self.id_rows[agent_id] = row
+            self.live[row] = True
+        self.matrix[row] = vector
+
+    def add_batch(self, agent_ids: List[str], vectors: np.ndarray):
+        """Insert or overwrite the embeddings of several agents"""
+        self._grow(self.size + len(agent_ids))
+        for agent_id, vector in zip(agent_ids, vectors):
+            self.add(agent_id, vector)
+
+    def remove(self, agent_id: str):
+        """Tombstone the row of an agent, compacting when too many accumulate"""
+        row = self.id_rows.pop(agent_id, None)
+        if row is None:
+            return
+        self.live[row] = False
+        self.row_ids[row] = None
+        self.tombstones += 1
+        if self.tombstones > self.compaction_ratio * self.size:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the matrix without tombstoned rows"""
+        if not self.tombstones:
+            return
+        keep = np.flatnonzero(self.live[:self.size])
+        # Leave headroom for growth but release memory after mass deletes
+        capacity = max(2 * len(keep), self.initial_capacity)
+        matrix = np.zeros((capacity, self.dimensions), dtype=np.float32)
+        matrix[:len(keep)] = self.matrix[keep]
+        live = np.zeros(capacity, dtype=bool)
+        live[:len(keep)] = True
+
+        self.row_ids = [self.row_ids[row] for row in keep]
+        self.id_rows = {agent_id: row for row, agent_id in enumerate(self.row_ids)}
+        self.matrix, self.live = matrix, live
+        self.size = len(keep)
+        self.tombstones = 0
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        candidates: Optional[Iterable[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Return up to k (agent_id, similarity) pairs, best first.
+
+        When `candidates` is given only those agents are scored, so filtered
+        queries touch only the matching rows.
+        """
+        if k <= 0 or not self.id_rows or not np.any(query):
+            return []
+        query = np.asarray(query, dtype=np.float32)
+
+        if candidates is None:
+            rows = None
+            scores = self.matrix[:self.size] @ query
+            scores[~self.live[:self.size]] = -np.inf
+        else:
+            rows = np.fromiter(
+                (self.id_rows[agent_id] for agent_id in candidates if agent_id in self.id_rows),
+                dtype=np.intp
+            )
+            if not len(rows):
+                return []
+            scores = self.matrix[rows] @ query
+
+        k = min(k, len(scores))
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        hits = []
+        for position in top:
+            score = scores[position]
+            if score == -np.inf:
+                break
+            row = position if rows is None else rows[position]
+            hits.append((self.row_ids[row], float(score)))
+        return hits
+
+    def clear(self):
+        self.matrix[:self.size] = 0
+        self.live[:] = False
+        self.size = 0
+        self.tombstones = 0
+        self.row_ids = []
+        self.id_rows = {}
@@ -0,0 +1,385 @@
+from typing import Dict, Iterator, List, Optional, Union
+from datetime import datetime
+import asyncio
+import gc
+import json
+import logging
+import mmap
+import os
+import re
+
+from pydantic import HttpUrl
+
+from .models import Agent, Protocol
+from .records import AgentRecord
+from .storage import AgentStorage, AGENT_COLUMNS, agent_row
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Log record kinds; each record is a JSON array starting with its kind
+PUT = "P"
+DELETE = "D"
+TOUCH = "T"
+STALE = "S"
+
+SNAPSHOT_FILE = re.compile(r"^snapshot-(\d+)\.jsonl$")
+LOG_FILE = re.compile(r"^wal-(\d+)\.log$")
+
+def _encode(record) -> bytes:
+    return json.dumps(record, separators=(",", ":"), default=datetime.isoformat).encode("utf-8") + b"\n"
+
+def _decode_agent(row: list) -> AgentRecord:
+    """
+    Record of a logged agent row. Agents are validated before they are
+    logged, so only the values JSON cannot carry are converted back and no
+    model is built.
+    """
+    # Rows written before a column existed are shorter; the model default fills it in
+    fields = dict(zip(AGENT_COLUMNS, row))
+    fields["protocol"] = Protocol(fields["protocol"])
+    fields["registered_at"] = datetime.fromisoformat(fields["registered_at"])
+    fields["last_seen"] = datetime.fromisoformat(fields["last_seen"])
+    if fields["endpoint_url"] is not None:
+        fields["endpoint_url"] = HttpUrl(fields["endpoint_url"])
+    return AgentRecord.from_fields(fields)
+
+def _owned(agent: Union[Agent, AgentRecord]) -> AgentRecord:
+    """A record of the agent that no caller holds"""
+    return agent.copy() if isinstance(agent, AgentRecord) else AgentRecord(agent)
+
+def _read_lines(path: str) -> Iterator[bytes]:
+    """Lines of a file, read through a memory map instead of buffered reads"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield from iter(mapped.readline, b"")
+
+def _read_rows(path: str, batch_size: int = 10000) -> Iterator[list]:
+    """
+    Rows of a complete snapshot file. Lines are parsed as one JSON array per
+    batch, which is several times faster than one json.loads call per line.
+    """
+    batch = []
+    for line in _read_lines(path):
+        batch.append(line)
+        if len(batch) == batch_size:
+            yield from json.loads(b"[" + b",".join(batch) + b"]")
+            batch.clear()
+    if batch:
+        yield from json.loads(b"[" + b",".join(batch) + b"]")
+
+def _fsync_directory(directory: str):
+    """Make renames and newly created files in a directory durable"""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class WalAgentStorage(AgentStorage):
+    """
+    Agent storage for deployments without a database: the agents are kept
+    in memory as compact records and made durable by a write-ahead log plus
+    periodic snapshots. Records are copied in and out, so changes the
+    registry makes to its cached agents only reach the storage through
+    logged writes.
+
+    A mutation is acknowledged once its log record is fsynced. Records
+    submitted while a fsync is in progress are written together by the next
+    one (group commit), so concurrent writers share fsyncs. Inserts, updates
+    and deletes are checked and applied in memory when their record is
+    submitted, so concurrent conflicting writes are decided in order; if the
+    commit fails, every change of its group is undone. Heartbeat and stale
+    records are applied once logged. Every
+    `snapshot_interval` seconds the committed agents are written to a
+    compact snapshot and a new log is started; changes staged for a commit
+    still in progress go to the new log instead. Startup loads the latest snapshot through a
+    memory map and replays the logs written after it.
+
+    Files are numbered by generation: snapshot-N holds every change logged
+    before wal-N. A snapshot only replaces older files once it is complete,
+    and replaying a record twice is harmless, so a crash at any point
+    recovers to the last acknowledged write.
+    """
+    def __init__(self, directory: str, snapshot_interval: float = 300.0, fsync: bool = True):
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.fsync = fsync
+        self.agents: Dict[str, AgentRecord] = {}
+        self.generation = 0
+        self._log = None
+        # Encoded records waiting for the next group commit, and the future it resolves
+        self._pending: List[bytes] = []
+        # Agents changed by the pending records, as they were before; restored if the commit fails
+        self._undo: Dict[str, Optional[AgentRecord]] = {}
+        self._commit: Optional[asyncio.Future] = None
+        self._commit_task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+        self._records_since_snapshot = 0
+        self._snapshot_task: Optional[asyncio.Task] = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _generations(self, pattern: re.Pattern) -> List[int]:
+        return sorted(
+            int(match.group(1))
+            for match in map(pattern.match, os.listdir(self.directory))
+            if match
+        )
+
+    def _apply(self, record: list):
+        kind = record[0]
+        if kind == PUT:
+            agent = _decode_agent(record[1])
+            self.agents[agent.id] = agent
+        elif kind == DELETE:
+            self.agents.pop(record[1], None)
+        elif kind == TOUCH:
+            for agent_id, last_seen in record[1]:
+                agent = self.agents.get(agent_id)
+                if agent is not None:
+                    agent.last_seen = datetime.fromisoformat(last_seen)
+                    agent.stale = False
+        elif kind == STALE:
+            for agent_id in record[1]:
+                agent = self.agents.get(agent_id)
+                if agent is not None:
+                    agent.stale = True
+        else:
+            raise ValueError(f"Unknown agent log record: {kind}")
+
+    def _replay(self, path: str) -> int:
+        count = 0
+        for line in _read_lines(path):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Only the last record can be torn, by a crash before its fsync was acknowledged
+                logger.warning(f"Ignoring incomplete record at the end of {path}")
+                break
+            self._apply(record)
+            count += 1
+        return count
+
+    def _open_log(self, generation: int):
+        log = open(self._path(f"wal-{generation}.log"), "ab")
+        _fsync_directory(self.directory)
+        return log
+
+    def _recover(self):
+        """Load the latest snapshot and replay the logs written since"""
+        # Collections triggered by the allocations would repeatedly traverse every loaded agent
+        gc.disable()
+        try:
+            self._load_files()
+        finally:
+            gc.enable()
+        # Never append after a possibly torn record: start a new log
+        self._log = self._open_log(self.generation)
+        logger.info(f"Recovered {len(self.agents)} agents, replaying {self._records_since_snapshot} log records")
+
+    def _load_files(self):
+        os.makedirs(self.directory, exist_ok=True)
+        # Snapshots interrupted by a crash
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                os.remove(self._path(name))
+        snapshots = self._generations(SNAPSHOT_FILE)
+        logs = self._generations(LOG_FILE)
+
+        base = snapshots[-1] if snapshots else 0
+        if base:
+            for row in _read_rows(self._path(f"snapshot-{base}.jsonl")):
+                agent = _decode_agent(row)
+                self.agents[agent.id] = agent
+        self._records_since_snapshot = sum(
+            self._replay(self._path(f"wal-{generation}.log")) for generation in logs if generation >= base
+        )
+        self.generation = max([base, *logs]) + 1
+
+    async def connect(self):
+        """Recover the stored agents and start taking periodic snapshots"""
+        await asyncio.to_thread(self._recover)
+        self._snapshot_task = asyncio.create_task(self._snapshot_loop())
+
+    async def close(self):
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            self._snapshot_task = None
+        if self._log is None:
+            return
+        await self._flush_pending()
+        # A final snapshot makes the next startup a plain snapshot load
+        try:
+            await self.snapshot()
+        except Exception as e:
+            logger.error(f"Failed to snapshot agent storage on close: {str(e)}")
+        async with self._write_lock:
+            self._log.close()
+            self._log = None
+
+    def _write(self, log, lines: List[bytes]):
+        log.writelines(lines)
+        log.flush()
+        if self.fsync:
+            os.fsync(log.fileno())
+
+    async def _group_commit(self):
+        async with self._write_lock:
+            lines, self._pending = self._pending, []
+            undo, self._undo = self._undo, {}
+            commit, self._commit = self._commit, None
+            try:
+                await asyncio.to_thread(self._write, self._log, lines)
+            except Exception as e:
+                for agent_id, agent in undo.items():
+                    if agent is None:
+                        self.agents.pop(agent_id, None)
+                    else:
+                        self.agents[agent_id] = agent
+                commit.set_exception(e)
+            else:
+                self._records_since_snapshot += len(lines)
+                commit.set_result(None)
+
+    async def _append(self, *records: list):
+        """Log records, returning once they are durable"""
+        self._pending.extend(_encode(record) for record in records)
+        if self._commit is None:
+            self._commit = asyncio.get_running_loop().create_future()
+            self._commit_task = asyncio.create_task(self._group_commit())
+        # Shielded: a cancelled writer must not fail the commit of the others
+        await asyncio.shield(self._commit)
+
+    async def snapshot(self):
+        """Write every agent to a new snapshot and drop the files it supersedes"""
+        async with self._write_lock:
+            if not self._records_since_snapshot:
+                return
+            # Records from now on go to the next log, replayed on top of this snapshot
+            generation = self.generation + 1
+            log = await asyncio.to_thread(self._open_log, generation)
+            self._log.close()
+            self._log, self.generation = log, generation
+            self._records_since_snapshot = 0
+            # Changes staged for the next commit are logged to the new log, and
+            # may still be undone: the snapshot holds their agents as committed
+            committed = dict(self.agents)
+            for agent_id, agent in self._undo.items():
+                if agent is None:
+                    committed.pop(agent_id, None)
+                else:
+                    committed[agent_id] = agent
+            agents = list(committed.values())
+
+        await asyncio.to_thread(self._write_snapshot, generation, agents)
+        logger.info(f"Wrote agent storage snapshot {generation} with {len(agents)} agents")
+
+    def _write_snapshot(self, generation: int, agents: List[AgentRecord]):
+        path = self._path(f"snapshot-{generation}.jsonl")
+        with open(f"{path}.tmp", "wb") as f:
+            f.writelines(_encode(agent_row(agent)) for agent in agents)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+        _fsync_directory(self.directory)
+
+        for older in self._generations(SNAPSHOT_FILE):
+            if older < generation:
+                os.remove(self._path(f"snapshot-{older}.jsonl"))
+        for older in self._generations(LOG_FILE):
+            if older < generation:
+                os.remove(self._path(f"wal-{older}.log"))
+
+    async def _flush_pending(self):
+        commit = self._commit
+        if commit is not None:
+            await asyncio.shield(commit)
+
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                await self.snapshot()
+            except Exception as e:
+                logger.error(f"Failed to snapshot agent storage: {str(e)}")
+
+    async def load_all(self) -> List[AgentRecord]:
+        return [agent.copy() for agent in self.agents.values()]
+
+    async def get(self, agent_id: str) -> Optional[AgentRecord]:
+        agent = self.agents.get(agent_id)
+        return agent.copy() if agent is not None else None
+
+    async def get_many(self, agent_ids: List[str]) -> List[AgentRecord]:
+        return [self.agents[agent_id].copy() for agent_id in agent_ids if agent_id in self.agents]
+
+    def _stage(self, agent_id: str, agent: Optional[AgentRecord]):
+        """Change an agent in memory ahead of the commit of its record, remembering how to undo it"""
+        if agent_id not in self._undo:
+            self._undo[agent_id] = self.agents.get(agent_id)
+        if agent is None:
+            self.agents.pop(agent_id, None)
+        else:
+            self.agents[agent_id] = agent
+
+    async def insert(self, agent: Agent) -> bool:
+        if agent.id in self.agents:
+            return False
+        self._stage(agent.id, _owned(agent))
+        await self._append([PUT, agent_row(agent)])
+        return True
+
+    async def insert_many(self, agents: List[Agent], atomic: bool):
+        conflicts = [agent.id for agent in agents if agent.id in self.agents]
+        if atomic and conflicts:
+            return [], conflicts
+        accepted = [agent for agent in agents if agent.id not in self.agents]
+        for agent in accepted:
+            self._stage(agent.id, _owned(agent))
+        # One group commit for the whole batch
+        if accepted:
+            await self._append(*([PUT, agent_row(agent)] for agent in accepted))
+        return [agent.id for agent in accepted], conflicts
+
+    async def update(self, agent: Agent, expected_versions: Optional[List[int]] = None) -> Optional[int]:
+        current = self.agents.get(agent.id)
+        if current is None or (expected_versions is not None and current.version not in expected_versions):
+            return None
+        agent = agent.model_copy(update={"version": current.version + 1})
+        self._stage(agent.id, _owned(agent))
+        await self._append([PUT, agent_row(agent)])
+        return agent.version
+
+    async def delete(self, agent_id: str) -> bool:
+        if agent_id not in self.agents:
+            return False
+        self._stage(agent_id, None)
+        await self._append([DELETE, agent_id])
+        return True
+
+    async def touch_many(self, last_seen: Dict[str, datetime]):
+        beats = [(agent_id, seen_at) for agent_id, seen_at in last_seen.items() if agent_id in self.agents]
+        if not beats:
+            return
+        await self._append([TOUCH, beats])
+        for agent_id, seen_at in beats:
+            # Deleted while the record was committed
+            agent = self.agents.get(agent_id)
+            if agent is not None:
+                agent.last_seen = seen_at
+                agent.stale = False
+
+    async def mark_stale(self, agent_ids: List[str]) -> List[str]:
+        agent_ids = [agent_id for agent_id in agent_ids if agent_id in self.agents and not self.agents[agent_id].stale]
+        if not agent_ids:
+            return []
+        await self._append([STALE, agent_ids])
+        for agent_id in agent_ids:
+            agent = self.agents.get(agent_id)
+            if agent is not None:
+                agent.stale = True
+        return agent_ids
@@ -0,0 +1,73 @@
+"""
+Memory used per cached agent, as pydantic Agent models and as compact
+AgentRecords.
+
+Agents are decoded from JSON one by one, as registration requests are, so
+each one starts with its own copies of the strings it shares with others.
+
+Usage (from the directory containing the AutonomousSphere package):
+
+    python -m AutonomousSphere.scripts.benchmark_agent_memory --counts 100000 1000000
+"""
+from datetime import datetime
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+from AutonomousSphere.registry.models import Agent, Protocol
+from AutonomousSphere.registry.records import AgentRecord
+
+TOOLS = [f"tool-{i}" for i in range(50)]
+SKILLS = [f"skill-{i}" for i in range(100)]
+LANGUAGES = ["en", "es", "fr", "de", "it", "pt", "ja", "zh", "ko", "ru"]
+OWNERS = [f"@owner-{i}:example.com" for i in range(500)]
+ROOMS = [f"!room-{i}:example.com" for i in range(1000)]
+
+def agent_payload(i: int, rng: random.Random) -> bytes:
+    """JSON registration body of a synthetic agent"""
+    return json.dumps({
+        "id": f"agent-{i}",
+        "matrix_id": f"@agent-{i}:example.com",
+        "display_name": f"Agent {i}",
+        "description": f"Synthetic agent {i} used to measure registry memory",
+        "protocol": rng.choice(list(Protocol)).value,
+        "tools": rng.sample(TOOLS, 3),
+        "skills": rng.sample(SKILLS, 2),
+        "languages": rng.sample(LANGUAGES, rng.randint(1, 2)),
+        "endpoint_url": f"https://agents.example.com/{i}",
+        "room_ids": rng.sample(ROOMS, 2),
+        "owner": rng.choice(OWNERS),
+        "public": rng.random() < 0.8,
+    }).encode("utf-8")
+
+def measure(count: int, compact: bool) -> float:
+    """Bytes allocated per agent kept in a registry dict"""
+    rng = random.Random(count)
+    now = datetime.now()
+    gc.collect()
+    tracemalloc.start()
+    registry = {}
+    for i in range(count):
+        agent = Agent(**json.loads(agent_payload(i, rng)), registered_at=now, last_seen=now)
+        registry[agent.id] = AgentRecord(agent) if compact else agent
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del registry
+    return size / count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[100000, 1000000])
+    args = parser.parse_args()
+
+    print(f"{'agents':>10} {'Agent bytes':>12} {'record bytes':>13} {'ratio':>6}")
+    for count in args.counts:
+        models = measure(count, compact=False)
+        records = measure(count, compact=True)
+        print(f"{count:>10} {models:>12.0f} {records:>13.0f} {models / records:>6.1f}")
+
+if __name__ == "__main__":
+    main()
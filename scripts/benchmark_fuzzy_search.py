@@ -0,0 +1,48 @@
+"""
+Latency of the typo-tolerant (fuzzy) agent search when many agents share
+the same skills and tools, so each matched term has a long posting list.
+
+Usage (from the directory containing the AutonomousSphere package):
+
+    python -m AutonomousSphere.scripts.benchmark_fuzzy_search --counts 100000
+"""
+import argparse
+import random
+import time
+
+from AutonomousSphere.registry.trigram import TrigramIndex
+
+SKILLS = ["search", "summarizer", "summarization", "translation", "weather", "forecast", "calendar", "email"]
+TOOLS = ["bot", "pdf", "browser", "calculator", "database", "scheduler"]
+QUERIES = ["serch", "summariser", "bot", "wether forcast", "translaton pdf", "calender emial"]
+
+def build(count: int) -> TrigramIndex:
+    """Index of synthetic agents drawing their skills and tools from small shared vocabularies"""
+    rng = random.Random(count)
+    index = TrigramIndex()
+    for i in range(count):
+        index.add(f"agent-{i}", [f"Agent {i}", *rng.sample(SKILLS, 2), *rng.sample(TOOLS, 2)])
+    return index
+
+def measure(index: TrigramIndex, query: str, k: int, repeat: int) -> float:
+    """Mean milliseconds per search"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        index.search(query, k)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[100000])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'agents':>10} {'query':>16} {'ms':>8}")
+    for count in args.counts:
+        index = build(count)
+        for query in QUERIES:
+            print(f"{count:>10} {query:>16} {measure(index, query, args.k, args.repeat):>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+class FusionMethod(str, Enum):
+    RRF = "rrf"
+    BLEND = "blend"
+
+def _score(item: Any, field: str) -> Optional[float]:
+    value = item.get(field) if isinstance(item, dict) else getattr(item, field, None)
+    return float(value) if value is not None else None
+
+def source_rankings(results: Dict[str, Any]) -> Dict[str, List[Tuple[Any, Optional[float]]]]:
+    """
+    The (item, score) candidates of each source of a unified search, in the
+    order the sources ranked them, best first. Rooms have no score of their
+    own, nor do agents found by the unranked registry engines.
+    """
+    matrix = results.get("matrix") or {}
+    agents = [(agent, _score(agent, "score")) for agent in results.get("agents") or []]
+    messages = [(message, _score(message, "rank")) for message in matrix.get("messages") or []]
+    rooms = [(room, None) for room in matrix.get("rooms") or []]
+    return {"agents": agents, "messages": messages, "rooms": rooms}
+
+def _normalized(candidates: List[Tuple[Any, Optional[float]]]) -> List[float]:
+    """Scores min-max normalized to [0, 1], or 1 down to 1/n by rank when the source has no usable scores"""
+    scores = [score for _, score in candidates]
+    if candidates and all(score is not None for score in scores):
+        low, high = min(scores), max(scores)
+        if high > low:
+            return [(score - low) / (high - low) for score in scores]
+    count = len(candidates)
+    return [(count - rank) / count for rank in range(count)]
+
+def fuse(
+    rankings: Dict[str, List[Tuple[Any, Optional[float]]]],
+    method: FusionMethod,
+    weights: Dict[str, float],
+    top_k: int,
+    rrf_k: int = 60
+) -> List[Dict[str, Any]]:
+    """
+    Merge the rankings of the sources into one list of the `top_k` best
+    {"source", "score", "item"} entries.
+
+    Reciprocal rank fusion scores the item at 1-based rank r of a source
+    `weight / (rrf_k + r)`, so only positions count and scores on different
+    scales need no calibration. Blending scores it `weight * s` with s its
+    score min-max normalized within its source. Either way a source's
+    score decreases with rank and every item comes from a single source,
+    so each source only needs to supply its own best `top_k` candidates.
+    """
+    fused = []
+    for source, candidates in rankings.items():
+        weight = weights.get(source, 0)
+        if weight <= 0 or not candidates:
+            continue
+        if method == FusionMethod.RRF:
+            scores = [weight / (rrf_k + rank) for rank in range(1, len(candidates) + 1)]
+        else:
+            scores = [weight * score for score in _normalized(candidates)]
+        fused.extend(
+            {"source": source, "score": score, "item": item}
+            for (item, _), score in zip(candidates, scores)
+        )
+    # Stable, so ties keep the sources' order
+    fused.sort(key=lambda entry: entry["score"], reverse=True)
+    return fused[:top_k]
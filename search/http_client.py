@@ -0,0 +1,92 @@
+from typing import Any, Dict, Optional
+import logging
+
+import httpx
+
+from AutonomousSphere.config import HTTPClientSettings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class PooledHTTPClient:
+    """
+    Application-scoped httpx.AsyncClient for calls to the homeserver and the API itself.
+
+    One client, and so one connection pool, is shared by every request
+    instead of paying for a TCP and TLS handshake per call. It is opened
+    at startup and closed at shutdown; `get()` opens it with the default
+    settings if it is used outside that lifespan (e.g. in scripts).
+
+    New connections are counted through httpcore's trace extension, so
+    `stats()` reports how many responses came over a pooled connection.
+    Requests failing without a response count as neither.
+    """
+    def __init__(self):
+        self.client: Optional[httpx.AsyncClient] = None
+        self.settings = HTTPClientSettings()
+        self.requests = 0
+        self.responses = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+
+    async def start(self, settings: Optional[HTTPClientSettings] = None):
+        """(Re)open the client with the given settings, closing the previous one"""
+        await self.close()
+        self.settings = settings or HTTPClientSettings()
+        self._open()
+
+    def _open(self):
+        limits = httpx.Limits(
+            max_connections=self.settings.max_connections,
+            max_keepalive_connections=self.settings.max_keepalive_connections,
+            keepalive_expiry=self.settings.keepalive_expiry
+        )
+        options = dict(
+            limits=limits,
+            timeout=self.settings.timeout,
+            event_hooks={"request": [self._on_request], "response": [self._on_response]}
+        )
+        try:
+            self.client = httpx.AsyncClient(http2=self.settings.http2, **options)
+        except ImportError:
+            # HTTP/2 needs the optional h2 package (pip install httpx[http2])
+            logger.warning("HTTP/2 requested but the h2 package is not installed, using HTTP/1.1")
+            self.client = httpx.AsyncClient(**options)
+
+    def get(self) -> httpx.AsyncClient:
+        if self.client is None:
+            self._open()
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def _on_request(self, request: httpx.Request):
+        self.requests += 1
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            if event_name == "connection.connect_tcp.complete":
+                self.connections_opened += 1
+                request.extensions["new_connection"] = True
+
+        request.extensions["trace"] = trace
+
+    async def _on_response(self, response: httpx.Response):
+        self.responses += 1
+        if not response.request.extensions.get("new_connection"):
+            self.connections_reused += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "responses": self.responses,
+            "connections_opened": self.connections_opened,
+            "connections_reused": self.connections_reused,
+            "reuse_ratio": self.connections_reused / self.responses if self.responses else 0.0,
+            "http2": self.settings.http2,
+        }
+
+# Shared by the search routes and the MCP service registration
+http_client = PooledHTTPClient()
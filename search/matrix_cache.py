@@ -0,0 +1,134 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+import asyncio
+import hashlib
+import logging
+import time
+
+from AutonomousSphere.config import MatrixCacheSettings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def matrix_search_key(
+    homeserver_url: str,
+    access_token: str,
+    query: str,
+    next_batch: Optional[str] = None,
+    limit: Optional[int] = None
+) -> str:
+    """
+    Key of a Matrix search; results depend on the user, so the access token
+    is part of it, hashed so that tokens are not kept in memory
+    """
+    parts = [homeserver_url, access_token, query, next_batch or "", str(limit or "")]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+class MatrixSearchCache:
+    """
+    TTL and LRU bounded cache of Matrix search responses with stale-while-revalidate.
+
+    A response younger than `ttl` seconds is served as is. An older one is
+    still served until it is `stale_ttl` seconds old, while a single
+    background refresh per key fetches a new one; beyond that, callers wait
+    for the fetch. Only successful responses are cached. Once
+    `max_entries` are cached the least recently used one is evicted; a
+    `ttl` of 0 disables the cache.
+    """
+    def __init__(self, ttl: float = 30.0, stale_ttl: float = 300.0, max_entries: int = 1000):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        # key -> (monotonic time fetched, response)
+        self.entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.refreshing: Dict[str, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def configure(self, settings: Optional[MatrixCacheSettings] = None):
+        settings = settings or MatrixCacheSettings()
+        self.ttl = settings.ttl
+        self.stale_ttl = max(settings.stale_ttl, self.ttl)
+        self.max_entries = settings.max_entries
+        while len(self.entries) > max(self.max_entries, 0):
+            self.entries.popitem(last=False)
+
+    @staticmethod
+    def cacheable(response: Dict[str, Any]) -> bool:
+        return "error" not in response
+
+    def _store(self, key: str, response: Dict[str, Any]):
+        if not self.cacheable(response) or self.max_entries <= 0:
+            return
+        self.entries[key] = (time.monotonic(), response)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def _refresh(self, key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]):
+        try:
+            self._store(key, await fetch())
+        except Exception as e:
+            logger.error(f"Failed to refresh cached Matrix search: {str(e)}")
+        finally:
+            self.refreshing.pop(key, None)
+
+    def _revalidate(self, key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]):
+        if key in self.refreshing:
+            return
+        self.refreshes += 1
+        task = asyncio.create_task(self._refresh(key, fetch))
+        self.refreshing[key] = task
+        # Keep a reference until done so the task is not garbage collected
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def get_or_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+        now: Optional[float] = None
+    ) -> Dict[str, Any]:
+        if self.ttl <= 0:
+            return await fetch()
+        now = time.monotonic() if now is None else now
+        entry = self.entries.get(key)
+        if entry is not None:
+            age = now - entry[0]
+            if age < self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if age < self.stale_ttl:
+                self.entries.move_to_end(key)
+                self.stale_hits += 1
+                self._revalidate(key, fetch)
+                return entry[1]
+            del self.entries[key]
+        self.misses += 1
+        response = await fetch()
+        self._store(key, response)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+        }
+
+    async def close(self):
+        """Cancel background refreshes and drop the cached responses"""
+        for task in list(self._tasks):
+            task.cancel()
+        self.refreshing.clear()
+        self.entries.clear()
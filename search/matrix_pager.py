@@ -0,0 +1,144 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+
+from AutonomousSphere.config import MatrixPrefetchSettings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def page_next_batch(page: Dict[str, Any]) -> Optional[str]:
+    """Pagination token of a Matrix search response, None on the last page or an error"""
+    return ((page.get("search_categories") or {}).get("room_events") or {}).get("next_batch")
+
+class _End:
+    """Marks the end of the pages in the prefetch queue"""
+    def __init__(self, error: Optional[BaseException] = None):
+        self.error = error
+
+async def prefetch_pages(
+    fetch_page: Callable[[Optional[str]], Awaitable[Dict[str, Any]]],
+    next_batch: Optional[str] = None,
+    depth: int = 2
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Iterate over the pages of a Matrix search, starting at `next_batch`.
+
+    A background task fetches the following pages while the current one is
+    consumed, holding at most `depth` fetched pages ahead of the consumer,
+    which bounds the memory used by a slow consumer. Iteration ends after
+    the last page or a page reporting an error; an exception raised by
+    `fetch_page` is re-raised to the consumer. Closing the iterator stops
+    the prefetching.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(depth, 1))
+
+    async def produce():
+        batch = next_batch
+        try:
+            while True:
+                page = await fetch_page(batch)
+                await queue.put(page)
+                batch = page_next_batch(page)
+                if batch is None:
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(_End(e))
+            return
+        await queue.put(_End())
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            page = await queue.get()
+            if isinstance(page, _End):
+                if page.error is not None:
+                    raise page.error
+                return
+            yield page
+    finally:
+        producer.cancel()
+
+class PagePrefetcher:
+    """
+    Fetches the pages following a served one in the background.
+
+    `fetch_page` is expected to store what it fetches (e.g. in the Matrix
+    search cache), so that a client asking for the next page with the
+    `next_batch` it was handed gets it without waiting on the homeserver.
+    At most `depth` pages are fetched per cursor and at most `max_active`
+    cursors are prefetched at once, which bounds the memory held by
+    prefetched pages; a `depth` of 0 disables prefetching.
+    """
+    def __init__(self, depth: int = 2, max_active: int = 100):
+        self.depth = depth
+        self.max_active = max_active
+        self.active: Dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.skipped = 0
+        self.pages = 0
+
+    def __len__(self) -> int:
+        return len(self.active)
+
+    def configure(self, settings: Optional[MatrixPrefetchSettings] = None):
+        settings = settings or MatrixPrefetchSettings()
+        self.depth = settings.depth
+        self.max_active = settings.max_active
+
+    def schedule(
+        self,
+        key: str,
+        fetch_page: Callable[[Optional[str]], Awaitable[Dict[str, Any]]],
+        next_batch: str
+    ) -> bool:
+        """Start prefetching the pages from `next_batch` on; returns whether a prefetch was started"""
+        if self.depth <= 0 or key in self.active:
+            return False
+        if len(self.active) >= self.max_active:
+            self.skipped += 1
+            return False
+        self.started += 1
+        task = asyncio.create_task(self._prefetch(fetch_page, next_batch, self.depth))
+        self.active[key] = task
+        task.add_done_callback(lambda done: self._done(key, done))
+        return True
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self.active.get(key) is task:
+            del self.active[key]
+
+    async def _prefetch(
+        self,
+        fetch_page: Callable[[Optional[str]], Awaitable[Dict[str, Any]]],
+        next_batch: str,
+        depth: int
+    ):
+        batch = next_batch
+        try:
+            for _ in range(depth):
+                page = await fetch_page(batch)
+                self.pages += 1
+                batch = page_next_batch(page)
+                if batch is None:
+                    break
+        except Exception as e:
+            logger.error(f"Failed to prefetch Matrix search pages: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": len(self.active),
+            "max_active": self.max_active,
+            "depth": self.depth,
+            "started": self.started,
+            "skipped": self.skipped,
+            "pages": self.pages,
+        }
+
+    async def close(self):
+        """Cancel the prefetches still running"""
+        for task in list(self.active.values()):
+            task.cancel()
+        self.active.clear()
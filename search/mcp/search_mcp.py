@@ -1,17 +1,15 @@
 from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any, Optional, AsyncGenerator
 import logging
 import asyncio
-import json
 import uuid
-import httpx
 from datetime import datetime
 import os
-import yaml
 
 # Import FastMCP
-from fastmcp import FastMCP
+from fastmcp import FastMCP, Context
 
 # Import registry models and functions
 from AutonomousSphere.registry.models.search import SearchQuery
@@ -19,6 +17,12 @@ from AutonomousSphere.registry.models.search import SearchQuery
 # Import search models
 from AutonomousSphere.search.models import SearchResult, MCPServiceRegistration, MCPEvent
 
+# Shared configuration, loaded once and hot-reloadable
+from AutonomousSphere.config import get_config
+
+# Shared connection pool for HTTP calls
+from AutonomousSphere.search.http_client import http_client
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -32,15 +36,9 @@ mcp = FastMCP(
     "MCP server for unified search across agents and Matrix"
 )
 
-# Load configuration
-def get_config():
-    config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "config.yaml")
-    with open(config_path, "r") as f:
-        return yaml.safe_load(f)
-
 # MCP search tool
 @mcp.tool()
-async def search(query: str, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+async def search(query: str, filters: Optional[Dict[str, Any]] = None, ctx: Optional[Context] = None) -> Dict[str, Any]:
     """
     Search across agents and Matrix rooms/messages
     
@@ -50,18 +48,31 @@ async def search(query: str, filters: Optional[Dict[str, Any]] = None) -> Dict[s
     
     Returns:
         Search results
+    
+    Each source that answers is reported as progress, naming the source,
+    and its results are sent ahead of the complete response as an info
+    log message (`extra` holds the source and its results).
     """
     try:
         # Create SearchQuery object
         search_query = SearchQuery(query=query, filters=filters or {})
         
-        # Import the unified_search function here to avoid circular imports
-        from AutonomousSphere.search.search import unified_search
+        # Import the unified search here to avoid circular imports
+        from AutonomousSphere.search.search import run_unified_search, unified_search_sources
         
-        # Call the unified search function
-        results = await unified_search(search_query)
+        # The tool has no Matrix access token, so only the sources searched without one answer
+        total = len(unified_search_sources(None))
+        received = 0
+        async def progress(frame: Dict[str, Any]):
+            nonlocal received
+            received += 1
+            source = frame["type"]
+            partial = frame["agents"] if source == "agents" else frame["messages"] + frame["rooms"]
+            await ctx.report_progress(received, total, f"{source}: {len(partial)} results")
+            await ctx.info(f"{source} results", extra={"source": source, "results": jsonable_encoder(partial)})
         
-        return results.dict()
+        results = await run_unified_search(search_query, None, progress=progress if ctx is not None else None)
+        return results.model_dump()
     except Exception as e:
         logger.error(f"MCP search error: {str(e)}")
         return SearchResult(
@@ -80,7 +91,7 @@ async def search(query: str, filters: Optional[Dict[str, Any]] = None) -> Dict[s
                 "source": "mcp",
                 "error": str(e)
             }
-        ).dict()
+        ).model_dump()
 
 # SSE endpoint for MCP events
 @router.get("/sse")
@@ -95,7 +106,7 @@ async def mcp_sse(request: Request):
                 event="connected",
                 data={"message": "Connected to MCP SSE stream"}
             )
-            yield f"data: {json.dumps(connected_event.dict())}\n\n"
+            yield f"data: {connected_event.model_dump_json()}\n\n"
             
             # Create a queue for events
             queue = asyncio.Queue()
@@ -122,7 +133,7 @@ async def mcp_sse(request: Request):
                     data={"count": count}
                 )
                 
-                yield f"data: {json.dumps(heartbeat_event.dict())}\n\n"
+                yield f"data: {heartbeat_event.model_dump_json()}\n\n"
                 
                 await asyncio.sleep(10)
                 
@@ -134,7 +145,7 @@ async def mcp_sse(request: Request):
                 event="error",
                 data={"error": str(e)}
             )
-            yield f"data: {json.dumps(error_event.dict())}\n\n"
+            yield f"data: {error_event.model_dump_json()}\n\n"
     
     return StreamingResponse(
         event_generator(),
@@ -149,9 +160,6 @@ async def mcp_sse(request: Request):
 # Function to register the MCP service with the registry
 async def register_mcp_service():
     """Register the MCP search service with the registry"""
-    # Import here to avoid circular imports
-    import httpx
-    
     # Get configuration
     config = get_config()
     
@@ -170,16 +178,15 @@ async def register_mcp_service():
     
     # Register with the registry
     try:
-        async with httpx.AsyncClient() as client:
-            registry_url = f"http://{host}:{port}/registry/agents"
-            response = await client.post(registry_url, json=service_data.dict())
-            
-            if response.status_code == 201:
-                logger.info(f"MCP search service registered successfully: {service_data.id}")
-                return True
-            else:
-                logger.error(f"Failed to register MCP search service: {response.status_code} - {response.text}")
-                return False
+        registry_url = f"http://{host}:{port}/registry/agents"
+        response = await http_client.get().post(registry_url, json=service_data.model_dump())
+        
+        if response.status_code == 201:
+            logger.info(f"MCP search service registered successfully: {service_data.id}")
+            return True
+        else:
+            logger.error(f"Failed to register MCP search service: {response.status_code} - {response.text}")
+            return False
     except Exception as e:
         logger.error(f"Error registering MCP search service: {str(e)}")
         return False
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import uuid
@@ -19,23 +19,22 @@ class MCPServiceRegistration(BaseModel):
         "mcp_capabilities": ["search"]
     }
     
-    class Config:
-        schema_extra = {
-            "example": {
-                "id": "search-mcp-a1b2c3d4",
-                "name": "AutonomousSphere Search MCP",
-                "description": "MCP server for unified search across agents and Matrix",
-                "protocol": "MCP",
-                "endpoint_url": "ws://localhost:8000/search/mcp",
-                "tools": ["search"],
-                "skills": ["search", "matrix_search", "agent_search"],
-                "public": True,
-                "custom_metadata": {
-                    "mcp_capabilities": ["search"],
-                    "mcp_server_url": "ws://localhost:8000/search/mcp"
-                }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "id": "search-mcp-a1b2c3d4",
+            "name": "AutonomousSphere Search MCP",
+            "description": "MCP server for unified search across agents and Matrix",
+            "protocol": "MCP",
+            "endpoint_url": "ws://localhost:8000/search/mcp",
+            "tools": ["search"],
+            "skills": ["search", "matrix_search", "agent_search"],
+            "public": True,
+            "custom_metadata": {
+                "mcp_capabilities": ["search"],
+                "mcp_server_url": "ws://localhost:8000/search/mcp"
             }
         }
+    })
 
 class MCPEvent(BaseModel):
     """
@@ -45,14 +44,13 @@ class MCPEvent(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.now)
     data: Optional[Dict[str, Any]] = None
     
-    class Config:
-        schema_extra = {
-            "example": {
-                "event": "search_completed",
-                "timestamp": "2023-07-01T12:34:56.789Z",
-                "data": {
-                    "query": "example query",
-                    "results_count": 10
-                }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "event": "search_completed",
+            "timestamp": "2023-07-01T12:34:56.789Z",
+            "data": {
+                "query": "example query",
+                "results_count": 10
             }
-        }
\ No newline at end of file
+        }
+    })
\ No newline at end of file
@@ -46,6 +46,9 @@ class SearchMetadata(BaseModel):
     total_results: int = 0
     search_time_ms: int = 0
     source: str = "api"
+    timed_out_sources: List[str] = Field(default=[], description="Sources left out of the results for missing their deadline")
+    source_times_ms: Dict[str, int] = Field(default={}, description="Time each source took to answer or time out")
+    fusion: Optional[str] = Field(None, description="Method the sources were merged with into results.fused, if any")
     timestamp: datetime = Field(default_factory=datetime.now)
 
 class SearchResult(BaseModel):
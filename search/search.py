@@ -1,21 +1,45 @@
-from fastapi import APIRouter, HTTPException, Body, Depends, Header
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Body, Depends, Header, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from collections import OrderedDict
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Optional, Tuple
 import logging
-import httpx
-import yaml
-import os
 import time
 import json
 import asyncio
 
 # Import the SearchQuery model from registry models
-from AutonomousSphere.registry.models.search import SearchQuery
+from AutonomousSphere.registry.models.search import SearchEngine, SearchQuery
+
+# Tokenizer of the registry's keyword engines
+from AutonomousSphere.registry.index import tokenize
 
 # Import search models
 from .models import MatrixSearchRequest, SearchResult
 
+# Shared configuration, loaded once and hot-reloadable
+from AutonomousSphere.config import AppConfig, config_store, get_config
+
+# Shared connection pool for homeserver calls
+from .http_client import http_client
+
+# Cache of Matrix search responses
+from .matrix_cache import MatrixSearchCache, matrix_search_key
+
+# Pipelined and background fetching of Matrix search pages
+from .matrix_pager import PagePrefetcher, prefetch_pages
+
+# Local full-text index of Matrix messages, fed by the appservice
+from AutonomousSphere.appservice.message_index import MessageIndex
+
+# Merging of the sources into one ranked list
+from .fusion import FusionMethod, fuse, source_rankings
+
+# Coalescing of concurrent identical searches
+from .singleflight import SingleFlight, request_key
+
 # Import registry functions for agent search
-from AutonomousSphere.registry.registry import search_agents
+from AutonomousSphere.registry.registry import search_agents, validate_search_query
 
 # Import MCP search module
 from .mcp import router as mcp_router, mount_mcp_server
@@ -27,19 +51,102 @@ logger = logging.getLogger(__name__)
 # Initialize router
 router = APIRouter()
 
-# Load configuration
-def get_config():
-    config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config.yaml")
-    with open(config_path, "r") as f:
-        return yaml.safe_load(f)
+# Matrix search responses by user, query and page; sized from config.yaml
+matrix_cache = MatrixSearchCache()
+
+# In-flight homeserver searches and unified searches, shared by identical concurrent requests
+matrix_flights = SingleFlight()
+search_flights = SingleFlight()
+
+# Background fetches of the pages following a served one, into matrix_cache
+matrix_prefetcher = PagePrefetcher()
+
+# Opened at startup when search.message_index is enabled in config.yaml
+message_index = MessageIndex()
+
+# Matrix user IDs by hashed access token, resolved once for searches of the message index
+MAX_MATRIX_USER_IDS = 1000
+matrix_user_ids: "OrderedDict[str, str]" = OrderedDict()
+
+# Messages per page of a Matrix search when no limit is given
+MATRIX_PAGE_SIZE = 20
 
 # Function to perform Matrix search
-async def search_matrix(query: str, access_token: str, config: Dict[str, Any], next_batch: Optional[str] = None):
+async def search_matrix(
+    query: str,
+    access_token: str,
+    config: Dict[str, Any],
+    next_batch: Optional[str] = None,
+    limit: Optional[int] = None
+):
     """
-    Perform a search on the Matrix homeserver
+    Perform a search on the Matrix homeserver.
+    
+    Responses are cached per user, query and page; a recently expired one
+    is returned at once while a fresh one is fetched in the background.
+    Concurrent cache misses for the same key share one request.
+    
+    When the local message index is enabled it is searched instead, and
+    the homeserver is only asked who the access token belongs to.
+    
+    Pages hold up to `limit` messages, MATRIX_PAGE_SIZE by default.
     """
     homeserver_url = config["homeserver"]["address"]
-    
+    limit = limit or MATRIX_PAGE_SIZE
+    if message_index.is_open:
+        return await _search_message_index(query, access_token, homeserver_url, next_batch, limit)
+    key = matrix_search_key(homeserver_url, access_token, query, next_batch, limit)
+    return await matrix_cache.get_or_fetch(
+        key,
+        lambda: matrix_flights.do(key, lambda: _fetch_matrix_search(query, access_token, homeserver_url, next_batch, limit))
+    )
+
+async def _search_message_index(
+    query: str,
+    access_token: str,
+    homeserver_url: str,
+    next_batch: Optional[str] = None,
+    limit: int = MATRIX_PAGE_SIZE
+):
+    """Search the local message index within the rooms the token's user has joined"""
+    user_id = await _matrix_user_id(access_token, homeserver_url)
+    if user_id is None:
+        return {"error": "Could not resolve the Matrix user of the access token"}
+    return await message_index.search(query, user_id, next_batch, limit)
+
+async def _matrix_user_id(access_token: str, homeserver_url: str) -> Optional[str]:
+    """User ID of an access token from the homeserver's whoami, cached; None when it is rejected"""
+    key = request_key(homeserver_url, access_token)
+    user_id = matrix_user_ids.get(key)
+    if user_id is not None:
+        matrix_user_ids.move_to_end(key)
+        return user_id
+    try:
+        response = await http_client.get().get(
+            f"{homeserver_url}/_matrix/client/v3/account/whoami",
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+    except Exception as e:
+        logger.error(f"Matrix whoami request error: {str(e)}")
+        return None
+    if response.status_code != 200:
+        logger.error(f"Matrix whoami error: {response.status_code} - {response.text}")
+        return None
+    user_id = response.json().get("user_id")
+    if user_id:
+        matrix_user_ids[key] = user_id
+        while len(matrix_user_ids) > MAX_MATRIX_USER_IDS:
+            matrix_user_ids.popitem(last=False)
+    return user_id
+
+async def _fetch_matrix_search(
+    query: str,
+    access_token: str,
+    homeserver_url: str,
+    next_batch: Optional[str] = None,
+    limit: int = MATRIX_PAGE_SIZE
+):
+    """Send a search request to the homeserver; failures are returned as a dict with an error"""
     # Construct search request
     search_request = MatrixSearchRequest(
         search_categories={
@@ -48,7 +155,7 @@ async def search_matrix(query: str, access_token: str, config: Dict[str, Any], n
                 "order_by": "rank",
                 "keys": ["content.body", "content.name", "content.topic"],
                 "filter": {
-                    "limit": 20
+                    "limit": limit
                 }
             }
         }
@@ -59,35 +166,251 @@ async def search_matrix(query: str, access_token: str, config: Dict[str, Any], n
     if next_batch:
         params["next_batch"] = next_batch
     
-    # Make request to Matrix API
-    async with httpx.AsyncClient() as client:
-        try:
-            url = f"{homeserver_url}/_matrix/client/v3/search"
-            headers = {"Authorization": f"Bearer {access_token}"}
+    # Make request to Matrix API over the pooled client, reusing open connections
+    client = http_client.get()
+    try:
+        url = f"{homeserver_url}/_matrix/client/v3/search"
+        headers = {"Authorization": f"Bearer {access_token}"}
+        
+        logger.info(f"Searching Matrix at {url}")
+        response = await client.post(
+            url, 
+            json=search_request.model_dump(), 
+            headers=headers,
+            params=params
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            logger.error(f"Matrix search error: {response.status_code} - {response.text}")
+            return {
+                "error": f"Matrix search failed with status {response.status_code}",
+                "details": response.text
+            }
+    except Exception as e:
+        logger.error(f"Matrix search request error: {str(e)}")
+        return {"error": f"Matrix search request failed: {str(e)}"}
+
+async def iter_matrix_search(
+    query: str,
+    access_token: str,
+    config: Dict[str, Any],
+    next_batch: Optional[str] = None,
+    depth: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Iterate over the pages of a Matrix search, from `next_batch` on.
+    
+    The next page is fetched while the current one is being consumed, up to
+    `depth` pages ahead (search.matrix_prefetch.depth in config.yaml by
+    default). Iteration stops after the last page or a failed request,
+    whose error response is the last page yielded.
+    """
+    if depth is None:
+        depth = matrix_prefetcher.depth
+    pages = prefetch_pages(lambda batch: search_matrix(query, access_token, config, batch), next_batch, depth)
+    try:
+        async for page in pages:
+            yield page
+    finally:
+        await pages.aclose()
+
+def _prefetch_matrix_pages(
+    query: str,
+    access_token: str,
+    config: Dict[str, Any],
+    next_batch: str,
+    limit: Optional[int] = None
+):
+    """
+    Fetch the pages following a served one into the Matrix search cache,
+    so the client's request for them with `next_batch` is answered at once
+    """
+    # Pages of the local message index are cheap to fetch on demand
+    if matrix_cache.ttl <= 0 or message_index.is_open:
+        return
+    key = matrix_search_key(config["homeserver"]["address"], access_token, query, next_batch, limit)
+    matrix_prefetcher.schedule(key, lambda batch: search_matrix(query, access_token, config, batch, limit), next_batch)
+
+async def _timed_source(source: str, awaitable, timeout: float) -> Tuple[str, Any, bool, int]:
+    """Await one source of a unified search; returns (source, result, timed out, elapsed ms)"""
+    started = time.time()
+    try:
+        result, timed_out = await asyncio.wait_for(awaitable, timeout), False
+    except asyncio.TimeoutError:
+        logger.warning(f"Unified search source {source} timed out after {timeout}s")
+        result, timed_out = None, True
+    return source, result, timed_out, int((time.time() - started) * 1000)
+
+def _bearer_token(authorization: Optional[str]) -> Optional[str]:
+    """Access token of an Authorization header; Matrix is only searched with one"""
+    if authorization and authorization.startswith("Bearer "):
+        return authorization.split(" ")[1]
+    return None
+
+def _matrix_frame(matrix_results: Dict[str, Any]) -> Dict[str, Any]:
+    """Messages, rooms and the pagination token of a Matrix search response"""
+    frame = {"type": "matrix", "messages": [], "rooms": []}
+    if "error" in matrix_results:
+        frame["error"] = matrix_results["error"]
+    if "search_categories" not in matrix_results:
+        return frame
+    room_events = matrix_results["search_categories"].get("room_events", {})
+    
+    # Extract messages
+    if "results" in room_events:
+        for result in room_events["results"]:
+            # Add to messages list
+            frame["messages"].append({
+                "event_id": result["result"]["event_id"],
+                "room_id": result["result"]["room_id"],
+                "sender": result["result"]["sender"],
+                "content": result["result"]["content"],
+                "origin_server_ts": result["result"]["origin_server_ts"],
+                "rank": result.get("rank", 0)
+            })
+    
+    # Extract room information from state if available
+    if "state" in room_events:
+        for room_id, state_events in room_events["state"].items():
+            room_info = {
+                "room_id": room_id,
+                "name": None,
+                "topic": None,
+                "members_count": 0
+            }
             
-            logger.info(f"Searching Matrix at {url}")
-            response = await client.post(
-                url, 
-                json=search_request.dict(), 
-                headers=headers,
-                params=params
-            )
+            # Extract room name and topic from state events
+            for event in state_events:
+                if event["type"] == "m.room.name":
+                    room_info["name"] = event["content"].get("name")
+                elif event["type"] == "m.room.topic":
+                    room_info["topic"] = event["content"].get("topic")
             
-            if response.status_code == 200:
-                return response.json()
+            frame["rooms"].append(room_info)
+    
+    # Add pagination token if available
+    next_batch = room_events.get("next_batch")
+    if next_batch:
+        frame["next_batch"] = next_batch
+    return frame
+
+def unified_search_sources(access_token: Optional[str]) -> List[str]:
+    """Sources a unified search asks; Matrix is only searched with the user's access token"""
+    return ["matrix", "agents"] if access_token else ["agents"]
+
+async def stream_unified_search(
+    search_query: SearchQuery,
+    access_token: Optional[str],
+    next_batch: Optional[str] = None,
+    matrix_limit: Optional[int] = None,
+    rank_agents: bool = False
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Search the agent registry and Matrix concurrently, yielding each
+    source's results as a frame as soon as it completes:
+    
+    - {"type": "agents", "agents": [...]}
+    - {"type": "matrix", "messages": [...], "rooms": [...], "next_batch": ...}
+    - {"type": "metadata", "metadata": {...}} once every source is done or
+      timed out, with the total, the timed out sources and per-source times
+    
+    Sources missing their deadline from config.yaml yield no frame.
+    Matrix results start at the `next_batch` page of an earlier search, and
+    the pages following them are prefetched in the background. Matrix
+    pages hold up to `matrix_limit` messages. With `rank_agents`, the
+    agents matched by the index engine are ranked by BM25 (see search_agents).
+    Closing the iterator early cancels the sources still running.
+    """
+    start_time = time.time()
+    logger.info(f"Processing unified search query: {search_query.query}")
+    
+    # Get configuration
+    config = get_config()
+    # Seconds each source may take before it is left out of the response
+    timeouts = config.settings.search.timeouts.model_dump()
+    
+    # The Matrix request goes first so it is in flight while the in-process agent search runs
+    sources = {}
+    if "matrix" in unified_search_sources(access_token):
+        sources["matrix"] = search_matrix(search_query.query, access_token, config, next_batch, matrix_limit)
+    sources["agents"] = search_agents(search_query, ranked=rank_agents)
+    tasks = [
+        asyncio.ensure_future(_timed_source(source, awaitable, timeouts[source]))
+        for source, awaitable in sources.items()
+    ]
+    
+    total_results = 0
+    timed_out = []
+    source_times = {}
+    try:
+        for completed in asyncio.as_completed(tasks):
+            source, result, missed_deadline, elapsed_ms = await completed
+            source_times[source] = elapsed_ms
+            if missed_deadline:
+                timed_out.append(source)
+            elif source == "agents":
+                total_results += len(result)
+                yield {"type": "agents", "agents": result}
             else:
-                logger.error(f"Matrix search error: {response.status_code} - {response.text}")
-                return {
-                    "error": f"Matrix search failed with status {response.status_code}",
-                    "details": response.text
-                }
-        except Exception as e:
-            logger.error(f"Matrix search request error: {str(e)}")
-            return {"error": f"Matrix search request failed: {str(e)}"}
+                frame = _matrix_frame(result)
+                if frame.get("next_batch"):
+                    _prefetch_matrix_pages(search_query.query, access_token, config, frame["next_batch"], matrix_limit)
+                total_results += len(frame["messages"]) + len(frame["rooms"])
+                yield frame
+    finally:
+        for task in tasks:
+            task.cancel()
+    
+    search_time_ms = int((time.time() - start_time) * 1000)
+    logger.info(f"Search completed with {total_results} results in {search_time_ms}ms")
+    yield {
+        "type": "metadata",
+        "metadata": {
+            "total_results": total_results,
+            "search_time_ms": search_time_ms,
+            "timed_out_sources": timed_out,
+            "source_times_ms": source_times
+        }
+    }
+
+async def collect_unified_search(frames: AsyncIterator[Dict[str, Any]], search_query: SearchQuery, source: str = "api") -> SearchResult:
+    """Assemble the frames of stream_unified_search into a SearchResult"""
+    results = SearchResult(
+        query=search_query.query,
+        filters=search_query.filters,
+        results={
+            "agents": [],
+            "matrix": {
+                "rooms": [],
+                "messages": []
+            }
+        },
+        metadata={
+            "total_results": 0,
+            "search_time_ms": 0,
+            "source": source
+        }
+    )
+    async for frame in frames:
+        if frame["type"] == "agents":
+            results.results["agents"] = frame["agents"]
+        elif frame["type"] == "matrix":
+            results.results["matrix"]["messages"].extend(frame["messages"])
+            results.results["matrix"]["rooms"].extend(frame["rooms"])
+            if frame.get("next_batch"):
+                results.results["matrix"]["next_batch"] = frame["next_batch"]
+        elif frame["type"] == "metadata":
+            for field, value in frame["metadata"].items():
+                setattr(results.metadata, field, value)
+    return results
 
 @router.post("/", response_model=SearchResult)
 async def unified_search(
     search_query: SearchQuery,
+    next_batch: Optional[str] = Query(None, description="results.matrix.next_batch of the previous page"),
+    fusion: Optional[FusionMethod] = Query(None, description="Also merge the sources into one ranked results.fused list"),
     authorization: Optional[str] = Header(None)
 ):
     """
@@ -98,111 +421,179 @@ async def unified_search(
     1. Agent registry - searching for agents matching the query
     2. Matrix API - searching for messages and rooms matching the query
     
+    The sources are searched concurrently, each with its own deadline from
+    config.yaml. A source missing its deadline is left out of the results
+    and listed in metadata.timed_out_sources. Identical searches by the
+    same user arriving while one is running share its result.
+    
+    Further Matrix results are requested with the next_batch of the
+    previous response; the pages following each response are prefetched,
+    so they are usually served without waiting on the homeserver.
+    
+    With `fusion`, results.fused also holds the best `limit` agents,
+    messages and rooms (search.fusion.top_k by default) in one list ranked
+    by reciprocal rank fusion (rrf) or normalized score blending (blend),
+    weighted per source from config.yaml. Each source is then only asked
+    for that many candidates, and Matrix is skipped when both of its
+    weights are 0. The agents matched by the default index engine are
+    ranked with BM25, since the index engine returns them unranked.
+    
     The search can be filtered using the filters parameter.
     """
+    return await run_unified_search(search_query, _bearer_token(authorization), next_batch, fusion)
+
+async def run_unified_search(
+    search_query: SearchQuery,
+    access_token: Optional[str],
+    next_batch: Optional[str] = None,
+    fusion: Optional[FusionMethod] = None,
+    progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+) -> SearchResult:
+    """
+    The unified search behind the endpoint, for callers within the service
+    such as the MCP search tool. Identical concurrent searches share one
+    run; `progress` is awaited with the frame of each source as it answers
+    (see stream_unified_search), only for a run this call started.
+    """
+    key = request_key(search_query.model_dump(), access_token, next_batch, fusion)
+    return await search_flights.do(key, lambda: _unified_search(search_query, access_token, next_batch, fusion, progress))
+
+async def _reported(frames: AsyncIterator[Dict[str, Any]], progress: Callable[[Dict[str, Any]], Awaitable[None]]) -> AsyncIterator[Dict[str, Any]]:
+    """Pass the frames through, reporting each source's frame to `progress`"""
+    async for frame in frames:
+        if frame["type"] != "metadata":
+            try:
+                await progress(frame)
+            except Exception as e:
+                # Other callers may share the search, so progress errors must not fail it
+                logger.error(f"Failed to report search progress: {str(e)}")
+        yield frame
+
+async def _unified_search(
+    search_query: SearchQuery,
+    access_token: Optional[str],
+    next_batch: Optional[str] = None,
+    fusion: Optional[FusionMethod] = None,
+    progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+) -> SearchResult:
     try:
-        start_time = time.time()
-        logger.info(f"Processing unified search query: {search_query.query}")
-        
-        # Get configuration
-        config = get_config()
+        if fusion is None:
+            frames = stream_unified_search(search_query, access_token, next_batch)
+            if progress is not None:
+                frames = _reported(frames, progress)
+            return await collect_unified_search(frames, search_query)
         
-        # Initialize results structure
-        results = SearchResult(
-            query=search_query.query,
-            filters=search_query.filters,
-            results={
-                "agents": [],
-                "matrix": {
-                    "rooms": [],
-                    "messages": []
-                }
-            },
-            metadata={
-                "total_results": 0,
-                "search_time_ms": 0,
-                "source": "api"
-            }
-        )
-        
-        # 1. Search agents in registry
-        agent_results = await search_agents(search_query)
-        results.results["agents"] = agent_results
-        
-        # 2. Search Matrix if authorization token is provided
-        matrix_results = None
-        if authorization:
-            # Extract token from Authorization header
+        settings = get_config().settings.search.fusion
+        weights = settings.weights.model_dump()
+        top_k = search_query.limit or settings.top_k
+        # Candidates a source ranks below its own top_k cannot make it into the fused top_k
+        if weights["messages"] <= 0 and weights["rooms"] <= 0:
             access_token = None
-            if authorization.startswith("Bearer "):
-                access_token = authorization.split(" ")[1]
-            
-            if access_token:
-                matrix_results = await search_matrix(
-                    search_query.query, 
-                    access_token, 
-                    config
-                )
-                
-                # Process Matrix results if successful
-                if matrix_results and "search_categories" in matrix_results:
-                    room_events = matrix_results["search_categories"].get("room_events", {})
-                    
-                    # Extract messages
-                    if "results" in room_events:
-                        for result in room_events["results"]:
-                            # Add to messages list
-                            results.results["matrix"]["messages"].append({
-                                "event_id": result["result"]["event_id"],
-                                "room_id": result["result"]["room_id"],
-                                "sender": result["result"]["sender"],
-                                "content": result["result"]["content"],
-                                "origin_server_ts": result["result"]["origin_server_ts"],
-                                "rank": result.get("rank", 0)
-                            })
-                    
-                    # Extract room information from state if available
-                    if "state" in room_events:
-                        for room_id, state_events in room_events["state"].items():
-                            room_info = {
-                                "room_id": room_id,
-                                "name": None,
-                                "topic": None,
-                                "members_count": 0
-                            }
-                            
-                            # Extract room name and topic from state events
-                            for event in state_events:
-                                if event["type"] == "m.room.name":
-                                    room_info["name"] = event["content"].get("name")
-                                elif event["type"] == "m.room.topic":
-                                    room_info["topic"] = event["content"].get("topic")
-                            
-                            results.results["matrix"]["rooms"].append(room_info)
-                
-                # Add pagination token if available
-                if matrix_results and "search_categories" in matrix_results and "room_events" in matrix_results["search_categories"]:
-                    next_batch = matrix_results["search_categories"]["room_events"].get("next_batch")
-                    if next_batch:
-                        results.results["matrix"]["next_batch"] = next_batch
-        
-        # Calculate total results
-        total_agents = len(results.results["agents"])
-        total_matrix_messages = len(results.results["matrix"]["messages"])
-        total_matrix_rooms = len(results.results["matrix"]["rooms"])
-        total_results = total_agents + total_matrix_messages + total_matrix_rooms
-        
-        # Update metadata
-        results.metadata.total_results = total_results
-        results.metadata.search_time_ms = int((time.time() - start_time) * 1000)
-        
-        logger.info(f"Search completed with {total_results} results in {results.metadata.search_time_ms}ms")
+        rank_agents = search_query.engine == SearchEngine.INDEX and bool(tokenize(search_query.query))
+        if rank_agents:
+            # The index engine would cut its matches at top_k in registration order, so BM25 ranks them
+            agent_query = search_query.model_copy(update={"limit": top_k})
+        elif search_query.engine in (SearchEngine.INDEX, SearchEngine.SUBSTRING):
+            # Unranked matches are kept whole, so the cut is left to fusion
+            agent_query = search_query
+        else:
+            agent_query = search_query.model_copy(update={"limit": top_k})
+        frames = stream_unified_search(agent_query, access_token, next_batch, top_k, rank_agents)
+        if progress is not None:
+            frames = _reported(frames, progress)
+        results = await collect_unified_search(frames, search_query)
+        results.results["fused"] = fuse(source_rankings(results.results), fusion, weights, top_k, settings.rrf_k)
+        results.metadata.fusion = fusion.value
         return results
-        
+    except HTTPException:
+        # Client errors of the registry search (e.g. bad filters) keep their status
+        raise
     except Exception as e:
         logger.error(f"Unified search error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
 
+@router.post("/stream")
+async def stream_search(
+    search_query: SearchQuery,
+    next_batch: Optional[str] = Query(None, description="results.matrix.next_batch of the previous page"),
+    authorization: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None)
+):
+    """
+    Streaming variant of the unified search.
+    
+    Agent results are sent as soon as the registry answers, Matrix messages
+    and rooms once the homeserver does, and the metadata with per-source
+    timings last. Frames are newline-delimited JSON, or Server-Sent Events
+    named after the frame type when the client accepts text/event-stream.
+    Invalid queries (e.g. unsupported filter values) are rejected with a
+    4xx status before the stream starts.
+    """
+    validate_search_query(search_query)
+    sse = bool(accept) and "text/event-stream" in accept
+    
+    async def frame_generator():
+        frames = stream_unified_search(search_query, _bearer_token(authorization), next_batch)
+        try:
+            async for frame in frames:
+                data = json.dumps(jsonable_encoder(frame))
+                yield f"event: {frame['type']}\ndata: {data}\n\n" if sse else f"{data}\n"
+        except Exception as e:
+            logger.error(f"Unified search stream error: {str(e)}")
+            data = json.dumps({"type": "error", "detail": f"Search error: {str(e)}"})
+            yield f"event: error\ndata: {data}\n\n" if sse else f"{data}\n"
+        finally:
+            # Cancels the sources still running when the client disconnects
+            await frames.aclose()
+    
+    return StreamingResponse(
+        frame_generator(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable buffering in Nginx
+        }
+    )
+
+def _apply_config(config: AppConfig):
+    """Apply the settings that can change without a restart, at startup and on every config reload"""
+    matrix_cache.configure(config.settings.search.matrix_cache)
+    matrix_prefetcher.configure(config.settings.search.matrix_prefetch)
+
+config_store.on_reload(_apply_config)
+
+@router.on_event("startup")
+async def search_startup():
+    """Open the pooled HTTP client and, when enabled, the message index configured in config.yaml"""
+    config = get_config()
+    _apply_config(config)
+    await http_client.start(config.settings.http_client)
+    settings = config.settings.search.message_index
+    if settings.enabled:
+        message_index.path = settings.path
+        await message_index.open()
+
+@router.on_event("shutdown")
+async def search_shutdown():
+    await matrix_prefetcher.close()
+    await matrix_cache.close()
+    await message_index.close()
+    await http_client.close()
+
+# Health check for search
+@router.get("/health")
+async def search_health():
+    """Check the health of the search service"""
+    return {
+        "status": "healthy",
+        "http_client": http_client.stats(),
+        "matrix_cache": matrix_cache.stats(),
+        "matrix_prefetch": matrix_prefetcher.stats(),
+        "message_index": await message_index.stats(),
+        "matrix_requests": matrix_flights.stats(),
+        "unified_searches": search_flights.stats()
+    }
+
 # Include MCP router
 router.include_router(mcp_router, prefix="/mcp", tags=["mcp"])
 
@@ -0,0 +1,55 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+import asyncio
+import hashlib
+import json
+
+T = TypeVar("T")
+
+def request_key(*parts: Any) -> str:
+    """Hash of JSON-serializable request parts, so access tokens among them are not kept in memory"""
+    encoded = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one.
+
+    The first caller for a key starts the call as a task; callers arriving
+    while it runs await the same task instead of starting their own. Each
+    caller awaits it through `asyncio.shield`, so a caller that is cancelled
+    (e.g. its client disconnected) stops waiting without cancelling the
+    call for the others. The key is released once the call completes, so
+    later callers start a new one.
+    """
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self.calls)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        # Mark the error as retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        task = self.calls.get(key)
+        if task is None:
+            self.started += 1
+            task = asyncio.ensure_future(call())
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self._done(key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self.calls),
+            "started": self.started,
+            "shared": self.shared,
+        }
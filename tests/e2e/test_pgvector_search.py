@@ -0,0 +1,93 @@
+import pytest
+from AutonomousSphere.registry.models import Agent, Protocol
+from AutonomousSphere.registry.pgvector_store import PgVectorIndex
+
+async def connect_test_index(test_config, index_type="hnsw"):
+    """Connect a pgvector index on a scratch table, skipping when Postgres is unavailable"""
+    db_config = test_config["database"]
+    dsn = (
+        f"postgresql://{db_config['user']}:{db_config['password']}"
+        f"@{db_config['host']}:{db_config['port']}/{db_config['database']}"
+    )
+    index = PgVectorIndex(dsn, table=f"test_agent_embeddings_{index_type}", index_type=index_type)
+    try:
+        await index.connect()
+    except Exception as e:
+        pytest.skip(f"Could not connect to database: {str(e)}")
+    return index
+
+TEST_AGENTS = [
+    Agent(
+        id="pgvector-weather",
+        display_name="Weather Agent",
+        description="Forecasts the weather for any city",
+        protocol=Protocol.MCP,
+        languages=["en"],
+        tools=["forecast"]
+    ),
+    Agent(
+        id="pgvector-translator",
+        display_name="Translator",
+        description="Translates documents between languages",
+        protocol=Protocol.A2A,
+        languages=["en", "fr"],
+        tools=["translate"]
+    ),
+    Agent(
+        id="pgvector-weather-fr",
+        display_name="Agent Météo",
+        description="Weather forecasts in French",
+        protocol=Protocol.A2A,
+        languages=["fr"],
+        tools=["forecast"]
+    )
+]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("index_type", ["hnsw", "ivfflat"])
+async def test_pgvector_nearest_neighbours(test_config, index_type):
+    index = await connect_test_index(test_config, index_type)
+    try:
+        await index.reconcile(TEST_AGENTS)
+        
+        hits = await index.search("weather forecast", limit=2)
+        assert len(hits) == 2
+        assert {agent_id for agent_id, _ in hits} == {"pgvector-weather", "pgvector-weather-fr"}
+        assert hits[0][1] >= hits[1][1]
+        
+        # Limits beyond the largest candidate list pgvector accepts are still served
+        hits = await index.search("weather forecast", limit=5000)
+        assert len(hits) == len(TEST_AGENTS)
+        
+        # Filters are applied in SQL
+        hits = await index.search("weather forecast", {"languages": ["fr"], "protocol": ["A2A"]}, limit=5)
+        assert hits[0][0] == "pgvector-weather-fr"
+        assert "pgvector-weather" not in [agent_id for agent_id, _ in hits]
+        
+        await index.delete("pgvector-weather-fr")
+        hits = await index.search("weather forecast", {"tools": ["forecast"]}, limit=5)
+        assert [agent_id for agent_id, _ in hits] == ["pgvector-weather"]
+    finally:
+        async with index.pool.acquire() as conn:
+            await conn.execute(f"DROP TABLE IF EXISTS {index.table}")
+        await index.close()
+
+@pytest.mark.asyncio
+async def test_pgvector_reconcile(test_config):
+    index = await connect_test_index(test_config)
+    try:
+        await index.reconcile(TEST_AGENTS[:2])
+        
+        # Unknown agents are deleted, missing and changed ones upserted
+        changed = TEST_AGENTS[0].model_copy(update={"tools": ["alerts"]})
+        await index.reconcile([changed, TEST_AGENTS[2]])
+        async with index.pool.acquire() as conn:
+            rows = await conn.fetch(f"SELECT agent_id, tools FROM {index.table} ORDER BY agent_id")
+        assert [(row["agent_id"], row["tools"]) for row in rows] == [
+            ("pgvector-weather", ["alerts"]),
+            ("pgvector-weather-fr", ["forecast"])
+        ]
+    finally:
+        async with index.pool.acquire() as conn:
+            await conn.execute(f"DROP TABLE IF EXISTS {index.table}")
+        await index.close()
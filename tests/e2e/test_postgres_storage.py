@@ -0,0 +1,157 @@
+import pytest
+import asyncio
+from datetime import datetime
+from AutonomousSphere.registry.models import Agent, Protocol, ChangeType
+from AutonomousSphere.registry.storage import PostgresAgentStorage
+
+async def connect_test_storage(test_config):
+    """Connect agent storage on a scratch table, skipping when Postgres is unavailable"""
+    db_config = test_config["database"]
+    dsn = (
+        f"postgresql://{db_config['user']}:{db_config['password']}"
+        f"@{db_config['host']}:{db_config['port']}/{db_config['database']}"
+    )
+    storage = PostgresAgentStorage(dsn, table="test_agents", max_pool_size=2)
+    try:
+        await storage.connect()
+    except Exception as e:
+        pytest.skip(f"Could not connect to database: {str(e)}")
+    return storage
+
+@pytest.mark.asyncio
+async def test_postgres_storage_round_trip(test_config):
+    storage = await connect_test_storage(test_config)
+    try:
+        agent = Agent(
+            id="storage-test-agent",
+            display_name="Storage Test Agent",
+            protocol=Protocol.MCP,
+            endpoint_url="https://example.com/agent",
+            tools=["search"],
+            languages=["en"],
+            registered_at=datetime(2024, 1, 1, 12, 0),
+            last_seen=datetime(2024, 1, 2, 12, 0),
+            custom_metadata={"mcp_capabilities": ["search"], "nested": {"depth": 2}}
+        )
+        
+        assert await storage.insert(agent) is True
+        assert await storage.insert(agent) is False
+        
+        loaded = await storage.get(agent.id)
+        assert loaded == agent
+        assert [a.id for a in await storage.load_all()] == [agent.id]
+        
+        updated = agent.model_copy(update={"description": "Updated", "custom_metadata": {}})
+        assert await storage.update(updated) == 2
+        assert (await storage.get(agent.id)).description == "Updated"
+        
+        # Conditional updates only apply to the expected versions
+        assert await storage.update(updated, [1]) is None
+        assert await storage.update(updated, [1, 2]) == 3
+        assert (await storage.get(agent.id)).version == 3
+        
+        assert await storage.delete(agent.id) is True
+        assert await storage.delete(agent.id) is False
+        assert await storage.update(updated) is None
+        assert await storage.get(agent.id) is None
+    finally:
+        async with storage.pool.acquire() as conn:
+            await conn.execute(f"DROP TABLE IF EXISTS {storage.table}")
+            await conn.execute(f"DROP TABLE IF EXISTS {storage.change_table}")
+        await storage.close()
+
+@pytest.mark.asyncio
+async def test_postgres_storage_bulk_insert(test_config):
+    storage = await connect_test_storage(test_config)
+    try:
+        agents = [
+            Agent(id=f"bulk-{i}", display_name=f"Bulk {i}", protocol=Protocol.A2A, custom_metadata={"i": i})
+            for i in range(100)
+        ]
+        await storage.insert(agents[0])
+        
+        # Atomic inserts roll back on any conflict
+        inserted, conflicts = await storage.insert_many(agents, atomic=True)
+        assert inserted == []
+        assert conflicts == ["bulk-0"]
+        assert len(await storage.load_all()) == 1
+        
+        inserted, conflicts = await storage.insert_many(agents, atomic=False)
+        assert inserted == [agent.id for agent in agents[1:]]
+        assert conflicts == ["bulk-0"]
+        
+        loaded = await storage.get_many(["bulk-5", "bulk-99", "missing"])
+        assert sorted(agent.id for agent in loaded) == ["bulk-5", "bulk-99"]
+        assert {agent.custom_metadata["i"] for agent in loaded} == {5, 99}
+    finally:
+        async with storage.pool.acquire() as conn:
+            await conn.execute(f"DROP TABLE IF EXISTS {storage.table}")
+            await conn.execute(f"DROP TABLE IF EXISTS {storage.change_table}")
+        await storage.close()
+
+@pytest.mark.asyncio
+async def test_postgres_storage_heartbeats(test_config):
+    storage = await connect_test_storage(test_config)
+    try:
+        agents = [Agent(id=f"beat-{i}", display_name=f"Beat {i}", protocol=Protocol.MCP) for i in range(3)]
+        await storage.insert_many(agents, atomic=True)
+        
+        assert sorted(await storage.mark_stale(["beat-0", "beat-1"])) == ["beat-0", "beat-1"]
+        assert {agent.id for agent in await storage.load_all() if agent.stale} == {"beat-0", "beat-1"}
+        # Agents flagged already (e.g. by another worker) are not reported again
+        assert await storage.mark_stale(["beat-0", "beat-2"]) == ["beat-2"]
+        
+        # Flushed heartbeats refresh last_seen and clear the stale flag in one statement
+        seen_at = datetime(2030, 1, 1, 12, 0)
+        await storage.touch_many({"beat-0": seen_at, "missing": seen_at})
+        refreshed = await storage.get("beat-0")
+        assert refreshed.last_seen == seen_at
+        assert not refreshed.stale
+        assert (await storage.get("beat-1")).stale
+        assert (await storage.get("beat-0")).version == 1
+    finally:
+        async with storage.pool.acquire() as conn:
+            await conn.execute(f"DROP TABLE IF EXISTS {storage.table}")
+            await conn.execute(f"DROP TABLE IF EXISTS {storage.change_table}")
+        await storage.close()
+
+@pytest.mark.asyncio
+async def test_postgres_storage_change_notifications(test_config):
+    publisher = await connect_test_storage(test_config)
+    subscriber = await connect_test_storage(test_config)
+    try:
+        received = asyncio.Queue()
+        await subscriber.subscribe(
+            lambda change_type, agent_ids, version: received.put_nowait((change_type, agent_ids, version))
+        )
+        await publisher.subscribe(lambda change_type, agent_ids, version: pytest.fail("received its own notification"))
+        
+        updated = [(f"notify-{i}", Agent(id=f"notify-{i}", display_name="Notify", protocol=Protocol.MCP)) for i in range(2)]
+        assert await publisher.publish(ChangeType.UPDATED, updated) == 2
+        assert await asyncio.wait_for(received.get(), 5) == (ChangeType.UPDATED, ["notify-0", "notify-1"], 2)
+        
+        # Large batches are split to fit the NOTIFY payload limit
+        agent_ids = [f"notify-agent-{i:05d}" for i in range(2000)]
+        version = await publisher.publish(ChangeType.DELETED, [(agent_id, None) for agent_id in agent_ids])
+        assert version == 2002
+        delivered = []
+        while len(delivered) < len(agent_ids):
+            change_type, chunk, chunk_version = await asyncio.wait_for(received.get(), 5)
+            assert (change_type, chunk_version) == (ChangeType.DELETED, version)
+            delivered.extend(chunk)
+        assert delivered == agent_ids
+        
+        # Every worker reads the same numbered log
+        assert await subscriber.change_version() == version
+        events = await subscriber.changes_since(0, 3)
+        assert [(event.version, event.agent_id) for event in events] == [(1, "notify-0"), (2, "notify-1"), (3, "notify-agent-00000")]
+        assert events[0].agent.display_name == "Notify"
+        assert events[2].agent is None
+        assert await subscriber.changes_since(version + 1, 10) is None
+        await asyncio.sleep(0.1)
+    finally:
+        async with publisher.pool.acquire() as conn:
+            await conn.execute(f"DROP TABLE IF EXISTS {publisher.table}")
+            await conn.execute(f"DROP TABLE IF EXISTS {publisher.change_table}")
+        await subscriber.close()
+        await publisher.close()
@@ -0,0 +1,40 @@
+from AutonomousSphere.registry.bm25 import BM25Index
+
+BOOSTS = {"name": 3.0, "description": 1.0}
+
+def build_index():
+    index = BM25Index(BOOSTS)
+    index.add("weather", {"name": "Weather Agent", "description": "Forecasts for any city"})
+    index.add("news", {"name": "News Agent", "description": "Headlines and weather alerts"})
+    index.add("translator", {"name": "Translator", "description": "Translates documents"})
+    return index
+
+def test_bm25_ranks_boosted_fields_first():
+    index = build_index()
+    hits = index.search("weather", k=10)
+    
+    # A match in the boosted name field outranks one in the description
+    assert [agent_id for agent_id, _ in hits] == ["weather", "news"]
+    assert hits[0][1] > hits[1][1] > 0
+    
+    # Matching more terms scores higher
+    hits = index.search("weather alerts", k=10)
+    assert hits[0][0] == "news"
+
+def test_bm25_top_k_and_candidates():
+    index = build_index()
+    
+    assert len(index.search("agent", k=1)) == 1
+    assert [agent_id for agent_id, _ in index.search("agent", k=5, candidates={"news"})] == ["news"]
+    assert index.search("unknown", k=5) == []
+    assert index.search("", k=5) == []
+
+def test_bm25_remove_and_reindex():
+    index = build_index()
+    index.remove("weather")
+    assert [agent_id for agent_id, _ in index.search("weather", k=5)] == ["news"]
+    
+    index.add("news", {"name": "News Agent", "description": "Headlines"})
+    assert index.search("weather", k=5) == []
+    assert "weather" not in index.postings
+    assert len(index) == 2
@@ -0,0 +1,51 @@
+import pytest
+import asyncio
+from AutonomousSphere.registry.changes import ChangeFeed
+from AutonomousSphere.registry.models import ChangeType
+
+def test_change_feed_returns_events_after_version():
+    feed = ChangeFeed()
+    for i in range(5):
+        feed.append(ChangeType.REGISTERED, f"agent-{i}")
+    
+    assert [event.version for event in feed.since(2, limit=10)] == [3, 4, 5]
+    assert [event.version for event in feed.since(0, limit=2)] == [1, 2]
+    assert feed.since(5, limit=10) == []
+    
+    # Versions that were never issued (e.g. from before a restart) are rejected
+    assert feed.since(6, limit=10) is None
+
+def test_change_feed_reports_truncated_history():
+    feed = ChangeFeed(max_events=3)
+    for i in range(6):
+        feed.append(ChangeType.UPDATED, "agent")
+    
+    assert len(feed) == 3
+    assert feed.oldest_version == 4
+    assert feed.since(2, limit=10) is None
+    assert [event.version for event in feed.since(3, limit=10)] == [4, 5, 6]
+
+@pytest.mark.asyncio
+async def test_change_feed_wakes_waiters():
+    feed = ChangeFeed()
+    assert await feed.wait(0, timeout=0.01) is False
+    
+    waiter = asyncio.create_task(feed.wait(0, timeout=5))
+    await asyncio.sleep(0)
+    feed.append(ChangeType.DELETED, "agent")
+    assert await waiter is True
+    assert await feed.wait(0, timeout=0) is True
+
+@pytest.mark.asyncio
+async def test_change_feed_advances_to_shared_versions():
+    feed = ChangeFeed()
+    waiter = asyncio.create_task(feed.wait(0, timeout=5))
+    await asyncio.sleep(0)
+    feed.advance(7)
+    assert await waiter is True
+    assert feed.version == 7
+    
+    # Notifications arriving out of order never move it back
+    feed.advance(5)
+    assert feed.version == 7
+    assert len(feed) == 0
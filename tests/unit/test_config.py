@@ -0,0 +1,71 @@
+import asyncio
+import os
+import pytest
+from pydantic import ValidationError
+from AutonomousSphere.config import AppConfig, ConfigStore
+
+def write_config(path, text, mtime):
+    path.write_text(text)
+    os.utime(path, (mtime, mtime))
+
+@pytest.mark.asyncio
+async def test_config_is_loaded_once_and_reloaded(tmp_path):
+    path = tmp_path / "config.yaml"
+    write_config(path, "homeserver:\n  address: http://old\n", 1000)
+    store = ConfigStore(str(path))
+    
+    config = store.get()
+    assert config["homeserver"]["address"] == "http://old"
+    assert config.settings.registry.storage.backend == "memory"
+    # Cached: edits are not seen until a reload
+    write_config(path, "homeserver:\n  address: http://new\n", 2000)
+    assert store.get() is config
+    
+    reloaded = []
+    store.on_reload(reloaded.append)
+    assert await store.reload()
+    assert store.get()["homeserver"]["address"] == "http://new"
+    assert reloaded == [store.get()]
+    # Holders of the previous config keep a consistent view
+    assert config["homeserver"]["address"] == "http://old"
+
+@pytest.mark.asyncio
+async def test_invalid_config_keeps_current(tmp_path):
+    path = tmp_path / "config.yaml"
+    write_config(path, "search:\n  timeouts:\n    matrix: 3\n", 1000)
+    store = ConfigStore(str(path))
+    config = store.get()
+    
+    write_config(path, "search: [unclosed\n", 2000)
+    assert not await store.reload()
+    assert store.get() is config
+
+@pytest.mark.asyncio
+async def test_watch_reloads_changed_file(tmp_path):
+    path = tmp_path / "config.yaml"
+    write_config(path, "config_reload:\n  watch_interval: 0.01\nsearch: {}\n", 1000)
+    store = ConfigStore(str(path))
+    await store.start()
+    try:
+        write_config(path, "config_reload:\n  watch_interval: 0.01\nsearch:\n  timeouts:\n    agents: 1\n", 2000)
+        for _ in range(100):
+            if store.get().settings.search.timeouts.agents == 1:
+                break
+            await asyncio.sleep(0.01)
+        assert store.get()["search"]["timeouts"]["agents"] == 1
+    finally:
+        await store.stop()
+
+def test_settings_fill_in_defaults():
+    config = AppConfig.from_data({"search": {"fusion": {"top_k": 5, "weights": {"rooms": 0}}, "timeouts": None}})
+    fusion = config.settings.search.fusion
+    assert fusion.top_k == 5
+    assert fusion.rrf_k == 60
+    assert fusion.weights.model_dump() == {"agents": 1.0, "messages": 1.0, "rooms": 0}
+    assert config.settings.search.timeouts.matrix == 5.0
+    # Sections left empty in the YAML keep their defaults
+    assert AppConfig.from_data({"registry": {"heartbeat": None}}).settings.registry.heartbeat.flush_interval == 5.0
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValidationError):
+        AppConfig.from_data({"search": {"fusion": {"top_k": "many"}}})
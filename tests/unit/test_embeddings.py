@@ -0,0 +1,39 @@
+import numpy as np
+from AutonomousSphere.registry.embeddings import HashingEmbedder, agent_document
+from AutonomousSphere.registry.models import Agent, Protocol
+
+def test_embedding_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(dimensions=128)
+    first = embedder.embed("Weather forecast agent")
+    second = HashingEmbedder(dimensions=128).embed("Weather forecast agent")
+    
+    assert first.dtype == np.float32
+    assert first.shape == (128,)
+    assert np.array_equal(first, second)
+    assert abs(float(np.linalg.norm(first)) - 1.0) < 1e-5
+    
+    # Text without tokens embeds to the zero vector
+    assert not np.any(embedder.embed("!!!"))
+
+def test_embedding_similarity_tracks_shared_vocabulary():
+    embedder = HashingEmbedder()
+    query = embedder.embed("weather forecasts")
+    related = embedder.embed("Agent that forecasts the weather")
+    unrelated = embedder.embed("Translate legal contracts")
+    
+    assert float(query @ related) > float(query @ unrelated)
+
+def test_agent_document_includes_skills_and_tools():
+    agent = Agent(
+        id="doc-agent",
+        display_name="Doc Agent",
+        description="Summarises documents",
+        protocol=Protocol.MCP,
+        skills=["summarization"],
+        tools=["pdf_reader"]
+    )
+    document = agent_document(agent)
+    
+    assert "Doc Agent" in document
+    assert "summarization" in document
+    assert "pdf_reader" in document
@@ -0,0 +1,38 @@
+import pytest
+from AutonomousSphere.search.fusion import FusionMethod, fuse, source_rankings
+
+RESULTS = {
+    "agents": [{"id": "agent-1", "score": 8.0}, {"id": "agent-2", "score": 4.0}, {"id": "agent-3", "score": 0.0}],
+    "matrix": {
+        "messages": [{"event_id": "$1", "rank": 0.5}, {"event_id": "$2", "rank": 0.1}],
+        "rooms": [{"room_id": "!room:hs"}],
+    },
+}
+
+def ids(fused):
+    return [entry["item"].get("id") or entry["item"].get("event_id") or entry["item"]["room_id"] for entry in fused]
+
+def test_reciprocal_rank_fusion_interleaves_sources():
+    weights = {"agents": 1.0, "messages": 1.0, "rooms": 1.0}
+    fused = fuse(source_rankings(RESULTS), FusionMethod.RRF, weights, top_k=4)
+    # Equal ranks tie and keep the sources' order
+    assert ids(fused) == ["agent-1", "$1", "!room:hs", "agent-2"]
+    assert fused[0]["score"] == pytest.approx(1 / 61)
+    assert fused[0]["source"] == "agents"
+
+def test_weights_reorder_and_exclude_sources():
+    weights = {"agents": 1.0, "messages": 3.0, "rooms": 0}
+    fused = fuse(source_rankings(RESULTS), FusionMethod.RRF, weights, top_k=10)
+    assert ids(fused) == ["$1", "$2", "agent-1", "agent-2", "agent-3"]
+
+def test_score_blending_normalizes_each_source():
+    weights = {"agents": 1.0, "messages": 0.8, "rooms": 0.5}
+    fused = fuse(source_rankings(RESULTS), FusionMethod.BLEND, weights, top_k=10)
+    scores = {entry_id: entry["score"] for entry_id, entry in zip(ids(fused), fused)}
+    assert scores["agent-1"] == pytest.approx(1.0)
+    assert scores["agent-2"] == pytest.approx(0.5)
+    assert scores["$1"] == pytest.approx(0.8)
+    assert scores["$2"] == pytest.approx(0.0)
+    # Unscored rooms are normalized by rank
+    assert scores["!room:hs"] == pytest.approx(0.5)
+    assert ids(fused)[:2] == ["agent-1", "$1"]
@@ -0,0 +1,48 @@
+from datetime import datetime
+from AutonomousSphere.registry.heartbeat import HeartbeatTracker
+
+def test_heartbeats_are_coalesced_until_flushed():
+    tracker = HeartbeatTracker(stale_after=10)
+    first, second = datetime(2024, 1, 1, 12, 0, 0), datetime(2024, 1, 1, 12, 0, 5)
+    tracker.beat("agent", first)
+    tracker.beat("agent", second)
+    
+    assert tracker.flush() == {"agent": second}
+    assert tracker.flush() == {}
+
+def test_sweep_marks_stale_then_expires():
+    tracker = HeartbeatTracker(stale_after=10, expire_after=30)
+    tracker.track("quiet", beat=0.0)
+    tracker.track("chatty", beat=0.0)
+    
+    assert tracker.sweep(now=5.0) == ([], [])
+    
+    # A heartbeat received since the deadline was scheduled pushes it back
+    tracker.track("chatty", beat=8.0)
+    assert tracker.sweep(now=10.0) == (["quiet"], [])
+    assert tracker.sweep(now=18.0) == (["chatty"], [])
+    
+    assert tracker.sweep(now=30.0) == ([], ["quiet"])
+    assert "quiet" not in tracker.last_beat
+    
+    # One heap entry per agent, however many heartbeats it sent
+    for beat in range(20, 30):
+        tracker.track("chatty", beat=float(beat))
+    assert len(tracker.deadlines) == 1
+
+def test_stale_agent_recovers_on_heartbeat():
+    tracker = HeartbeatTracker(stale_after=10)
+    tracker.track("agent", beat=0.0)
+    assert tracker.sweep(now=10.0) == (["agent"], [])
+    
+    assert tracker.beat("agent", datetime.now()) is True
+    assert tracker.beat("agent", datetime.now()) is False
+    assert "agent" not in tracker.stale
+
+def test_forgotten_agents_are_skipped():
+    tracker = HeartbeatTracker(stale_after=10, expire_after=20)
+    tracker.track("agent", beat=0.0)
+    tracker.forget("agent")
+    
+    assert tracker.sweep(now=100.0) == ([], [])
+    assert len(tracker) == 0
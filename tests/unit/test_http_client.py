@@ -0,0 +1,61 @@
+import asyncio
+import httpx
+import pytest
+from AutonomousSphere.config import HTTPClientSettings
+from AutonomousSphere.search.http_client import PooledHTTPClient
+
+async def keepalive_server(reader, writer):
+    # Answer every request on the connection until the client closes it
+    while True:
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            break
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+        await writer.drain()
+    writer.close()
+
+@pytest.mark.asyncio
+async def test_requests_reuse_pooled_connection():
+    server = await asyncio.start_server(keepalive_server, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    client = PooledHTTPClient()
+    await client.start(HTTPClientSettings(max_keepalive_connections=5))
+    try:
+        for _ in range(3):
+            response = await client.get().get(f"http://127.0.0.1:{port}/")
+            assert response.text == "ok"
+        
+        stats = client.stats()
+        assert stats["requests"] == 3
+        assert stats["responses"] == 3
+        assert stats["connections_opened"] == 1
+        assert stats["connections_reused"] == 2
+    finally:
+        await client.close()
+        server.close()
+        await server.wait_closed()
+    assert client.client is None
+
+@pytest.mark.asyncio
+async def test_failed_requests_do_not_count_as_reuse():
+    # A port nothing listens on
+    server = await asyncio.start_server(keepalive_server, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    server.close()
+    await server.wait_closed()
+    
+    client = PooledHTTPClient()
+    await client.start()
+    try:
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                await client.get().get(f"http://127.0.0.1:{port}/")
+        
+        stats = client.stats()
+        assert stats["requests"] == 2
+        assert stats["responses"] == 0
+        assert stats["connections_reused"] == 0
+        assert stats["reuse_ratio"] == 0.0
+    finally:
+        await client.close()
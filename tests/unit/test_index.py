@@ -0,0 +1,55 @@
+import pytest
+from AutonomousSphere.registry.index import InvertedIndex, tokenize
+
+def test_tokenize():
+    assert tokenize("Agent_Search: Summarise PDFs!") == ["agent", "search", "summarise", "pdfs"]
+    assert tokenize(None) == []
+    assert tokenize("") == []
+
+def test_inverted_index_intersects_postings():
+    index = InvertedIndex()
+    index.add("a1", "Weather forecast agent")
+    index.add("a2", "News agent")
+    index.add("a3", "Weather news")
+    
+    assert index.search("agent") == {"a1", "a2"}
+    assert index.search("weather news") == {"a3"}
+    assert index.search("Weather AGENT") == {"a1"}
+    assert index.search("unknown") == set()
+    assert index.search("") == {"a1", "a2", "a3"}
+
+def test_inverted_index_reindex_and_remove():
+    index = InvertedIndex()
+    index.add("a1", "Weather agent")
+    index.add("a1", "News agent")
+    
+    assert index.search("weather") == set()
+    assert index.search("news") == {"a1"}
+    
+    index.remove("a1")
+    assert index.search("agent") == set()
+    assert index.postings == {}
+    assert len(index) == 0
+    
+    # Removing an unknown agent is a no-op
+    index.remove("missing")
+
+def test_field_index_any_of():
+    from AutonomousSphere.registry.index import FieldIndex, intersect
+    
+    index = FieldIndex()
+    index.add("a1", ["en", "es"])
+    index.add("a2", ["en"])
+    index.add("a3", ["fr"])
+    
+    assert index.any_of(["en"]) == {"a1", "a2"}
+    assert index.any_of(["es", "fr"]) == {"a1", "a3"}
+    assert index.any_of(["de"]) == set()
+    
+    index.add("a1", ["fr"])
+    assert index.any_of(["es"]) == set()
+    index.remove("a3")
+    assert index.any_of(["fr"]) == {"a1"}
+    
+    assert intersect([{"a1", "a2"}, {"a2", "a3"}]) == {"a2"}
+    assert intersect([]) == set()
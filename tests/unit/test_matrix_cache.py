@@ -0,0 +1,58 @@
+import asyncio
+import time
+import pytest
+from AutonomousSphere.search.matrix_cache import MatrixSearchCache, matrix_search_key
+
+def counting_fetch(responses):
+    calls = []
+    async def fetch():
+        calls.append(len(calls))
+        return responses[min(len(calls) - 1, len(responses) - 1)]
+    return fetch, calls
+
+def test_key_separates_users_and_pages():
+    key = matrix_search_key("https://hs", "token-a", "weather")
+    assert key == matrix_search_key("https://hs", "token-a", "weather", None)
+    assert key != matrix_search_key("https://hs", "token-b", "weather")
+    assert key != matrix_search_key("https://hs", "token-a", "weather", "batch-2")
+    assert "token-a" not in key
+
+@pytest.mark.asyncio
+async def test_fresh_responses_are_served_from_cache():
+    cache = MatrixSearchCache(ttl=30, stale_ttl=300)
+    fetch, calls = counting_fetch([{"search_categories": {}}])
+    
+    first = await cache.get_or_fetch("key", fetch)
+    assert await cache.get_or_fetch("key", fetch) is first
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_stale_response_is_served_while_refreshing():
+    cache = MatrixSearchCache(ttl=30, stale_ttl=300)
+    fetch, calls = counting_fetch([{"page": "old"}, {"page": "new"}])
+    await cache.get_or_fetch("key", fetch)
+    later = time.monotonic() + 60
+    
+    # Expired but within stale_ttl: the old response comes back at once, one refresh runs
+    assert await cache.get_or_fetch("key", fetch, now=later) == {"page": "old"}
+    assert await cache.get_or_fetch("key", fetch, now=later) == {"page": "old"}
+    await asyncio.gather(*cache.refreshing.values())
+    assert len(calls) == 2
+    assert await cache.get_or_fetch("key", fetch) == {"page": "new"}
+    
+    # Too old to serve: callers wait for a new response
+    assert await cache.get_or_fetch("key", fetch, now=time.monotonic() + 600) == {"page": "new"}
+    assert len(calls) == 3
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached_and_size_is_bounded():
+    cache = MatrixSearchCache(ttl=30, stale_ttl=300, max_entries=2)
+    fetch, calls = counting_fetch([{"error": "Matrix search failed with status 502"}])
+    await cache.get_or_fetch("failing", fetch)
+    await cache.get_or_fetch("failing", fetch)
+    assert len(calls) == 2
+    
+    for key in ("a", "b", "c"):
+        await cache.get_or_fetch(key, counting_fetch([{"key": key}])[0])
+    assert list(cache.entries) == ["b", "c"]
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from AutonomousSphere.config import MatrixPrefetchSettings
+from AutonomousSphere.search.matrix_pager import PagePrefetcher, page_next_batch, prefetch_pages
+
+def paged_fetch(pages, log):
+    """Fetch of a search with `pages` pages, named by their next_batch"""
+    async def fetch(next_batch):
+        log.append(("fetch", next_batch))
+        await asyncio.sleep(0.01)
+        index = 0 if next_batch is None else int(next_batch)
+        following = str(index + 1) if index + 1 < pages else None
+        return {"page": index, "search_categories": {"room_events": {"next_batch": following}}}
+    return fetch
+
+def test_page_next_batch():
+    assert page_next_batch({"search_categories": {"room_events": {"next_batch": "2"}}}) == "2"
+    assert page_next_batch({"search_categories": {"room_events": {}}}) is None
+    assert page_next_batch({"error": "Matrix search failed with status 500"}) is None
+
+@pytest.mark.asyncio
+async def test_pages_are_fetched_while_consumed():
+    log = []
+    pages = []
+    async for page in prefetch_pages(paged_fetch(4, log), depth=1):
+        log.append(("consumed", page["page"]))
+        pages.append(page["page"])
+        await asyncio.sleep(0.02)
+    
+    assert pages == [0, 1, 2, 3]
+    # Page 1 was requested before page 0 was done being consumed
+    assert log.index(("fetch", "1")) < log.index(("consumed", 0))
+
+@pytest.mark.asyncio
+async def test_prefetch_depth_bounds_pages_held():
+    log = []
+    pages = prefetch_pages(paged_fetch(100, log), depth=2)
+    assert (await pages.__anext__())["page"] == 0
+    await asyncio.sleep(0.2)
+    
+    # Two pages queued ahead of the consumer and one fetch waiting to queue its page
+    assert [entry for entry in log if entry[0] == "fetch"] == [("fetch", None), ("fetch", "1"), ("fetch", "2"), ("fetch", "3")]
+    await pages.aclose()
+
+@pytest.mark.asyncio
+async def test_fetch_errors_reach_the_consumer():
+    async def failing_fetch(next_batch):
+        if next_batch:
+            raise RuntimeError("connection reset")
+        return {"search_categories": {"room_events": {"next_batch": "1"}}}
+    
+    pages = prefetch_pages(failing_fetch)
+    await pages.__anext__()
+    with pytest.raises(RuntimeError):
+        await pages.__anext__()
+
+@pytest.mark.asyncio
+async def test_prefetcher_fetches_following_pages_once():
+    log = []
+    prefetcher = PagePrefetcher(depth=2, max_active=1)
+    fetch = paged_fetch(10, log)
+    
+    assert prefetcher.schedule("cursor-1", fetch, "1")
+    assert not prefetcher.schedule("cursor-1", fetch, "1")
+    # At most max_active cursors are prefetched at once
+    assert not prefetcher.schedule("cursor-2", fetch, "5")
+    await asyncio.gather(*prefetcher.active.values())
+    
+    assert log == [("fetch", "1"), ("fetch", "2")]
+    assert prefetcher.stats()["pages"] == 2
+    assert prefetcher.stats()["skipped"] == 1
+    assert len(prefetcher) == 0
+
+@pytest.mark.asyncio
+async def test_zero_depth_disables_prefetch():
+    prefetcher = PagePrefetcher()
+    prefetcher.configure(MatrixPrefetchSettings(depth=0))
+    assert not prefetcher.schedule("cursor-1", paged_fetch(10, []), "1")
@@ -1,64 +1,68 @@
 import pytest
 import asyncio
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 @pytest.mark.asyncio
 async def test_mcp_search_tool():
     from AutonomousSphere.search.mcp.search_mcp import search
+    from AutonomousSphere.search.search import unified_search
+    from AutonomousSphere.registry.models.search import SearchQuery
     
-    # Mock the unified_search function
-    with patch('AutonomousSphere.search.search.unified_search') as mock_unified_search:
-        # Set up the mock to return a test result
-        mock_result = MagicMock()
-        mock_result.dict.return_value = {
-            "query": "test query",
-            "filters": {},
-            "results": {
-                "agents": [{"id": "test-agent"}],
-                "matrix": {
-                    "rooms": [],
-                    "messages": []
-                }
-            },
-            "metadata": {
-                "total_results": 1,
-                "search_time_ms": 100,
-                "source": "mcp"
-            }
-        }
-        mock_unified_search.return_value = mock_result
+    searched = []
+    async def fake_stream(search_query, access_token, next_batch=None):
+        searched.append(search_query)
+        await asyncio.sleep(0.01)
+        yield {"type": "agents", "agents": [{"id": "test-agent"}]}
+        yield {"type": "metadata", "metadata": {"total_results": 1, "search_time_ms": 100}}
+    
+    # Mock the streaming unified search
+    with patch('AutonomousSphere.search.search.stream_unified_search', fake_stream):
+        ctx = MagicMock()
+        ctx.report_progress = AsyncMock()
+        ctx.info = AsyncMock()
         
         # Call the MCP search tool
-        result = await search("test query", {"filter_key": "filter_value"})
+        result = await search("test query", {"filter_key": "filter_value"}, ctx=ctx)
         
         # Verify the result
         assert result["query"] == "test query"
         assert result["results"]["agents"] == [{"id": "test-agent"}]
         assert result["metadata"]["total_results"] == 1
         
-        # Verify that unified_search was called with the correct parameters
-        mock_unified_search.assert_called_once()
-        call_args = mock_unified_search.call_args[0][0]
-        assert call_args.query == "test query"
-        assert call_args.filters == {"filter_key": "filter_value"}
+        # The agents were reported as progress, and sent ahead of the response
+        ctx.report_progress.assert_awaited_once_with(1, 1, "agents: 1 results")
+        ctx.info.assert_awaited_once_with("agents results", extra={"source": "agents", "results": [{"id": "test-agent"}]})
+        
+        # Verify that the search was called with the correct parameters
+        assert len(searched) == 1
+        assert searched[0].query == "test query"
+        assert searched[0].filters == {"filter_key": "filter_value"}
+        
+        # The tool shares the run of an identical API search and returns the same result
+        searched.clear()
+        api_result, tool_result = await asyncio.gather(
+            unified_search(SearchQuery(query="shared", filters={}), next_batch=None, fusion=None, authorization=None),
+            search("shared", None, ctx=None)
+        )
+        assert len(searched) == 1
+        assert tool_result == api_result.model_dump()
 
 @pytest.mark.asyncio
 async def test_register_mcp_service():
     from AutonomousSphere.search.mcp.search_mcp import register_mcp_service
     
-    # Mock httpx.AsyncClient
-    with patch('httpx.AsyncClient') as mock_client_class:
+    # Mock the pooled HTTP client
+    with patch('AutonomousSphere.search.mcp.search_mcp.http_client') as mock_http_client:
         # Set up the mock client
         mock_client = MagicMock()
-        mock_client.__aenter__.return_value = mock_client
-        mock_client_class.return_value = mock_client
+        mock_http_client.get.return_value = mock_client
         
         # Set up the mock response
         mock_response = MagicMock()
         mock_response.status_code = 201
-        mock_client.post.return_value = mock_response
+        mock_client.post = AsyncMock(return_value=mock_response)
         
         # Mock get_config
         with patch('AutonomousSphere.search.mcp.search_mcp.get_config') as mock_get_config:
@@ -0,0 +1,89 @@
+import pytest
+import pytest_asyncio
+from AutonomousSphere.appservice.message_index import MessageIndex, fts_query
+
+def message(event_id, room_id, sender, body, ts=1609459200000, **content):
+    return {
+        "type": "m.room.message",
+        "event_id": event_id,
+        "room_id": room_id,
+        "sender": sender,
+        "origin_server_ts": ts,
+        "content": {"msgtype": "m.text", "body": body, **content},
+    }
+
+def member(room_id, user_id, membership="join"):
+    return {"type": "m.room.member", "room_id": room_id, "state_key": user_id, "content": {"membership": membership}}
+
+@pytest_asyncio.fixture
+async def index(tmp_path):
+    index = MessageIndex(str(tmp_path / "messages.db"))
+    await index.open()
+    await index.ingest(member("!weather:hs", "@alice:hs"))
+    await index.ingest(member("!private:hs", "@bob:hs"))
+    await index.ingest({"type": "m.room.name", "room_id": "!weather:hs", "content": {"name": "Weather"}})
+    await index.ingest(message("$1", "!weather:hs", "@alice:hs", "Rain expected tomorrow"))
+    await index.ingest(message("$2", "!private:hs", "@bob:hs", "Rain plans are secret"))
+    yield index
+    await index.close()
+
+def event_ids(response):
+    return [result["result"]["event_id"] for result in response["search_categories"]["room_events"]["results"]]
+
+def test_fts_query_escapes_syntax():
+    assert fts_query('rain OR "snow') == '"rain" "OR" """snow"'
+    assert fts_query("   ") == ""
+
+@pytest.mark.asyncio
+async def test_search_is_limited_to_joined_rooms(index):
+    response = await index.search("rain", "@alice:hs")
+    assert event_ids(response) == ["$1"]
+    assert response["search_categories"]["room_events"]["state"]["!weather:hs"] == [
+        {"type": "m.room.name", "content": {"name": "Weather"}}
+    ]
+    assert event_ids(await index.search("rain", "@bob:hs")) == ["$2"]
+    
+    # Leaving a room hides its messages
+    await index.ingest(member("!private:hs", "@bob:hs", "leave"))
+    assert event_ids(await index.search("rain", "@bob:hs")) == []
+
+@pytest.mark.asyncio
+async def test_edits_and_redactions(index):
+    edit = message("$3", "!weather:hs", "@alice:hs", "* Sunshine expected tomorrow", **{
+        "m.new_content": {"msgtype": "m.text", "body": "Sunshine expected tomorrow"},
+        "m.relates_to": {"rel_type": "m.replace", "event_id": "$1"},
+    })
+    assert await index.ingest(edit)
+    assert event_ids(await index.search("rain", "@alice:hs")) == []
+    response = await index.search("sunshine", "@alice:hs")
+    assert event_ids(response) == ["$1"]
+    assert response["search_categories"]["room_events"]["results"][0]["result"]["content"]["body"] == "Sunshine expected tomorrow"
+    
+    # Someone else cannot edit the message
+    forged = dict(edit, event_id="$4", sender="@mallory:hs")
+    forged["content"] = dict(edit["content"], **{"m.new_content": {"body": "Forged"}})
+    assert not await index.ingest(forged)
+    
+    # Edits without new content keep the message
+    empty = dict(edit, event_id="$5")
+    empty["content"] = {"body": "* ", "m.relates_to": {"rel_type": "m.replace", "event_id": "$1"}}
+    assert not await index.ingest(empty)
+    assert event_ids(await index.search("sunshine", "@alice:hs")) == ["$1"]
+    
+    assert await index.ingest({"type": "m.room.redaction", "room_id": "!weather:hs", "redacts": "$1", "content": {}})
+    assert event_ids(await index.search("sunshine", "@alice:hs")) == []
+    assert (await index.stats())["messages"] == 1
+
+@pytest.mark.asyncio
+async def test_search_pages(index):
+    for i in range(5):
+        await index.ingest(message(f"$page{i}", "!weather:hs", "@alice:hs", f"forecast number {i}"))
+    
+    first = await index.search("forecast", "@alice:hs", limit=3)
+    assert len(event_ids(first)) == 3
+    next_batch = first["search_categories"]["room_events"]["next_batch"]
+    second = await index.search("forecast", "@alice:hs", next_batch=next_batch, limit=3)
+    assert len(event_ids(second)) == 2
+    assert "next_batch" not in second["search_categories"]["room_events"]
+    assert set(event_ids(first)) | set(event_ids(second)) == {f"$page{i}" for i in range(5)}
+    assert "error" in await index.search("forecast", "@alice:hs", next_batch="not-a-number")
@@ -0,0 +1,35 @@
+from AutonomousSphere.registry.query_cache import QueryCache
+
+def test_entries_expire_with_their_generation():
+    cache = QueryCache(max_entries=10)
+    cache.put("weather", 1, ["forecaster"])
+    
+    assert cache.get("weather", 1) == ["forecaster"]
+    assert cache.get("weather", 2) is None
+    # The outdated entry is dropped on the miss
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryCache(max_entries=2)
+    cache.put("a", 1, [])
+    cache.put("b", 1, [])
+    cache.get("a", 1)
+    cache.put("c", 1, [])
+    
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) == []
+    assert cache.get("c", 1) == []
+
+def test_disabled_cache_stores_nothing():
+    cache = QueryCache(max_entries=0)
+    cache.put("a", 1, [])
+    assert cache.get("a", 1) is None
+
+def test_resize_evicts_least_recently_used():
+    cache = QueryCache(max_entries=3)
+    for key in ("a", "b", "c"):
+        cache.put(key, 1, [])
+    cache.resize(1)
+    assert list(cache.entries) == ["c"]
@@ -0,0 +1,81 @@
+import json
+import warnings
+from datetime import datetime
+from AutonomousSphere.registry.models import Agent, Protocol
+from AutonomousSphere.registry.records import AgentRecord
+
+def make_agent(agent_id, **fields):
+    return Agent(id=agent_id, display_name=agent_id.title(), protocol=Protocol.MCP, **fields)
+
+def test_agent_record_round_trip():
+    agent = make_agent(
+        "alpha",
+        description="Round trip",
+        tools=["search", "calculator"],
+        languages=["en"],
+        endpoint_url="https://example.com/alpha",
+        room_ids=["!room:example.com"],
+        owner="@owner:example.com",
+        registered_at=datetime(2024, 1, 1, 12, 0),
+        last_seen=datetime(2024, 1, 2, 12, 0),
+        custom_metadata={"nested": {"depth": 2}}
+    )
+    record = AgentRecord(agent)
+
+    assert record.tools == ("search", "calculator")
+    assert record.custom_metadata == {"nested": {"depth": 2}}
+    assert AgentRecord.of(record) is record
+
+    rebuilt = record.to_agent()
+    assert isinstance(rebuilt, Agent)
+    assert rebuilt.model_dump(exclude={"endpoint_url"}) == agent.model_dump(exclude={"endpoint_url"})
+    assert str(rebuilt.endpoint_url) == str(agent.endpoint_url)
+
+    # Rebuilt models do not share mutable fields with the record
+    rebuilt.tools.append("weather")
+    rebuilt.custom_metadata["added"] = True
+    assert record.tools == ("search", "calculator")
+    assert "added" not in record.custom_metadata
+
+def test_agent_record_shares_tags():
+    # Fresh string objects, as decoded from separate requests
+    first = AgentRecord(make_agent("first", tools=["".join("search")], languages=["en"]))
+    second = AgentRecord(make_agent("second", tools=["".join("search")], languages=["en"]))
+    assert first.tools is second.tools
+    assert first.languages is second.languages
+
+    empty = AgentRecord(make_agent("empty"))
+    assert empty.skills == ()
+    assert empty.custom_metadata == {}
+
+def test_agent_record_json_cache():
+    record = AgentRecord(make_agent("cached", tools=["search"]))
+    encoded = record.json_bytes()
+    assert json.loads(encoded) == json.loads(record.to_agent().model_dump_json())
+    assert record.json_bytes() is encoded
+
+    # Heartbeat fields change in place and drop the cached encoding
+    record.stale = True
+    assert json.loads(record.json_bytes())["stale"] is True
+    record.last_seen = datetime(2024, 1, 3, 12, 0)
+    assert json.loads(record.json_bytes())["last_seen"] == "2024-01-03T12:00:00"
+
+def test_agent_record_serializes_without_warnings():
+    record = AgentRecord(make_agent("linked", endpoint_url="https://example.com/linked"))
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        encoded = record.json_bytes()
+    assert json.loads(encoded)["endpoint_url"] == "https://example.com/linked"
+
+def test_agent_record_tag_table_is_bounded(monkeypatch):
+    from AutonomousSphere.registry import records
+
+    monkeypatch.setattr(records, "_tag_sets", {})
+    monkeypatch.setattr(records, "MAX_TAG_SETS", 2)
+    first = [AgentRecord(make_agent(f"agent-{i}", tools=[f"tool-{i}"])) for i in range(4)]
+    assert len(records._tag_sets) == 2
+    # Combinations past the bound still work, unshared
+    again = AgentRecord(make_agent("again", tools=["tool-3"]))
+    assert again.tools == first[3].tools
+    assert again.tools is not first[3].tools
+    assert AgentRecord(make_agent("shared", tools=["tool-0"])).tools is first[0].tools
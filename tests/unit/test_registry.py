@@ -1,12 +1,22 @@
 import pytest
 import asyncio
-from datetime import datetime
+import json
+from datetime import datetime, timedelta
+from fastapi import Response
+from AutonomousSphere.config import StorageSettings
 from AutonomousSphere.registry.models import Agent, Protocol, SearchQuery
 
+def parse_agents(response):
+    """Agents in the body of a pre-serialized registry response"""
+    body = json.loads(response.body)
+    if isinstance(body, list):
+        return [Agent.model_validate(agent) for agent in body]
+    return Agent.model_validate(body)
+
 # Mock the registry storage for unit tests
 @pytest.fixture
 def mock_registry():
-    from AutonomousSphere.registry.registry import agents_registry
+    from AutonomousSphere.registry.registry import agents_registry, rebuild_indexes
     
     # Save original registry
     original_registry = agents_registry.copy()
@@ -20,7 +30,7 @@ def mock_registry():
             id="test-agent-1",
             display_name="Test Agent 1",
             description="A test agent for unit testing",
-            protocol=Protocol.MATRIX,
+            protocol=Protocol.MCP,
             endpoint_url="https://example.com/agent1",
             public=True,
             languages=["en"],
@@ -32,7 +42,7 @@ def mock_registry():
             id="test-agent-2",
             display_name="Test Agent 2",
             description="Another test agent with different capabilities",
-            protocol=Protocol.HTTP,
+            protocol=Protocol.A2A,
             endpoint_url="https://example.com/agent2",
             public=False,
             languages=["en", "es"],
@@ -44,12 +54,14 @@ def mock_registry():
     
     for agent in test_agents:
         agents_registry[agent.id] = agent
+    rebuild_indexes()
     
     yield agents_registry
     
     # Restore original registry
     agents_registry.clear()
     agents_registry.update(original_registry)
+    rebuild_indexes()
 
 @pytest.mark.asyncio
 async def test_register_agent(mock_registry):
@@ -59,7 +71,7 @@ async def test_register_agent(mock_registry):
         id="new-test-agent",
         display_name="New Test Agent",
         description="A newly registered test agent",
-        protocol=Protocol.MATRIX,
+        protocol=Protocol.MCP,
         endpoint_url="https://example.com/new-agent",
         public=True,
         languages=["en"],
@@ -79,16 +91,16 @@ async def test_list_agents(mock_registry):
     from AutonomousSphere.registry.registry import list_agents
     
     # Test listing all agents
-    all_agents = await list_agents(protocol=None, public=None)
+    all_agents = parse_agents(await list_agents(protocol=None, public=None, stale=None, if_none_match=None))
     assert len(all_agents) == 2
     
     # Test filtering by protocol
-    matrix_agents = await list_agents(protocol=Protocol.MATRIX, public=None)
+    matrix_agents = parse_agents(await list_agents(protocol=Protocol.MCP, public=None, stale=None, if_none_match=None))
     assert len(matrix_agents) == 1
     assert matrix_agents[0].id == "test-agent-1"
     
     # Test filtering by public visibility
-    public_agents = await list_agents(protocol=None, public=True)
+    public_agents = parse_agents(await list_agents(protocol=None, public=True, stale=None, if_none_match=None))
     assert len(public_agents) == 1
     assert public_agents[0].id == "test-agent-1"
 
@@ -100,10 +112,14 @@ async def test_search_agents(mock_registry):
     results = await search_agents(SearchQuery(query="test agent", filters={}))
     assert len(results) == 2
     
+    # A limit keeps the first registered matches
+    results = await search_agents(SearchQuery(query="test agent", limit=1))
+    assert [agent.id for agent in results] == ["test-agent-1"]
+    
     # Search with protocol filter
     results = await search_agents(SearchQuery(
         query="test agent", 
-        filters={"protocol": [Protocol.HTTP]}
+        filters={"protocol": [Protocol.A2A]}
     ))
     assert len(results) == 1
     assert results[0].id == "test-agent-2"
@@ -114,4 +130,609 @@ async def test_search_agents(mock_registry):
         filters={"tools": ["search"]}
     ))
     assert len(results) == 1
-    assert results[0].id == "test-agent-1"
\ No newline at end of file
+    assert results[0].id == "test-agent-1"
+
+@pytest.mark.asyncio
+async def test_search_agents_substring_engine(mock_registry):
+    from AutonomousSphere.registry.registry import search_agents
+    from AutonomousSphere.registry.models import SearchEngine
+    
+    # Partial words only match with the substring engine
+    results = await search_agents(SearchQuery(query="capab", filters={}))
+    assert len(results) == 0
+    
+    results = await search_agents(SearchQuery(query="capab", filters={}, engine=SearchEngine.SUBSTRING))
+    assert len(results) == 1
+    assert results[0].id == "test-agent-2"
+
+@pytest.mark.asyncio
+async def test_search_index_tracks_mutations(mock_registry):
+    from AutonomousSphere.registry.registry import search_agents, update_agent, delete_agent
+    
+    agent = mock_registry["test-agent-1"].to_agent().model_copy(update={"description": "Forecasts the weather"})
+    await update_agent("test-agent-1", agent, if_match=None, response=Response())
+    
+    results = await search_agents(SearchQuery(query="weather", filters={}))
+    assert [r.id for r in results] == ["test-agent-1"]
+    results = await search_agents(SearchQuery(query="unit testing", filters={}))
+    assert len(results) == 0
+    
+    await delete_agent("test-agent-1")
+    results = await search_agents(SearchQuery(query="weather", filters={}))
+    assert len(results) == 0
+
+@pytest.mark.asyncio
+async def test_search_agents_set_filters(mock_registry):
+    from AutonomousSphere.registry.registry import search_agents, list_agents
+    
+    # Any-of semantics within a filter, intersection across filters
+    results = await search_agents(SearchQuery(
+        query="agent",
+        filters={"language": ["es", "fr"], "tools": ["weather", "search"]}
+    ))
+    assert [r.id for r in results] == ["test-agent-2"]
+    
+    results = await search_agents(SearchQuery(query="agent", filters={"public": True}))
+    assert [r.id for r in results] == ["test-agent-1"]
+    
+    # Empty filter values are ignored
+    results = await search_agents(SearchQuery(query="agent", filters={"tools": []}))
+    assert len(results) == 2
+    
+    agents = parse_agents(await list_agents(protocol=Protocol.A2A, public=True, stale=None, if_none_match=None))
+    assert agents == []
+
+@pytest.mark.asyncio
+async def test_search_agents_vector_engine(mock_registry):
+    from AutonomousSphere.registry.registry import search_agents, register_agent
+    from AutonomousSphere.registry.models import SearchEngine
+    
+    results = await search_agents(SearchQuery(query="weather news", engine=SearchEngine.VECTOR, limit=1))
+    assert [r.id for r in results] == ["test-agent-2"]
+    assert results[0].score > 0
+    
+    # Agents registered after the index is built are searchable
+    await register_agent(Agent(
+        id="forecaster",
+        display_name="Forecaster",
+        description="Weather forecasts",
+        protocol=Protocol.MCP,
+        tools=["weather"]
+    ))
+    results = await search_agents(SearchQuery(query="weather forecasts", engine=SearchEngine.VECTOR))
+    assert results[0].id == "forecaster"
+    
+    # Filters restrict the scored agents
+    results = await search_agents(SearchQuery(
+        query="weather forecasts",
+        filters={"protocol": [Protocol.A2A]},
+        engine=SearchEngine.VECTOR
+    ))
+    assert [r.id for r in results] == ["test-agent-2"]
+
+@pytest.mark.asyncio
+async def test_search_agents_bm25_engine(mock_registry):
+    from AutonomousSphere.registry.registry import search_agents
+    from AutonomousSphere.registry.models import SearchEngine
+    
+    results = await search_agents(SearchQuery(query="weather testing", engine=SearchEngine.BM25))
+    assert {r.id for r in results} == {"test-agent-1", "test-agent-2"}
+    assert results[0].score >= results[1].score
+    
+    results = await search_agents(SearchQuery(query="agent", engine=SearchEngine.BM25, limit=1))
+    assert len(results) == 1
+    assert results[0].score is not None
+
+@pytest.mark.asyncio
+async def test_search_response_matches_models(mock_registry):
+    from AutonomousSphere.registry.registry import search_agents, search_agents_json
+    from AutonomousSphere.registry.models import SearchEngine
+    
+    # The concatenated cached JSON encodes the same agents as the models would
+    for engine in (SearchEngine.INDEX, SearchEngine.BM25):
+        query = SearchQuery(query="test agent", engine=engine)
+        response = await search_agents_json(query)
+        assert response.media_type == "application/json"
+        expected = [json.loads(agent.model_dump_json()) for agent in await search_agents(query)]
+        assert json.loads(response.body) == expected
+
+@pytest.mark.asyncio
+async def test_search_cache(mock_registry):
+    from AutonomousSphere.registry import registry
+    from AutonomousSphere.registry.models import SearchEngine
+    
+    registry.search_cache.clear()
+    hits = registry.search_cache.hits
+    first = await registry.search_agents(SearchQuery(query="Weather", engine=SearchEngine.BM25))
+    # Same tokens and filters in another form hit the cached result
+    again = await registry.search_agents(SearchQuery(query=" weather! ", engine=SearchEngine.BM25, filters={"tools": []}))
+    assert registry.search_cache.hits == hits + 1
+    assert [(r.id, r.score) for r in again] == [(r.id, r.score) for r in first]
+    
+    # Heartbeats keep the cached results, but responses show the new last_seen
+    await registry.agent_heartbeat("test-agent-2")
+    again = await registry.search_agents(SearchQuery(query="weather", engine=SearchEngine.BM25))
+    assert registry.search_cache.hits == hits + 2
+    assert again[0].last_seen == mock_registry["test-agent-2"].last_seen
+    
+    # Any registration invalidates them
+    await registry.register_agent(Agent(id="weather-bot", display_name="Weather Bot", protocol=Protocol.MCP))
+    again = await registry.search_agents(SearchQuery(query="weather", engine=SearchEngine.BM25))
+    assert registry.search_cache.hits == hits + 2
+    assert "weather-bot" in [r.id for r in again]
+    
+    health = await registry.registry_health()
+    assert health["search_cache"]["hits"] == registry.search_cache.hits
+    assert health["search_cache"]["misses"] == registry.search_cache.misses
+
+@pytest.mark.asyncio
+async def test_search_rejects_unsupported_filter_values(mock_registry):
+    from fastapi import HTTPException
+    from AutonomousSphere.registry import registry
+    from AutonomousSphere.registry.models import SearchEngine
+    
+    for engine in (SearchEngine.INDEX, SearchEngine.BM25):
+        for filters in ({"tools": [{"a": 1}]}, {"protocol": 1}, {"languages": [True]}, {"public": "yes"}):
+            with pytest.raises(HTTPException) as excinfo:
+                await registry.search_agents(SearchQuery(query="weather", engine=engine, filters=filters))
+            assert excinfo.value.status_code == 422
+
+@pytest.mark.asyncio
+async def test_search_agents_fuzzy_engine(mock_registry):
+    from AutonomousSphere.registry.registry import search_agents
+    from AutonomousSphere.registry.models import SearchEngine
+    
+    results = await search_agents(SearchQuery(query="calculater", engine=SearchEngine.FUZZY))
+    assert [r.id for r in results] == ["test-agent-1"]
+    assert 0 < results[0].score < 1
+    
+    results = await search_agents(SearchQuery(query="wether", engine=SearchEngine.FUZZY, filters={"public": True}))
+    assert results == []
+
+@pytest.fixture
+def fake_storage(mock_registry):
+    from AutonomousSphere.registry import registry
+    from AutonomousSphere.registry.storage import AgentStorage
+    
+    class DictStorage(AgentStorage):
+        def __init__(self, records):
+            self.agents = {agent_id: record.to_agent() for agent_id, record in records.items()}
+        
+        async def load_all(self):
+            return list(self.agents.values())
+        
+        async def get(self, agent_id):
+            return self.agents.get(agent_id)
+        
+        async def insert(self, agent):
+            if agent.id in self.agents:
+                return False
+            self.agents[agent.id] = agent
+            return True
+        
+        async def update(self, agent, expected_versions=None):
+            # A round trip, during which other requests run
+            await asyncio.sleep(0)
+            current = self.agents.get(agent.id)
+            if current is None or (expected_versions is not None and current.version not in expected_versions):
+                return None
+            self.agents[agent.id] = agent.model_copy(update={"version": current.version + 1})
+            return current.version + 1
+        
+        async def delete(self, agent_id):
+            return self.agents.pop(agent_id, None) is not None
+        
+        async def touch_many(self, last_seen):
+            for agent_id, seen_at in last_seen.items():
+                if agent_id in self.agents:
+                    self.agents[agent_id] = self.agents[agent_id].model_copy(update={"last_seen": seen_at, "stale": False})
+        
+        async def mark_stale(self, agent_ids):
+            flagged = [agent_id for agent_id in agent_ids if agent_id in self.agents and not self.agents[agent_id].stale]
+            for agent_id in flagged:
+                self.agents[agent_id] = self.agents[agent_id].model_copy(update={"stale": True})
+            return flagged
+    
+    registry.storage = DictStorage(mock_registry)
+    yield registry.storage
+    registry.storage = None
+
+@pytest.fixture
+def shared_storage(fake_storage):
+    """Storage keeping a change log shared with other (simulated) workers"""
+    from AutonomousSphere.registry import registry
+    from AutonomousSphere.registry.changes import ChangeFeed
+    from AutonomousSphere.registry.models import ChangeEvent
+    
+    class SharedLogStorage(type(fake_storage)):
+        shared_change_log = True
+        
+        def __init__(self, agents):
+            self.agents = agents
+            self.log = []
+        
+        async def publish(self, change_type, entries):
+            for agent_id, agent in entries:
+                self.log.append(ChangeEvent(version=len(self.log) + 1, type=change_type, agent_id=agent_id, agent=agent))
+            return len(self.log)
+        
+        async def changes_since(self, version, limit):
+            if version > len(self.log):
+                return None
+            return self.log[version:version + limit]
+        
+        async def change_version(self):
+            return len(self.log)
+    
+    local_feed, registry.changes = registry.changes, ChangeFeed()
+    registry.storage = SharedLogStorage(fake_storage.agents)
+    yield registry.storage
+    registry.changes = local_feed
+
+@pytest.mark.asyncio
+async def test_storage_read_through_and_write_through(mock_registry, fake_storage):
+    from fastapi import HTTPException
+    from AutonomousSphere.registry.registry import get_agent, register_agent, delete_agent
+    
+    # Agents missing from the cache are read through from the storage
+    other = Agent(id="other-worker-agent", display_name="Other Worker Agent", protocol=Protocol.ACP)
+    fake_storage.agents[other.id] = other
+    assert parse_agents(await get_agent(other.id, if_none_match=None)).id == other.id
+    assert other.id in mock_registry
+    
+    # IDs taken in the storage are rejected even when not cached
+    fake_storage.agents["taken"] = Agent(id="taken", display_name="Taken", protocol=Protocol.MCP)
+    with pytest.raises(HTTPException) as exc_info:
+        await register_agent(Agent(id="taken", display_name="Taken", protocol=Protocol.MCP))
+    assert exc_info.value.status_code == 400
+    
+    new_agent = Agent(id="stored-agent", display_name="Stored Agent", protocol=Protocol.MCP)
+    await register_agent(new_agent)
+    assert "stored-agent" in fake_storage.agents
+    
+    # Deleting an agent removed through another worker evicts it and reports 404
+    del fake_storage.agents["test-agent-1"]
+    with pytest.raises(HTTPException) as exc_info:
+        await delete_agent("test-agent-1")
+    assert exc_info.value.status_code == 404
+    assert "test-agent-1" not in mock_registry
+
+@pytest.mark.asyncio
+async def test_conditional_updates_through_storage(mock_registry, fake_storage):
+    from fastapi import HTTPException
+    from AutonomousSphere.registry.registry import get_agent, update_agent
+    
+    response = await get_agent("test-agent-1", if_none_match=None)
+    agent, etag = parse_agents(response), response.headers["ETag"]
+    version = agent.version
+    
+    # Of concurrent updates from the same version, the storage lets only one through
+    results = await asyncio.gather(
+        update_agent("test-agent-1", agent.model_copy(update={"description": "First"}), if_match=etag, response=Response()),
+        update_agent("test-agent-1", agent.model_copy(update={"description": "Second"}), if_match=etag, response=Response()),
+        return_exceptions=True
+    )
+    assert results[0].description == "First"
+    assert isinstance(results[1], HTTPException) and results[1].status_code == 412
+    assert fake_storage.agents["test-agent-1"].description == "First"
+    assert fake_storage.agents["test-agent-1"].version == version + 1
+    
+    # An update made through another worker fails the check and refreshes the cache
+    fake_storage.agents["test-agent-1"] = fake_storage.agents["test-agent-1"].model_copy(
+        update={"description": "Changed elsewhere", "version": version + 2}
+    )
+    etag = (await get_agent("test-agent-1", if_none_match=None)).headers["ETag"]
+    with pytest.raises(HTTPException) as exc_info:
+        await update_agent("test-agent-1", agent, if_match=etag, response=Response())
+    assert exc_info.value.status_code == 412
+    assert mock_registry["test-agent-1"].description == "Changed elsewhere"
+    
+    response = await get_agent("test-agent-1", if_none_match=None)
+    updated = await update_agent("test-agent-1", agent, if_match=response.headers["ETag"], response=Response())
+    assert updated.version == version + 3
+    
+    # Updating an agent deleted through another worker reports 404
+    del fake_storage.agents["test-agent-1"]
+    with pytest.raises(HTTPException) as exc_info:
+        await update_agent("test-agent-1", agent, if_match=None, response=Response())
+    assert exc_info.value.status_code == 404
+    assert "test-agent-1" not in mock_registry
+
+@pytest.mark.asyncio
+async def test_peer_changes_refresh_cache(mock_registry, fake_storage):
+    from AutonomousSphere.registry import registry
+    from AutonomousSphere.registry.models import ChangeType
+    
+    version = registry.changes.version
+    
+    # Another worker registered one agent and updated another in the shared storage
+    fake_storage.agents["peer-agent"] = Agent(id="peer-agent", display_name="Peer Agent", protocol=Protocol.A2A)
+    fake_storage.agents["test-agent-1"] = mock_registry["test-agent-1"].to_agent().model_copy(update={"description": "Changed elsewhere"})
+    await registry._apply_peer_change(ChangeType.REGISTERED, ["peer-agent"])
+    await registry._apply_peer_change(ChangeType.UPDATED, ["test-agent-1"])
+    assert mock_registry["test-agent-1"].description == "Changed elsewhere"
+    assert [agent.id for agent in await registry.search_agents(SearchQuery(query="peer"))] == ["peer-agent"]
+    
+    del fake_storage.agents["peer-agent"]
+    await registry._apply_peer_change(ChangeType.DELETED, ["peer-agent"])
+    # Replayed notifications change nothing
+    await registry._apply_peer_change(ChangeType.DELETED, ["peer-agent"])
+    assert "peer-agent" not in mock_registry
+    
+    assert [(event.type, event.agent_id) for event in registry.changes.since(version, 100)] == [
+        (ChangeType.REGISTERED, "peer-agent"),
+        (ChangeType.UPDATED, "test-agent-1"),
+        (ChangeType.DELETED, "peer-agent"),
+    ]
+
+@pytest.mark.asyncio
+async def test_shared_change_log(mock_registry, shared_storage):
+    from AutonomousSphere.registry import registry
+    from AutonomousSphere.registry.models import ChangeType, ChangeEvent
+    
+    # Changes are numbered by the storage, not by the local feed
+    await registry.register_agent(Agent(id="shared-agent", display_name="Shared Agent", protocol=Protocol.MCP))
+    assert [(event.type, event.agent_id) for event in shared_storage.log] == [(ChangeType.REGISTERED, "shared-agent")]
+    assert len(registry.changes) == 0
+    page = await registry.list_changes(since=0, limit=100, wait=0)
+    assert [event.agent.id for event in page.events] == ["shared-agent"]
+    assert page.version == 1
+    
+    # A change logged by another worker wakes long-polls when its notification is applied
+    shared_storage.agents["peer-agent"] = Agent(id="peer-agent", display_name="Peer Agent", protocol=Protocol.A2A)
+    shared_storage.log.append(ChangeEvent(version=2, type=ChangeType.REGISTERED, agent_id="peer-agent"))
+    poll = asyncio.create_task(registry.list_changes(since=1, limit=100, wait=5))
+    await asyncio.sleep(0)
+    await registry._apply_peer_change(ChangeType.REGISTERED, ["peer-agent"], 2)
+    page = await poll
+    assert [event.agent_id for event in page.events] == ["peer-agent"]
+    assert "peer-agent" in mock_registry
+    assert len(registry.changes) == 0
+    
+    # The list ETag follows the shared version; heartbeats are applied to each worker's own cache,
+    # so it is also tagged with the process
+    response = await registry.list_agents(protocol=None, public=None, stale=None, if_none_match=None)
+    assert response.headers["ETag"] == f'W/"{registry._etag_epoch}-2-{registry._heartbeat_generation}"'
+    
+    # Agents another worker already flagged stale are not logged again
+    registry.heartbeats.stale_after = 10
+    try:
+        for agent_id in ("test-agent-1", "test-agent-2"):
+            mock_registry[agent_id].last_seen = datetime.now() - timedelta(seconds=15)
+            shared_storage.agents[agent_id] = mock_registry[agent_id].to_agent()
+        shared_storage.agents["test-agent-1"].stale = True
+        registry.rebuild_indexes()
+        await registry.process_heartbeats()
+        assert mock_registry["test-agent-1"].stale and mock_registry["test-agent-2"].stale
+        assert [event.agent_id for event in shared_storage.log[2:]] == ["test-agent-2"]
+        
+        # Revived agents are stored alive before the change is logged
+        await registry.agent_heartbeat("test-agent-2")
+        assert not shared_storage.agents["test-agent-2"].stale
+        assert shared_storage.log[-1].agent_id == "test-agent-2"
+        assert not shared_storage.log[-1].agent.stale
+    finally:
+        registry.heartbeats.stale_after = 0
+
+@pytest.mark.asyncio
+async def test_register_agents_bulk(mock_registry):
+    from fastapi import HTTPException
+    from AutonomousSphere.registry.registry import register_agents_bulk, search_agents
+    from AutonomousSphere.registry.models import BulkRegistration, BulkMode
+    
+    agents = [
+        {"id": f"bulk-agent-{i}", "display_name": f"Bulk Agent {i}", "protocol": "MCP"}
+        for i in range(3)
+    ]
+    duplicate = {"id": "test-agent-1", "display_name": "Duplicate", "protocol": "MCP"}
+    invalid = [
+        {"id": "bad-protocol", "display_name": "Bad", "protocol": "SMTP"},
+        {"display_name": "No ID", "protocol": "MCP"}
+    ]
+    
+    # Atomic mode rejects the whole batch
+    with pytest.raises(HTTPException) as exc_info:
+        await register_agents_bulk(BulkRegistration(agents=agents + [duplicate]))
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail[0]["id"] == "test-agent-1"
+    assert "bulk-agent-0" not in mock_registry
+    
+    # Best-effort mode registers every valid agent with one timestamp
+    result = await register_agents_bulk(BulkRegistration(
+        agents=agents + [duplicate, agents[0]],
+        mode=BulkMode.BEST_EFFORT
+    ))
+    assert result.registered == ["bulk-agent-0", "bulk-agent-1", "bulk-agent-2"]
+    assert [error.id for error in result.errors] == ["test-agent-1", "bulk-agent-0"]
+    
+    # Invalid agents are rejected on their own, next to the duplicates
+    with pytest.raises(HTTPException) as exc_info:
+        await register_agents_bulk(BulkRegistration(agents=[{"id": "valid", "display_name": "Valid", "protocol": "MCP"}] + invalid))
+    assert exc_info.value.status_code == 400
+    assert "valid" not in mock_registry
+    result = await register_agents_bulk(BulkRegistration(
+        agents=invalid + [duplicate, {"id": "bulk-agent-3", "display_name": "Bulk Agent 3", "protocol": "MCP"}],
+        mode=BulkMode.BEST_EFFORT
+    ))
+    assert result.registered == ["bulk-agent-3"]
+    assert [error.id for error in result.errors] == ["bad-protocol", "agents[1]", "test-agent-1"]
+    assert result.errors[0].detail.startswith("protocol:")
+    assert result.errors[1].detail.startswith("id:")
+    assert mock_registry["bulk-agent-0"].registered_at == mock_registry["bulk-agent-2"].registered_at
+    
+    results = await search_agents(SearchQuery(query="bulk agent"))
+    assert len(results) == 4
+
+@pytest.mark.asyncio
+async def test_batch_get_agents(mock_registry):
+    from AutonomousSphere.registry.registry import batch_get_agents
+    from AutonomousSphere.registry.models import BatchGetRequest
+    
+    result = await batch_get_agents(BatchGetRequest(ids=["test-agent-2", "missing", "test-agent-1"]))
+    assert [agent.id for agent in result.agents] == ["test-agent-2", "test-agent-1"]
+    assert result.missing == ["missing"]
+
+@pytest.mark.asyncio
+async def test_heartbeat_refreshes_and_expires_agents(mock_registry, fake_storage):
+    from fastapi import HTTPException
+    from AutonomousSphere.registry import registry
+    from AutonomousSphere.registry.models import HeartbeatRequest
+    
+    # Heartbeats update last_seen in memory; the storage sees them on the next flush
+    before = mock_registry["test-agent-1"].last_seen
+    await registry.agent_heartbeat("test-agent-1")
+    assert mock_registry["test-agent-1"].last_seen > before
+    assert "test-agent-1" in registry.heartbeats.pending
+    
+    result = await registry.agents_heartbeat(HeartbeatRequest(ids=["test-agent-2", "missing"]))
+    assert result.accepted == ["test-agent-2"]
+    assert result.unknown == ["missing"]
+    
+    with pytest.raises(HTTPException) as exc_info:
+        await registry.agent_heartbeat("missing")
+    assert exc_info.value.status_code == 404
+    
+    # Agents past their deadline are marked stale, then removed
+    registry.heartbeats.stale_after = 10
+    try:
+        for agents in (mock_registry, fake_storage.agents):
+            agents["test-agent-2"].last_seen = datetime.now() - timedelta(seconds=15)
+        registry.rebuild_indexes()
+        await registry.process_heartbeats()
+        assert mock_registry["test-agent-2"].stale
+        assert fake_storage.agents["test-agent-2"].stale
+        assert [agent.id for agent in parse_agents(await registry.list_agents(protocol=None, public=None, stale=True, if_none_match=None))] == ["test-agent-2"]
+        
+        await registry.agent_heartbeat("test-agent-2")
+        assert not mock_registry["test-agent-2"].stale
+        await registry.process_heartbeats()
+        assert not fake_storage.agents["test-agent-2"].stale
+        
+        registry.heartbeats.expire_after = 20
+        for agents in (mock_registry, fake_storage.agents):
+            agents["test-agent-2"].last_seen = datetime.now() - timedelta(seconds=30)
+        registry.rebuild_indexes()
+        await registry.process_heartbeats()
+        assert "test-agent-2" not in mock_registry
+        assert "test-agent-2" not in fake_storage.agents
+        assert "test-agent-1" in mock_registry
+    finally:
+        registry.heartbeats.stale_after = 0
+        registry.heartbeats.expire_after = 0
+
+@pytest.mark.asyncio
+async def test_change_feed_tracks_mutations(mock_registry):
+    from fastapi import HTTPException
+    from AutonomousSphere.registry.registry import list_changes, register_agent, update_agent, delete_agent
+    from AutonomousSphere.registry.models import ChangeType
+    
+    version = (await list_changes(since=None, limit=100, wait=0)).version
+    
+    agent = Agent(id="changing-agent", display_name="Changing Agent", protocol=Protocol.MCP)
+    await register_agent(agent)
+    await update_agent("changing-agent", agent.model_copy(update={"description": "Updated"}), if_match=None, response=Response())
+    await delete_agent("changing-agent")
+    
+    page = await list_changes(since=version, limit=100, wait=0)
+    assert [(event.type, event.agent_id) for event in page.events] == [
+        (ChangeType.REGISTERED, "changing-agent"),
+        (ChangeType.UPDATED, "changing-agent"),
+        (ChangeType.DELETED, "changing-agent"),
+    ]
+    assert page.events[1].agent.description == "Updated"
+    assert page.version == version + 3
+    assert not page.more
+    
+    page = await list_changes(since=version, limit=1, wait=0)
+    assert page.version == version + 1
+    assert page.more
+    
+    # Nothing new: a long poll times out with an empty page
+    page = await list_changes(since=version + 3, limit=100, wait=0.01)
+    assert page.events == []
+    assert page.version == version + 3
+    
+    with pytest.raises(HTTPException) as exc_info:
+        await list_changes(since=version + 100, limit=100, wait=0)
+    assert exc_info.value.status_code == 410
+
+@pytest.mark.asyncio
+async def test_conditional_requests(mock_registry):
+    from fastapi import HTTPException
+    from AutonomousSphere.registry import registry
+    from AutonomousSphere.registry.registry import get_agent, list_agents, update_agent, agent_heartbeat
+    
+    response = await get_agent("test-agent-1", if_none_match=None)
+    agent = parse_agents(response)
+    agent_etag = response.headers["ETag"]
+    version = agent.version
+    response = await list_agents(protocol=None, public=None, stale=None, if_none_match=None)
+    list_etag = response.headers["ETag"]
+    
+    # Unchanged resources are answered with 304 and no body
+    cached = await get_agent("test-agent-1", if_none_match=f"W/{agent_etag}")
+    assert cached.status_code == 304
+    cached = await list_agents(protocol=None, public=None, stale=None, if_none_match=list_etag)
+    assert cached.status_code == 304
+    
+    # Heartbeats change last_seen, so they change the agent and list ETags and the cached JSON
+    await agent_heartbeat("test-agent-1")
+    response = await get_agent("test-agent-1", if_none_match=agent_etag)
+    assert response.headers["ETag"] != agent_etag
+    assert parse_agents(response).last_seen > agent.last_seen
+    response_list = await list_agents(protocol=None, public=None, stale=None, if_none_match=list_etag)
+    assert response_list.status_code == 200
+    listed = {listed_agent.id: listed_agent for listed_agent in parse_agents(response_list)}
+    assert listed["test-agent-1"].last_seen > agent.last_seen
+    list_etag = response_list.headers["ETag"]
+    # So does an agent going stale
+    registry._set_stale(registry.agents_registry["test-agent-2"], True)
+    response_list = await list_agents(protocol=None, public=None, stale=None, if_none_match=list_etag)
+    assert response_list.status_code == 200
+    list_etag = response_list.headers["ETag"]
+    
+    # They keep the version, so an If-Match read before them still applies
+    response = Response()
+    updated = await update_agent("test-agent-1", agent, if_match=agent_etag, response=response)
+    assert updated.version == version + 1
+    assert response.headers["ETag"].startswith(f'"{updated.version}-')
+    response_list = await list_agents(protocol=None, public=None, stale=None, if_none_match=list_etag)
+    assert response_list.headers["ETag"] != list_etag
+    
+    # Updates with an outdated If-Match are rejected
+    for if_match in (agent_etag, f"W/{response.headers['ETag']}"):
+        with pytest.raises(HTTPException) as exc_info:
+            await update_agent("test-agent-1", agent, if_match=if_match, response=Response())
+        assert exc_info.value.status_code == 412
+    await update_agent("test-agent-1", agent, if_match=f'"x", {response.headers["ETag"]}', response=Response())
+
+@pytest.mark.asyncio
+async def test_loaded_agents_are_indexed_in_background(mock_registry, tmp_path, monkeypatch):
+    from AutonomousSphere.registry import registry
+    from AutonomousSphere.registry.wal_storage import WalAgentStorage
+    
+    seeded = WalAgentStorage(str(tmp_path))
+    await seeded.connect()
+    await seeded.insert_many(
+        [Agent(id=f"bulk-{i}", display_name=f"Bulk {i}", protocol=Protocol.MCP) for i in range(2500)],
+        atomic=True
+    )
+    await seeded.close()
+    
+    monkeypatch.delenv("REGISTRY_DATA_DIR", raising=False)
+    await registry._connect_storage(StorageSettings(backend="wal", directory=str(tmp_path)))
+    try:
+        # Startup does not wait for the indexes; searches do
+        assert len(registry.agents_registry) == 2500
+        assert not registry._index_build.done()
+        results = await registry.search_agents(SearchQuery(query="bulk", limit=5000))
+        assert len(results) == 2500
+        assert registry._index_build.done()
+        assert (await registry.registry_health())["indexes_ready"]
+        
+        # The cache holds its own records, not the storage's
+        assert registry.agents_registry["bulk-0"] is not registry.storage.agents["bulk-0"]
+    finally:
+        await registry.storage.close()
+        registry.storage = None
+        registry._index_build = None
@@ -1,6 +1,8 @@
 import pytest
 import asyncio
+import json
 from unittest.mock import patch, MagicMock
+from AutonomousSphere.config import AppConfig
 from AutonomousSphere.registry.models.search import SearchQuery
 from AutonomousSphere.search.models import SearchResult
 
@@ -68,14 +70,14 @@ async def test_unified_search():
             
             # Mock the get_config function
             with patch('AutonomousSphere.search.search.get_config') as mock_get_config:
-                mock_get_config.return_value = {
+                mock_get_config.return_value = AppConfig.from_data({
                     "homeserver": {
                         "address": "http://localhost:8008"
                     }
-                }
+                })
                 
                 # Call the unified_search function
-                result = await unified_search(search_query, authorization="Bearer test_token")
+                result = await unified_search(search_query, next_batch=None, fusion=None, authorization="Bearer test_token")
                 
                 # Verify the result
                 assert isinstance(result, SearchResult)
@@ -83,4 +85,244 @@ async def test_unified_search():
                 assert len(result.results["agents"]) == 1
                 assert len(result.results["matrix"]["messages"]) == 1
                 assert result.results["matrix"]["messages"][0]["event_id"] == "event1"
-                assert result.metadata.total_results > 0
\ No newline at end of file
+                assert result.metadata.total_results > 0
+@pytest.mark.asyncio
+async def test_unified_search_returns_partial_results_on_timeout():
+    from AutonomousSphere.search.search import unified_search
+    
+    async def slow_matrix_search(*args, **kwargs):
+        await asyncio.sleep(10)
+    
+    with patch('AutonomousSphere.search.search.search_agents') as mock_search_agents, \
+            patch('AutonomousSphere.search.search.search_matrix', side_effect=slow_matrix_search), \
+            patch('AutonomousSphere.search.search.get_config') as mock_get_config:
+        mock_search_agents.return_value = [{"id": "test-agent-1"}]
+        mock_get_config.return_value = AppConfig.from_data({
+            "homeserver": {"address": "http://localhost:8008"},
+            "search": {"timeouts": {"matrix": 0.05}}
+        })
+        
+        result = await unified_search(SearchQuery(query="test query"), next_batch=None, fusion=None, authorization="Bearer test_token")
+        
+        # The agents arrive even though the homeserver missed its deadline
+        assert result.results["agents"] == [{"id": "test-agent-1"}]
+        assert result.results["matrix"]["messages"] == []
+        assert result.metadata.timed_out_sources == ["matrix"]
+        assert result.metadata.search_time_ms < 1000
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_searches_are_coalesced():
+    from AutonomousSphere.search.search import unified_search
+    
+    calls = []
+    async def slow_agent_search(search_query, ranked=False):
+        calls.append(search_query.query)
+        await asyncio.sleep(0.05)
+        return [{"id": "test-agent-1"}]
+    
+    with patch('AutonomousSphere.search.search.search_agents', side_effect=slow_agent_search), \
+            patch('AutonomousSphere.search.search.get_config') as mock_get_config:
+        mock_get_config.return_value = AppConfig.from_data({"homeserver": {"address": "http://localhost:8008"}})
+        
+        results = await asyncio.gather(*(unified_search(SearchQuery(query="burst"), next_batch=None, fusion=None, authorization=None) for _ in range(3)))
+        
+        assert calls == ["burst"]
+        assert all(result.results["agents"] == [{"id": "test-agent-1"}] for result in results)
+
+@pytest.mark.asyncio
+async def test_stream_search_sends_agents_before_matrix():
+    from AutonomousSphere.search.search import stream_search
+    
+    async def slow_matrix_search(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return {"search_categories": {"room_events": {"results": [], "next_batch": "batch-2"}}}
+    
+    with patch('AutonomousSphere.search.search.search_agents') as mock_search_agents, \
+            patch('AutonomousSphere.search.search.search_matrix', side_effect=slow_matrix_search), \
+            patch('AutonomousSphere.search.search._prefetch_matrix_pages') as mock_prefetch, \
+            patch('AutonomousSphere.search.search.get_config') as mock_get_config:
+        mock_search_agents.return_value = [{"id": "test-agent-1"}]
+        mock_get_config.return_value = AppConfig.from_data({"homeserver": {"address": "http://localhost:8008"}})
+        
+        response = await stream_search(SearchQuery(query="test query"), next_batch=None, authorization="Bearer test_token", accept=None)
+        assert response.media_type == "application/x-ndjson"
+        frames = [json.loads(line) async for line in response.body_iterator]
+        
+        assert [frame["type"] for frame in frames] == ["agents", "matrix", "metadata"]
+        assert frames[0]["agents"] == [{"id": "test-agent-1"}]
+        assert frames[1]["next_batch"] == "batch-2"
+        assert mock_prefetch.call_args[0][3] == "batch-2"
+        assert frames[2]["metadata"]["total_results"] == 1
+        assert set(frames[2]["metadata"]["source_times_ms"]) == {"agents", "matrix"}
+        
+        # Server-Sent Events name each event after its frame type
+        response = await stream_search(SearchQuery(query="test query"), next_batch=None, authorization=None, accept="text/event-stream")
+        events = [event async for event in response.body_iterator]
+        assert events[0].startswith("event: agents\ndata: ")
+        assert events[-1].startswith("event: metadata\ndata: ")
+
+@pytest.mark.asyncio
+async def test_stream_search_rejects_invalid_queries_before_streaming():
+    from fastapi import HTTPException
+    from AutonomousSphere.search.search import stream_search
+    from AutonomousSphere.registry.models import SearchEngine
+    
+    with pytest.raises(HTTPException) as error:
+        await stream_search(SearchQuery(query="weather", filters={"protocol": ["MCP", {"nested": "value"}]}), next_batch=None, authorization=None, accept=None)
+    assert error.value.status_code == 422
+    
+    # pgvector is not configured in the unit tests
+    with pytest.raises(HTTPException) as error:
+        await stream_search(SearchQuery(query="weather", engine=SearchEngine.PGVECTOR), next_batch=None, authorization=None, accept=None)
+    assert error.value.status_code == 400
+
+@pytest.mark.asyncio
+async def test_next_pages_are_prefetched_for_pagination():
+    from AutonomousSphere.search.search import unified_search, iter_matrix_search, matrix_prefetcher
+    
+    fetched = []
+    async def fetch_page(query, access_token, homeserver_url, next_batch=None, limit=20):
+        fetched.append(next_batch)
+        following = {None: "batch-2", "batch-2": "batch-3", "batch-3": None}[next_batch]
+        return {"search_categories": {"room_events": {"results": [], "next_batch": following}}}
+    
+    with patch('AutonomousSphere.search.search.search_agents') as mock_search_agents, \
+            patch('AutonomousSphere.search.search._fetch_matrix_search', side_effect=fetch_page), \
+            patch('AutonomousSphere.search.search.get_config') as mock_get_config:
+        mock_search_agents.return_value = []
+        mock_get_config.return_value = AppConfig.from_data({"homeserver": {"address": "http://localhost:8008"}})
+        
+        first = await unified_search(SearchQuery(query="paged query"), next_batch=None, fusion=None, authorization="Bearer test_token")
+        assert first.results["matrix"]["next_batch"] == "batch-2"
+        await asyncio.gather(*matrix_prefetcher.active.values())
+        assert fetched == [None, "batch-2", "batch-3"]
+        
+        # The following page was prefetched into the cache, so it costs no homeserver request
+        second = await unified_search(SearchQuery(query="paged query"), next_batch="batch-2", fusion=None, authorization="Bearer test_token")
+        assert second.results["matrix"]["next_batch"] == "batch-3"
+        assert fetched == [None, "batch-2", "batch-3"]
+        
+        # Iterating over every page reads them from the cache as well
+        pages = [page async for page in iter_matrix_search("paged query", "test_token", mock_get_config.return_value)]
+        assert len(pages) == 3
+        assert fetched == [None, "batch-2", "batch-3"]
+
+@pytest.mark.asyncio
+async def test_matrix_search_uses_local_message_index(tmp_path):
+    from AutonomousSphere.search import search
+    
+    index = search.MessageIndex(str(tmp_path / "messages.db"))
+    await index.open()
+    await index.ingest({"type": "m.room.member", "room_id": "!room:hs", "state_key": "@alice:hs", "content": {"membership": "join"}})
+    await index.ingest({
+        "type": "m.room.message", "event_id": "$1", "room_id": "!room:hs", "sender": "@bob:hs",
+        "origin_server_ts": 1609459200000, "content": {"msgtype": "m.text", "body": "local results"}
+    })
+    
+    async def user_id(access_token, homeserver_url):
+        return "@alice:hs"
+    
+    try:
+        with patch('AutonomousSphere.search.search.message_index', index), \
+                patch('AutonomousSphere.search.search._matrix_user_id', side_effect=user_id), \
+                patch('AutonomousSphere.search.search._fetch_matrix_search') as mock_fetch:
+            response = await search.search_matrix("local", "test_token", {"homeserver": {"address": "http://localhost:8008"}})
+            
+            assert mock_fetch.call_count == 0
+            frame = search._matrix_frame(response)
+            assert [message["event_id"] for message in frame["messages"]] == ["$1"]
+    finally:
+        await index.close()
+
+@pytest.mark.asyncio
+async def test_fused_search_pushes_limits_down():
+    from AutonomousSphere.search.search import unified_search
+    from AutonomousSphere.search.fusion import FusionMethod
+    
+    agent_limits = []
+    async def agent_search(search_query, ranked=False):
+        agent_limits.append(search_query.limit)
+        return [{"id": "agent-1", "score": 2.0}, {"id": "agent-2", "score": 1.0}]
+    
+    matrix_limits = []
+    async def matrix_search(query, access_token, config, next_batch=None, limit=None):
+        matrix_limits.append(limit)
+        return {"search_categories": {"room_events": {"results": [
+            {"rank": 0.9, "result": {"event_id": "$1", "room_id": "!room:hs", "sender": "@bob:hs", "content": {}, "origin_server_ts": 0}}
+        ]}}}
+    
+    with patch('AutonomousSphere.search.search.search_agents', side_effect=agent_search), \
+            patch('AutonomousSphere.search.search.search_matrix', side_effect=matrix_search), \
+            patch('AutonomousSphere.search.search.get_config') as mock_get_config:
+        mock_get_config.return_value = AppConfig.from_data({
+            "homeserver": {"address": "http://localhost:8008"},
+            "search": {"fusion": {"weights": {"agents": 1.0, "messages": 2.0}}}
+        })
+        
+        result = await unified_search(SearchQuery(query="fused", limit=2), next_batch=None, fusion=FusionMethod.RRF, authorization="Bearer test_token")
+        
+        assert agent_limits == [2] and matrix_limits == [2]
+        assert [(entry["source"], entry["score"]) for entry in result.results["fused"]] == [("messages", 2.0 / 61), ("agents", 1.0 / 61)]
+        assert result.metadata.fusion == "rrf"
+        
+        # Without Matrix weights the homeserver is not asked at all
+        mock_get_config.return_value = AppConfig.from_data({
+            "homeserver": {"address": "http://localhost:8008"},
+            "search": {"fusion": {"weights": {"messages": 0, "rooms": 0}}}
+        })
+        result = await unified_search(SearchQuery(query="fused"), next_batch=None, fusion=FusionMethod.BLEND, authorization="Bearer test_token")
+        assert matrix_limits == [2]
+        assert agent_limits[-1] == 20
+        assert [entry["item"]["id"] for entry in result.results["fused"]] == ["agent-1", "agent-2"]
+
+@pytest.mark.asyncio
+async def test_fused_search_ranks_registry_agents():
+    from AutonomousSphere.search.search import unified_search
+    from AutonomousSphere.search.fusion import FusionMethod
+    from AutonomousSphere.registry.registry import agents_registry, rebuild_indexes
+    from AutonomousSphere.registry.models import Agent, Protocol
+    
+    original_registry = agents_registry.copy()
+    agents_registry.clear()
+    # The best match is registered last
+    for i in range(3):
+        agent = Agent(
+            id=f"sailing-{i}",
+            display_name=f"Sailing Assistant {i}",
+            description="Plans sailing trips from tides, winds, currents, harbours and the weather forecast",
+            protocol=Protocol.MCP
+        )
+        agents_registry[agent.id] = agent
+    forecaster = Agent(id="forecaster", display_name="Weather Forecast", description="Weather forecast", protocol=Protocol.MCP)
+    agents_registry[forecaster.id] = forecaster
+    # Scored by BM25 for one of the terms, but not a match of the index engine
+    weather = Agent(id="weather", display_name="Weather", description="Weather weather weather", protocol=Protocol.MCP)
+    agents_registry[weather.id] = weather
+    rebuild_indexes()
+    try:
+        with patch('AutonomousSphere.search.search.get_config') as mock_get_config:
+            mock_get_config.return_value = AppConfig.from_data({"search": {"fusion": {}}})
+            result = await unified_search(SearchQuery(query="weather forecast", limit=1), next_batch=None, fusion=FusionMethod.RRF, authorization=None)
+            assert [entry["item"].id for entry in result.results["fused"]] == ["forecaster"]
+            
+            # Only the agents containing every term are fused
+            result = await unified_search(SearchQuery(query="weather forecast", limit=10), next_batch=None, fusion=FusionMethod.RRF, authorization=None)
+            fused = [entry["item"].id for entry in result.results["fused"]]
+            assert fused[0] == "forecaster"
+            assert sorted(fused[1:]) == ["sailing-0", "sailing-1", "sailing-2"]
+    finally:
+        agents_registry.clear()
+        agents_registry.update(original_registry)
+        rebuild_indexes()
+
+@pytest.mark.asyncio
+async def test_unified_search_keeps_registry_client_errors():
+    from fastapi import HTTPException
+    from AutonomousSphere.search.search import unified_search
+    
+    with patch('AutonomousSphere.search.search.get_config') as mock_get_config:
+        mock_get_config.return_value = AppConfig.from_data({})
+        with pytest.raises(HTTPException) as error:
+            await unified_search(SearchQuery(query="weather", filters={"protocol": {"nested": "value"}}), next_batch=None, fusion=None, authorization=None)
+    assert error.value.status_code == 422
+    assert "protocol" in error.value.detail
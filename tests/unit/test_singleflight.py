@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from AutonomousSphere.search.singleflight import SingleFlight, request_key
+
+def test_request_key_ignores_dict_order():
+    assert request_key({"query": "a", "filters": {}}, "token") == request_key({"filters": {}, "query": "a"}, "token")
+    assert request_key({"query": "a"}, "token") != request_key({"query": "a"}, "other")
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    calls = []
+    release = asyncio.Event()
+    
+    async def upstream():
+        calls.append(1)
+        await release.wait()
+        return {"results": []}
+    
+    waiters = [asyncio.create_task(flights.do("key", upstream)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters)
+    
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flights.stats() == {"in_flight": 0, "started": 1, "shared": 4}
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_call():
+    flights = SingleFlight()
+    release = asyncio.Event()
+    
+    async def upstream():
+        await release.wait()
+        return "done"
+    
+    leaving = asyncio.create_task(flights.do("key", upstream))
+    staying = asyncio.create_task(flights.do("key", upstream))
+    await asyncio.sleep(0)
+    leaving.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    
+    assert await staying == "done"
+    assert leaving.cancelled()
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_caller():
+    flights = SingleFlight()
+    
+    async def failing():
+        await asyncio.sleep(0)
+        raise RuntimeError("homeserver unavailable")
+    
+    results = await asyncio.gather(
+        flights.do("key", failing), flights.do("key", failing), return_exceptions=True
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(flights) == 0
@@ -0,0 +1,95 @@
+import pytest
+from AutonomousSphere.registry.trigram import TrigramIndex, bounded_levenshtein, max_edits
+
+def test_bounded_levenshtein():
+    assert bounded_levenshtein("search", "search", 2) == 0
+    assert bounded_levenshtein("serch", "search", 2) == 1
+    assert bounded_levenshtein("summariser", "summarizer", 2) == 1
+    assert bounded_levenshtein("weather", "whether", 1) is None
+    assert bounded_levenshtein("a", "abcd", 2) is None
+    
+    assert max_edits(2) == 0
+    assert max_edits(7) == 1
+    assert max_edits(8) == 2
+
+def test_trigram_index_tolerates_typos():
+    index = TrigramIndex()
+    index.add("searcher", ["Search Agent", "search"])
+    index.add("summarizer", ["Summarizer", "summarization", "pdf"])
+    index.add("weather", ["Weather", "forecast"])
+    
+    assert [agent_id for agent_id, _ in index.search("serch", k=5)] == ["searcher"]
+    assert [agent_id for agent_id, _ in index.search("summariser", k=5)] == ["summarizer"]
+    
+    # Exact matches score 1.0 and every query term must match
+    hits = index.search("weather forcast", k=5)
+    assert hits[0][0] == "weather"
+    assert hits[0][1] < 1.0
+    assert index.search("weather", k=5) == [("weather", 1.0)]
+    assert index.search("weather pdf", k=5) == []
+    
+    # Short terms must match exactly
+    hits = index.search("pdx", k=5)
+    assert [agent_id for agent_id, _ in hits] == ["summarizer"]
+    assert abs(hits[0][1] - 2 / 3) < 1e-9
+    assert index.search("pd", k=5) == []
+
+def test_trigram_index_candidates_and_removal():
+    index = TrigramIndex()
+    index.add("a1", ["search"])
+    index.add("a2", ["search"])
+    
+    assert [agent_id for agent_id, _ in index.search("serch", k=5, candidates={"a2"})] == ["a2"]
+    
+    index.remove("a1")
+    index.remove("a2")
+    assert index.search("search", k=5) == []
+    assert index.term_agents == {}
+    assert index.trigram_terms == {}
+
+def test_trigram_index_stops_at_k_on_shared_terms():
+    import random
+    
+    rng = random.Random(7)
+    words = ["search", "searcher", "summarizer", "summary", "weather", "forecast", "bot", "bots", "pdf", "translate"]
+    index = TrigramIndex()
+    documents = {}
+    for i in range(300):
+        documents[f"a{i}"] = rng.sample(words, 3)
+        index.add(f"a{i}", documents[f"a{i}"])
+    
+    def exhaustive(query):
+        scores = {}
+        for agent_id in documents:
+            total = 0.0
+            for token in set(query.split()):
+                similarities = [
+                    1 - distance / max(len(term), len(token))
+                    for term, distance in index.similar_terms(token)
+                    if term in index.documents[agent_id]
+                ]
+                if not similarities:
+                    break
+                total += max(similarities)
+            else:
+                scores[agent_id] = total / len(set(query.split()))
+        return sorted(scores.values(), reverse=True)
+    
+    for query in ["serch", "summariser", "bot", "weather forcast", "serch bot pdf", "wether xyzzy"]:
+        for k in (1, 5, 50, 500):
+            hits = index.search(query, k=k)
+            assert [score for _, score in hits] == pytest.approx(exhaustive(query)[:k])
+    
+    # A term shared by every agent is read no further than the first k postings
+    crowded = TrigramIndex()
+    for i in range(1000):
+        crowded.add(f"b{i}", ["bot"])
+    read = []
+    original = crowded._ranked_agents
+    def counting(similarities, candidates):
+        for entry in original(similarities, candidates):
+            read.append(entry)
+            yield entry
+    crowded._ranked_agents = counting
+    assert len(crowded.search("bot", k=10)) == 10
+    assert len(read) <= 11
@@ -0,0 +1,48 @@
+import numpy as np
+from AutonomousSphere.registry.vector_index import VectorIndex
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+def test_vector_index_top_k():
+    index = VectorIndex(dimensions=3, initial_capacity=2)
+    index.add("x", unit(1, 0, 0))
+    index.add("y", unit(0, 1, 0))
+    index.add("xy", unit(1, 1, 0))
+    
+    hits = index.search(unit(1, 0.1, 0), k=2)
+    assert [agent_id for agent_id, _ in hits] == ["x", "xy"]
+    assert hits[0][1] > hits[1][1]
+    
+    # k larger than the index returns everything, best first
+    assert [agent_id for agent_id, _ in index.search(unit(0, 1, 0), k=10)] == ["y", "xy", "x"]
+    
+    # Candidates restrict the scored rows
+    hits = index.search(unit(1, 0, 0), k=5, candidates={"y", "missing"})
+    assert [agent_id for agent_id, _ in hits] == ["y"]
+    
+    # Zero queries match nothing
+    assert index.search(np.zeros(3, dtype=np.float32), k=5) == []
+
+def test_vector_index_tombstones_and_compaction():
+    index = VectorIndex(dimensions=2, initial_capacity=1, compaction_ratio=0.5)
+    for i in range(4):
+        index.add(f"a{i}", unit(1, i))
+    
+    index.remove("a0")
+    assert index.tombstones == 1
+    assert "a0" not in index
+    assert "a0" not in [agent_id for agent_id, _ in index.search(unit(1, 0), k=4)]
+    
+    # Crossing the ratio compacts the matrix
+    index.remove("a1")
+    index.remove("a2")
+    assert index.tombstones == 0
+    assert index.size == 1
+    assert index.search(unit(1, 3), k=4)[0][0] == "a3"
+    
+    # Overwriting an agent reuses its row
+    index.add("a3", unit(0, 1))
+    assert index.size == 1
+    assert len(index) == 1
@@ -0,0 +1,163 @@
+import pytest
+import asyncio
+import os
+from datetime import datetime
+from AutonomousSphere.registry.models import Agent, Protocol
+from AutonomousSphere.registry.wal_storage import WalAgentStorage
+
+def make_agent(agent_id, **fields):
+    return Agent(id=agent_id, display_name=agent_id.title(), protocol=Protocol.MCP, **fields)
+
+async def reopen(directory):
+    storage = WalAgentStorage(str(directory))
+    await storage.connect()
+    return storage
+
+@pytest.mark.asyncio
+async def test_wal_storage_recovers_from_log(tmp_path):
+    storage = await reopen(tmp_path)
+    assert await storage.insert(make_agent("alpha", endpoint_url="https://example.com/alpha")) is True
+    assert await storage.insert(make_agent("alpha")) is False
+    await storage.insert_many([make_agent("beta"), make_agent("gamma")], atomic=True)
+    assert await storage.update(make_agent("beta", description="Updated")) == 2
+    assert await storage.update(make_agent("beta", description="Outdated"), [1]) is None
+    await storage.delete("gamma")
+    seen_at = datetime(2030, 1, 1, 12, 0)
+    await storage.mark_stale(["alpha"])
+    await storage.touch_many({"beta": seen_at})
+    
+    # Simulate a crash: no snapshot, only the log survives
+    storage._snapshot_task.cancel()
+    storage._log.close()
+    
+    recovered = await reopen(tmp_path)
+    try:
+        assert sorted(recovered.agents) == ["alpha", "beta"]
+        assert recovered.agents["alpha"].stale
+        assert str(recovered.agents["alpha"].endpoint_url) == "https://example.com/alpha"
+        assert recovered.agents["beta"].description == "Updated"
+        assert recovered.agents["beta"].version == 2
+        assert recovered.agents["beta"].last_seen == seen_at
+    finally:
+        await recovered.close()
+
+@pytest.mark.asyncio
+async def test_wal_storage_snapshot_replaces_logs(tmp_path):
+    storage = await reopen(tmp_path)
+    await storage.insert_many([make_agent(f"agent-{i}") for i in range(10)], atomic=False)
+    await storage.snapshot()
+    await storage.delete("agent-0")
+    await storage.close()
+    
+    # Closing takes a final snapshot; only it and the empty log after it remain
+    assert sorted(os.listdir(tmp_path)) == ["snapshot-3.jsonl", "wal-3.log"]
+    
+    recovered = await reopen(tmp_path)
+    try:
+        assert len(recovered.agents) == 9
+        assert "agent-0" not in recovered.agents
+    finally:
+        await recovered.close()
+
+@pytest.mark.asyncio
+async def test_wal_storage_ignores_torn_record(tmp_path):
+    storage = await reopen(tmp_path)
+    await storage.insert(make_agent("alpha"))
+    storage._snapshot_task.cancel()
+    storage._log.write(b'["P",["beta",nu')
+    storage._log.close()
+    
+    recovered = await reopen(tmp_path)
+    try:
+        assert list(recovered.agents) == ["alpha"]
+    finally:
+        await recovered.close()
+
+@pytest.mark.asyncio
+async def test_wal_storage_group_commit(tmp_path):
+    storage = await reopen(tmp_path)
+    writes = []
+    original_write = storage._write
+    storage._write = lambda log, lines: (writes.append(len(lines)), original_write(log, lines))
+    try:
+        await asyncio.gather(*(storage.insert(make_agent(f"agent-{i}")) for i in range(50)))
+        # Concurrent writers share fsyncs
+        assert sum(writes) == 50
+        assert len(writes) < 50
+    finally:
+        await storage.close()
+
+@pytest.mark.asyncio
+async def test_wal_storage_failed_commit_is_undone(tmp_path):
+    storage = await reopen(tmp_path)
+    await storage.insert(make_agent("alpha"))
+    await storage.insert(make_agent("beta"))
+    
+    def failing_write(log, lines):
+        raise OSError("disk full")
+    original_write, storage._write = storage._write, failing_write
+    try:
+        results = await asyncio.gather(
+            storage.insert(make_agent("gamma")),
+            storage.update(make_agent("alpha", description="Updated")),
+            storage.update(make_agent("alpha", description="Updated again")),
+            storage.delete("beta"),
+            storage.touch_many({"alpha": datetime(2030, 1, 1, 12, 0)}),
+            return_exceptions=True
+        )
+        assert all(isinstance(result, OSError) for result in results)
+        
+        # Memory still matches what the log holds
+        assert sorted(storage.agents) == ["alpha", "beta"]
+        assert storage.agents["alpha"].description is None
+        assert storage.agents["alpha"].version == 1
+        assert storage.agents["alpha"].last_seen != datetime(2030, 1, 1, 12, 0)
+    finally:
+        storage._write = original_write
+        await storage.close()
+
+@pytest.mark.asyncio
+async def test_wal_storage_records_are_not_shared(tmp_path):
+    storage = await reopen(tmp_path)
+    try:
+        agent = make_agent("alpha")
+        await storage.insert(agent)
+        # Callers change their records in place, e.g. on heartbeats, without logging
+        loaded = (await storage.load_all())[0]
+        loaded.stale = True
+        (await storage.get("alpha")).last_seen = datetime(2030, 1, 1, 12, 0)
+        (await storage.get_many(["alpha"]))[0].stale = True
+        assert storage.agents["alpha"].stale is False
+        assert storage.agents["alpha"].last_seen == agent.last_seen
+        
+        assert await storage.mark_stale(["alpha", "missing"]) == ["alpha"]
+        # Already flagged
+        assert await storage.mark_stale(["alpha"]) == []
+    finally:
+        await storage.close()
+
+@pytest.mark.asyncio
+async def test_wal_storage_snapshot_leaves_out_uncommitted_changes(tmp_path):
+    storage = await reopen(tmp_path)
+    await storage.insert(make_agent("alpha"))
+    
+    def failing_write(log, lines):
+        raise OSError("disk full")
+    original_write, storage._write = storage._write, failing_write
+    # Staged in memory, its commit not yet written
+    staged = asyncio.ensure_future(storage.insert(make_agent("beta")))
+    deleted = asyncio.ensure_future(storage.delete("alpha"))
+    await asyncio.sleep(0)
+    assert sorted(storage.agents) == ["beta"]
+    await storage.snapshot()
+    results = await asyncio.gather(staged, deleted, return_exceptions=True)
+    assert all(isinstance(result, OSError) for result in results)
+    storage._write = original_write
+    storage._snapshot_task.cancel()
+    storage._log.close()
+    
+    recovered = await reopen(tmp_path)
+    try:
+        assert sorted(recovered.agents) == ["alpha"]
+    finally:
+        await recovered.close()